@@ -0,0 +1,204 @@
+"""
+Compiled placement plans and in-memory ad decisions.
+A finished placement run is compiled into sorted interval arrays per main video, so a
+player asking "what ad at t?" is answered by one bisect. Per-viewer frequency caps and
+pacing are plain counters in an LRU-bounded dict. Plans compiled by another worker are
+picked up from the shared job store through a loader, checked at most every few seconds
+per video, so the decision path rarely does I/O.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+# How long after its timestamp a placement stays eligible when the next one is further away
+DEFAULT_SLOT_SECONDS = 30.0
+# How often a worker checks the shared store for a newer plan of a video
+PLAN_REFRESH_SECONDS = 5.0
+
+# loader(video_id) -> (version, placements, report, ranking) of the latest plan, or None
+PlanLoader = Callable[[str], Optional[Tuple[str, List[Dict[str, Any]], List[str], List[Dict[str, Any]]]]]
+
+
+class CompiledPlan:
+    """One main video's placements as parallel sorted arrays: starts, ends, entries"""
+
+    __slots__ = ("video_id", "version", "starts", "ends", "entries", "alternates", "compiled_at")
+
+    def __init__(self, video_id: str, placements: List[Dict[str, Any]], report: List[str] = None,
+                 ranking: List[Dict[str, Any]] = None, slot_seconds: float = DEFAULT_SLOT_SECONDS,
+                 version: str = None):
+        self.video_id = video_id
+        # Identifies the placement run the plan came from (its job id)
+        self.version = version
+        ordered = sorted(zip(placements, report or [None] * len(placements)), key=lambda pair: pair[0]["time"])
+        self.starts = [placement["time"] for placement, _ in ordered]
+        # A slot ends at the next placement or after slot_seconds, whichever is first
+        self.ends = [min(start + slot_seconds, following) for start, following in
+                     zip(self.starts, self.starts[1:] + [float("inf")])]
+        self.entries = [
+            {
+                "ad": placement.get("ad"),
+                "product": placement.get("product"),
+                "confidence": placement.get("confidence"),
+                "reason": _reason(placement, explanation),
+                "timestamp": placement.get("timestamp")
+            }
+            for placement, explanation in ordered
+        ]
+        # Ranked fallbacks when a viewer has hit the cap for the planned ad
+        self.alternates = [{"ad": ad.get("ad"), "product": ad.get("product")} for ad in ranking or []]
+        self.compiled_at = time.time()
+
+    def lookup(self, t: float) -> int:
+        """Index of the slot covering t, or -1"""
+        i = bisect_right(self.starts, t) - 1
+        return i if i >= 0 and t < self.ends[i] else -1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "video_id": self.video_id,
+            "version": self.version,
+            "compiled_at": self.compiled_at,
+            "slots": [{"start": start, "end": end if end != float("inf") else None, **entry}
+                      for start, end, entry in zip(self.starts, self.ends, self.entries)]
+        }
+
+
+def _reason(placement: Dict[str, Any], explanation: Optional[str]) -> str:
+    """Short reason from the LLM explanation, else from the solver's slot data"""
+    if explanation:
+        try:
+            transition = json.loads(explanation).get("transition")
+            if transition:
+                return transition
+        except (ValueError, AttributeError):
+            pass
+    return f"{placement.get('emotion_trend', 'slot')} emotion at {placement.get('timestamp')}"
+
+
+class ViewerCounters:
+    """Per-viewer impressions by ad, time of the last ad shown and the slot it was served for"""
+
+    __slots__ = ("by_ad", "total", "last_shown", "served_slot", "served")
+
+    def __init__(self):
+        self.by_ad: Dict[str, int] = {}
+        self.total = 0
+        self.last_shown = 0.0
+        # (video_id, plan version, slot start) of the last served decision, and that decision
+        self.served_slot = None
+        self.served: Optional[Dict[str, Any]] = None
+
+
+class AdDecisionEngine:
+    """In-memory plans per main video plus frequency capping and pacing per viewer"""
+
+    def __init__(self, max_per_ad: int = 3, max_per_session: int = 20, min_interval: float = 60.0,
+                 max_viewers: int = 100000, loader: PlanLoader = None,
+                 refresh_seconds: float = PLAN_REFRESH_SECONDS, max_videos: int = 10000):
+        self.max_per_ad = max_per_ad
+        self.max_per_session = max_per_session
+        self.min_interval = min_interval
+        self.max_viewers = max_viewers
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.max_videos = max_videos
+        self.plans: Dict[str, CompiledPlan] = {}
+        # video_id -> when the shared store was last checked for it (misses included), LRU-bounded
+        self._checked: "OrderedDict[str, float]" = OrderedDict()
+        self._viewers: "OrderedDict[str, ViewerCounters]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, video_id: str, placements: List[Dict[str, Any]], report: List[str] = None,
+                ranking: List[Dict[str, Any]] = None, version: str = None) -> CompiledPlan:
+        """Compile and swap in a plan; readers see either the old or the new plan, never a mix"""
+        plan = CompiledPlan(video_id, placements or [], report, ranking, version=version)
+        self.plans[video_id] = plan
+        return plan
+
+    def plan(self, video_id: str, now: float = None) -> Optional[CompiledPlan]:
+        """The current plan for a video, reloaded from the shared store when missing or outdated"""
+        plan = self.plans.get(video_id)
+        if self.loader is None:
+            return plan
+        now = time.time() if now is None else now
+        if not self.needs_refresh(video_id, now):
+            return plan
+        with self._lock:
+            self._checked[video_id] = now
+            self._checked.move_to_end(video_id)
+            if len(self._checked) > self.max_videos:
+                # The evicted video's plan goes too; the store still has it if it is asked for again
+                evicted, _ = self._checked.popitem(last=False)
+                self.plans.pop(evicted, None)
+        latest = self.loader(video_id)
+        if latest is None:
+            return plan
+        version, placements, report, ranking = latest
+        if plan is None or plan.version != version:
+            plan = self.compile(video_id, placements, report, ranking, version)
+        return plan
+
+    def needs_refresh(self, video_id: str, now: float = None) -> bool:
+        """Whether plan() would read the shared store now, so async callers can load it off the loop"""
+        if self.loader is None:
+            return False
+        now = time.time() if now is None else now
+        return now - self._checked.get(video_id, 0.0) >= self.refresh_seconds
+
+    def _viewer(self, viewer_id: str) -> ViewerCounters:
+        counters = self._viewers.get(viewer_id)
+        if counters is None:
+            counters = self._viewers[viewer_id] = ViewerCounters()
+            if len(self._viewers) > self.max_viewers:
+                self._viewers.popitem(last=False)
+        else:
+            self._viewers.move_to_end(viewer_id)
+        return counters
+
+    def decide(self, video_id: str, t: float, viewer_id: str = None, now: float = None) -> Dict[str, Any]:
+        """
+        The ad to play at t for this viewer, or {"ad": None, "reason": ...}. Players poll
+        repeatedly; every poll within a slot gets the decision served for it, and only
+        that first served decision counts as an impression.
+        """
+        now = time.time() if now is None else now
+        plan = self.plan(video_id, now)
+        if plan is None:
+            return {"ad": None, "reason": "no_plan"}
+        i = plan.lookup(t)
+        if i < 0:
+            return {"ad": None, "reason": "no_slot"}
+
+        entry = plan.entries[i]
+        decision = {**entry, "slot_start": plan.starts[i], "slot_end": plan.ends[i]}
+        if viewer_id is None:
+            return decision
+
+        slot = (video_id, plan.version, plan.starts[i])
+        with self._lock:
+            counters = self._viewer(viewer_id)
+            if counters.served_slot == slot:
+                return dict(counters.served)
+            if counters.total >= self.max_per_session:
+                return {"ad": None, "reason": "session_cap"}
+            if counters.total and now - counters.last_shown < self.min_interval:
+                return {"ad": None, "reason": "pacing"}
+
+            if counters.by_ad.get(entry["ad"], 0) >= self.max_per_ad:
+                alternate = next((ad for ad in plan.alternates
+                                  if counters.by_ad.get(ad["ad"], 0) < self.max_per_ad), None)
+                if alternate is None:
+                    return {"ad": None, "reason": "frequency_cap"}
+                decision.update(alternate, reason="frequency_cap_alternate", confidence=None)
+
+            counters.by_ad[decision["ad"]] = counters.by_ad.get(decision["ad"], 0) + 1
+            counters.total += 1
+            counters.last_shown = now
+            counters.served_slot = slot
+            counters.served = dict(decision)
+        return decision
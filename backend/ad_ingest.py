@@ -0,0 +1,224 @@
+"""
+Ad creative ingest pipeline.
+Each ad is probed once (duration, codecs, GOP structure, keyframe index) and the result is
+cached in SQLite; normalization to the house encoding profile and HLS pre-segmentation run
+on a background worker pool. Stitching and placement read from the cache instead of
+probing media on the hot path.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+from stitching import FFMPEG, StitchingError, ffmpeg_available, keyframe_times, probe_media, run_tool
+
+logger = logging.getLogger(__name__)
+
+ADS_DIR = os.getenv("ADS_DIR", "ads")
+
+# House encoding profile every ad is normalized to, so stitching can stream-copy it
+HOUSE_PROFILE = {
+    "video_codec": "h264",
+    "video_encoder": "libx264",
+    "profile": "high",
+    "width": int(os.getenv("HOUSE_WIDTH", "1920")),
+    "height": int(os.getenv("HOUSE_HEIGHT", "1080")),
+    "frame_rate": os.getenv("HOUSE_FRAME_RATE", "30"),
+    "pix_fmt": "yuv420p",
+    "gop_seconds": 2,
+    "audio_codec": "aac",
+    "sample_rate": 48000,
+    "channels": 2,
+}
+
+INGEST_PENDING = "pending"
+INGEST_PROBED = "probed"
+INGEST_READY = "ready"
+INGEST_FAILED = "failed"
+
+
+def gop_structure(keyframes: List[float], duration: float) -> Dict[str, Any]:
+    """Summarize keyframe spacing (GOP length in seconds)"""
+    if not keyframes:
+        return {"keyframe_count": 0, "avg_gop": None, "max_gop": None}
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    if duration > keyframes[-1]:
+        gaps.append(duration - keyframes[-1])
+    return {
+        "keyframe_count": len(keyframes),
+        "avg_gop": round(sum(gaps) / len(gaps), 3) if gaps else duration,
+        "max_gop": round(max(gaps), 3) if gaps else duration
+    }
+
+
+class AdMetadataCache:
+    """SQLite cache of per-ad probe metadata and ingest outputs"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv("AD_CACHE_DB_PATH", os.path.join(ADS_DIR, "ad_metadata.db"))
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ads (
+                    ad_id TEXT PRIMARY KEY,
+                    source_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    probe TEXT,
+                    keyframes TEXT,
+                    gop TEXT,
+                    normalized_path TEXT,
+                    segments_key TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ads_source ON ads (source_path)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ads_normalized ON ads (normalized_path)")
+
+    def upsert(self, ad_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        values = {key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                  for key, value in fields.items()}
+        with self._lock, self._conn:
+            exists = self._conn.execute("SELECT 1 FROM ads WHERE ad_id = ?", (ad_id,)).fetchone()
+            if exists:
+                columns = ", ".join(f"{key} = ?" for key in values)
+                self._conn.execute(f"UPDATE ads SET {columns} WHERE ad_id = ?", list(values.values()) + [ad_id])
+            else:
+                values["ad_id"] = ad_id
+                columns = ", ".join(values)
+                placeholders = ", ".join("?" for _ in values)
+                self._conn.execute(f"INSERT INTO ads ({columns}) VALUES ({placeholders})", list(values.values()))
+
+    def get(self, ad_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM ads WHERE ad_id = ?", (ad_id,)).fetchone()
+        return self._row_to_ad(row) if row else None
+
+    def find_by_path(self, path: str) -> Optional[Dict[str, Any]]:
+        """Look an ad up by its original or normalized file"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ads WHERE source_path = ? OR normalized_path = ?", (path, path)
+            ).fetchone()
+        return self._row_to_ad(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM ads ORDER BY updated_at").fetchall()
+        return [self._row_to_ad(row) for row in rows]
+
+    def _row_to_ad(self, row: sqlite3.Row) -> Dict[str, Any]:
+        ad = dict(row)
+        for key in ("probe", "keyframes", "gop"):
+            ad[key] = json.loads(ad[key]) if ad[key] else None
+        return ad
+
+
+class AdIngestor:
+    """Probes ads on ingest and normalizes/segments them on a background worker pool"""
+
+    def __init__(self, cache: AdMetadataCache = None, segment_cache=None, max_workers: int = None):
+        self.cache = cache or AdMetadataCache()
+        self.segment_cache = segment_cache
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("AD_INGEST_WORKERS", "2")),
+            thread_name_prefix="ad-ingest"
+        )
+
+    def save_upload(self, file_obj, filename: str = None) -> str:
+        """Persist an uploaded file under ADS_DIR so it can be probed and re-read later"""
+        os.makedirs(ADS_DIR, exist_ok=True)
+        extension = os.path.splitext(filename or "")[1] or ".mp4"
+        path = os.path.join(ADS_DIR, f"{uuid.uuid4().hex}{extension}")
+        with open(path, "wb") as f:
+            shutil.copyfileobj(file_obj, f)
+        return path
+
+    def ingest(self, ad_id: str, path: str) -> Dict[str, Any]:
+        """Probe synchronously (cheap, cached) and queue normalization + segmentation"""
+        cached = self.cache.get(ad_id)
+        if cached and cached["status"] in (INGEST_PROBED, INGEST_READY) and cached["source_path"] == path:
+            return cached
+
+        self.cache.upsert(ad_id, source_path=path, status=INGEST_PENDING, error=None)
+        if not ffmpeg_available():
+            self.cache.upsert(ad_id, status=INGEST_FAILED, error="ffmpeg/ffprobe not found on PATH")
+            return self.cache.get(ad_id)
+
+        try:
+            probe = probe_media(path)
+            keyframes = keyframe_times(path)
+        except StitchingError as e:
+            self.cache.upsert(ad_id, status=INGEST_FAILED, error=str(e))
+            return self.cache.get(ad_id)
+
+        self.cache.upsert(ad_id, status=INGEST_PROBED, probe=probe, keyframes=keyframes,
+                          gop=gop_structure(keyframes, probe["duration"]))
+        self.executor.submit(self._normalize_and_segment, ad_id, path, probe["audio"] is not None)
+        return self.cache.get(ad_id)
+
+    def _normalize_and_segment(self, ad_id: str, path: str, has_audio: bool) -> None:
+        profile = HOUSE_PROFILE
+        normalized = os.path.join(ADS_DIR, "normalized", f"{ad_id}.mp4")
+        os.makedirs(os.path.dirname(normalized), exist_ok=True)
+        try:
+            frame_rate = profile["frame_rate"]
+            args = [FFMPEG, "-nostdin", "-v", "error", "-y", "-i", path]
+            if not has_audio:
+                # Ads without audio get a silent track so every ad has the same stream layout
+                args += ["-f", "lavfi", "-i", f"anullsrc=r={profile['sample_rate']}:cl=stereo"]
+            run_tool(args + [
+                "-map", "0:v:0", "-map", "0:a:0" if has_audio else "1:a:0",
+                "-vf", f"scale={profile['width']}:{profile['height']}:force_original_aspect_ratio=decrease,"
+                       f"pad={profile['width']}:{profile['height']}:(ow-iw)/2:(oh-ih)/2,fps={frame_rate}",
+                "-c:v", profile["video_encoder"], "-profile:v", profile["profile"],
+                "-pix_fmt", profile["pix_fmt"],
+                "-force_key_frames", f"expr:gte(t,n_forced*{profile['gop_seconds']})",
+                "-c:a", profile["audio_codec"], "-ar", str(profile["sample_rate"]),
+                "-ac", str(profile["channels"]), "-shortest", "-movflags", "+faststart",
+                normalized
+            ])
+            probe = probe_media(normalized)
+            keyframes = keyframe_times(normalized)
+            segments_key = None
+            if self.segment_cache is not None:
+                segments_key = self.segment_cache.segment(normalized)["key"]
+            self.cache.upsert(ad_id, status=INGEST_READY, normalized_path=normalized,
+                              segments_key=segments_key,
+                              probe=probe, keyframes=keyframes, gop=gop_structure(keyframes, probe["duration"]))
+        except StitchingError as e:
+            logger.error("Ad ingest failed for %s: %s", ad_id, e)
+            self.cache.upsert(ad_id, status=INGEST_FAILED, error=str(e))
+        except Exception as e:
+            # Anything else (disk, cache, bad probe data) must not leave the ad stuck mid-ingest
+            logger.exception("Ad ingest failed unexpectedly for %s", ad_id)
+            self.cache.upsert(ad_id, status=INGEST_FAILED, error=f"{type(e).__name__}: {e}")
+
+    def best_source(self, ad_id: str) -> Optional[str]:
+        """Normalized file when ready, else the original upload"""
+        ad = self.cache.get(ad_id)
+        if not ad:
+            return None
+        return ad["normalized_path"] if ad["status"] == INGEST_READY else ad["source_path"]
+
+    def cached_probe(self, path: str) -> Optional[Dict[str, Any]]:
+        """Probe + keyframes for a file from the cache, or None if it was never ingested"""
+        ad = self.cache.find_by_path(path)
+        if not ad or not ad["probe"]:
+            return None
+        # Metadata columns describe the normalized file once the ad is ready
+        if ad["status"] == INGEST_READY and path != ad["normalized_path"]:
+            return None
+        return {**ad["probe"], "keyframes": ad["keyframes"]}
@@ -0,0 +1,111 @@
+"""
+Shared cache of provider analysis results: Pegasus chapters, Gemini text and persona scores,
+keyed by the request that produced them. Entries live in SQLite so every worker sees work
+done by the speculative pre-analysis (speculative_analysis.py) or by an earlier request.
+A lookup for a key that is already being computed in this process waits for that result
+instead of calling the provider a second time.
+
+Off unless SPECULATIVE_ANALYSIS is enabled; when off, lookups simply call through.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_ANALYSIS = os.getenv("SPECULATIVE_ANALYSIS", "off").lower() in ("1", "true", "on")
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class AnalysisCache:
+    """SQLite-backed result cache with per-process single-flight"""
+
+    def __init__(self, db_path: str = None, ttl: float = ANALYSIS_CACHE_TTL, enabled: bool = SPECULATIVE_ANALYSIS):
+        self.db_path = db_path or os.getenv("ANALYSIS_CACHE_DB_PATH", "analysis_cache.db")
+        self.ttl = ttl
+        self.enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+        # key -> Event set when the in-flight computation finishes
+        self._in_flight = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so a disabled cache never creates the database file
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS analyses (
+                        key TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(parts: Tuple) -> str:
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, parts: Tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, created_at FROM analyses WHERE key = ?", (self.key(parts),)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return False, None
+        return True, json.loads(row[0])
+
+    def put(self, parts: Tuple, value: Any) -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO analyses (key, kind, value, created_at) VALUES (?, ?, ?, ?)",
+                         (self.key(parts), str(parts[0]), json.dumps(value), time.time()))
+
+    def get_or_compute(self, parts: Tuple, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Cached value for parts (a tuple whose first item names the kind of analysis), else
+        compute() and store its JSON-serializable result when cacheable(result) allows it.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = self.key(parts)
+        while True:
+            hit, value = self.get(parts)
+            if hit:
+                metrics.cache_lookup("analysis", True)
+                return value
+            with self._lock:
+                waiting = self._in_flight.get(key)
+                if waiting is None:
+                    done = self._in_flight[key] = threading.Event()
+                    break
+            # Someone in this process is computing it; use their result (or retry if it failed)
+            waiting.wait()
+
+        metrics.cache_lookup("analysis", False)
+        try:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.put(parts, value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            done.set()
+
+
+analysis_cache = AnalysisCache()
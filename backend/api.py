@@ -21,6 +21,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cheap to construct: provider clients are created on first use (see startup.py)
 context_engine = Context_engine()
 
 import run_multi_video_analysis
@@ -30,7 +31,123 @@ from embedding_similarity_analysis import *
 class OutputData(BaseModel):
     result: dict
 
-from open_ai_agent import call_openai
+from open_ai_agent import call_openai, get_client as bedrock_client
+import placement_pipeline
+from job_manager import JobManager, format_sse, JOB_COMPLETED, JOB_FAILED
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from starlette.routing import Mount
+import asyncio
+import shutil
+from structured_logging import correlation, new_correlation_id, span
+import metrics
+import startup
+from analysis_cache import SPECULATIVE_ANALYSIS
+from speculative_analysis import SpeculativeAnalyzer
+from call_scheduler import DEFAULT_TENANT, PRIORITIES, PRIORITY_INTERACTIVE, SchedulerBusy, scheduler, scheduling
+from stitching import StreamCopyStitcher, StitchingError, allowed_path, resolve_source, ffmpeg_available, STITCHED_DIR
+from hls_stitching import ManifestStitcher, HLS_DIR
+from ad_ingest import AdIngestor
+from ad_decisions import AdDecisionEngine
+from live_placement import LiveAdSession, RealtimeChunkReader, GeminiChunkScorer, load_ranking, CHUNK_SECONDS
+
+def load_placement_plan(video_id: str):
+    """Latest finished placement job for a video in the shared job store, whichever worker ran it"""
+    job = placement_jobs.store.latest_completed("ad_placement", video_id)
+    if job is None:
+        return None
+    results = job["results"]
+    return (job["job_id"], results.get("placements", []), results.get("ad_placement_report"),
+            results.get("final_score"))
+
+# Finished placement jobs are compiled into in-memory plans for /ad_decision
+ad_decisions = AdDecisionEngine(loader=load_placement_plan)
+
+def compile_placement_plan(params: dict, results: dict) -> None:
+    ad_decisions.compile(params["video_id"], results.get("placements", []),
+                         results.get("ad_placement_report"), results.get("final_score"), params.get("job_id"))
+
+logger = logging.getLogger("api")
+
+def request_tenant(request: Request) -> str:
+    """Tenant used for fair sharing of provider quotas (X-Tenant-ID header, else the default tenant)"""
+    return request.headers.get("X-Tenant-ID") or DEFAULT_TENANT
+
+@app.exception_handler(SchedulerBusy)
+async def scheduler_busy_handler(request: Request, exc: SchedulerBusy):
+    """Backpressure: tell callers to come back later instead of queueing without bound"""
+    return JSONResponse(status_code=429, content={"detail": str(exc), "provider": exc.provider},
+                        headers={"Retry-After": str(int(exc.retry_after + 0.5))})
+
+def route_label(request: Request) -> str:
+    """
+    Bounded route label for metrics: the matched route template, the static mount prefix,
+    or "unmatched" (404s, scans); raw paths would add a label set per HLS segment
+    """
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    path = request.url.path
+    for mount in app.routes:
+        if isinstance(mount, Mount) and (path == mount.path or path.startswith(mount.path + "/")):
+            return f"{mount.path}/*"
+    return "unmatched"
+
+@app.middleware("http")
+async def correlation_middleware(request: Request, call_next):
+    """Tag every log record and span of a request with its X-Request-ID (generated if absent)"""
+    request_id = request.headers.get("X-Request-ID") or new_correlation_id()
+    metrics.in_flight.inc(scope="http")
+    try:
+        with correlation(request_id), scheduling(PRIORITY_INTERACTIVE, request_tenant(request)), \
+                span("http.request", method=request.method) as call:
+            response = await call_next(request)
+            call["route"] = route_label(request)
+            call["status_code"] = response.status_code
+    finally:
+        metrics.in_flight.dec(scope="http")
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+placement_jobs = JobManager("ad_placement", placement_pipeline.build_stages(context_engine),
+                            on_complete=compile_placement_plan)
+for completed_job in placement_jobs.store.list_completed("ad_placement"):
+    compile_placement_plan({**completed_job["params"], "job_id": completed_job["job_id"]}, completed_job["results"])
+placement_jobs.resume_pending()
+
+os.makedirs(STITCHED_DIR, exist_ok=True)
+app.mount("/stitched", StaticFiles(directory=STITCHED_DIR), name="stitched")
+os.makedirs(HLS_DIR, exist_ok=True)
+app.mount("/hls", StaticFiles(directory=HLS_DIR), name="hls")
+manifest_stitcher = ManifestStitcher()
+
+# Ads are probed once on ingest; stitching reads their metadata from the cache
+ad_ingestor = AdIngestor(segment_cache=manifest_stitcher.cache)
+stitcher = StreamCopyStitcher(STITCHED_DIR, probe_lookup=ad_ingestor.cached_probe)
+
+# Opt-in (SPECULATIVE_ANALYSIS=on): pre-analyze uploads at batch priority once they are indexed
+speculative = None
+if SPECULATIVE_ANALYSIS:
+    speculative = SpeculativeAnalyzer(context_engine)
+    context_engine.on_upload = speculative.submit
+    metrics.executor_queue_depth("speculative_analysis", speculative.executor)
+
+metrics.executor_queue_depth("placement_jobs", placement_jobs.executor)
+metrics.executor_queue_depth("ad_ingest", ad_ingestor.executor)
+
+# Pre-warm hook (STARTUP_MODE=prewarm|eager): build provider clients and import heavy libraries
+startup.register_warmup("twelvelabs", lambda: context_engine.client)
+startup.register_warmup("gemini", lambda: context_engine.gemini_client)
+startup.register_warmup("persona_analyzer", lambda: context_engine.persona_analyzer)
+startup.register_warmup("bedrock", bedrock_client)
+startup.register_module_warmups()
+
+@app.on_event("startup")
+def warm_up():
+    startup.on_startup()
+
 class VideoSegment(BaseModel):
     id: str
     start: float
@@ -60,6 +177,13 @@ class StitchingRequest(BaseModel):
     sequence: List[SequenceItem]
     metadata: dict
 
+class LiveSessionRequest(BaseModel):
+    source: str
+    chunkSeconds: float = CHUNK_SECONDS
+    speed: float = 1.0
+    minSpacing: float = 60.0
+    videoId: Optional[str] = None
+
 class StitchingResponse(BaseModel):
     success: bool
     stitchedVideoId: str
@@ -75,13 +199,11 @@ async def upload_video(file: UploadFile = File(None), video_id: str = ""):
     Endpoint for video analysis and ad placement
     Can accept either a file upload or a video_id for analysis
     """
-    print(f"=== AD PLACEMENT REQUEST ===")
-    print(f"File provided: {file is not None}")
-    print(f"Video ID provided: {video_id}")
+    logger.info("Ad placement request", extra={"file_provided": file is not None, "video_id": video_id})
     
     # Mock function to simulate video processing
     
-    ads_id = ['68e1f22c830688fe0b91eb9b','68e1ed5d17b39f617835dd41','68e1a0e164ff05606e15297c']
+    ads_id = placement_pipeline.default_ads_id()
 
     def process_video(file: UploadFile) -> List[dict]:
         # Replace this with actual video processing logic
@@ -94,7 +216,7 @@ async def upload_video(file: UploadFile = File(None), video_id: str = ""):
 
     if file:
         # Process the uploaded video file
-        print("Processing uploaded file...")
+        logger.info("Processing uploaded file...")
         result = process_video(file)
         return {"result": result}
 
@@ -103,65 +225,278 @@ async def upload_video(file: UploadFile = File(None), video_id: str = ""):
                 data = json.load(f)
             return {"result": data}
 
-            prompt = "chapterize the video for emotion timeline and time stamp it based on the video"
-            logging.basicConfig(level=logging.INFO)
-            logger = logging.getLogger(__name__)
-
-            logger.info("Calling Pegasus for emotion analysis.")
-            emotion = context_engine.call_pegasus(video_id, prompt)
-            logger.info(f"Emotion analysis result: {emotion}")
-
-            prompt = "What are the key frame timestamps of the video?"
-            logger.info("Calling Pegasus for key frame timestamps.")
-            emotion_objects = context_engine.call_pegasus(video_id, prompt)
-            logger.info(f"Key frame timestamps result: {emotion_objects}")
-
-            logger.info("Calling Gemini for ads category analysis.")
-            gemini_ads_cat = context_engine.call_gemini(emotion_objects)
-            logger.info(f"Gemini ads category result: {gemini_ads_cat}")
-
-            logger.info("Calling Gemini for emotion CSV and graph generation.")
-            emotion_csv, gemini_emotion_graph_loc = context_engine.call_gemini(emotion, "emotion")
-            logger.info(f"Emotion CSV: {emotion_csv}, Emotion graph location: {gemini_emotion_graph_loc}")
-
-            logger.info("Running multi-video analysis for persona matching.")
-            run_multi_video_analysis.persona_main(video_id, ads_id)
-
-            logger.info("Initializing EmbeddingSimilarityAnalyzer.")
-            analyzer = EmbeddingSimilarityAnalyzer()
-            logger.info("Generating analysis report.")
-            report = analyzer.generate_analysis_report()
-            logger.info(f"Analysis report: {report}")
-
-            output_file = "embedding_similarity_results.json"
-            logger.info(f"Output file for embedding similarity results: {output_file}")
-
-            final_products = report["final_score"]
-            final_ad_palcement = []
-            logger.info("Generating final ad placement recommendations.")
-            for i in range(len(final_products)):
-                product = final_products[i]["product"]
-                ad_placement = call_openai(product,emotion_csv, gemini_ads_cat)
-                final_ad_palcement.append(ad_placement)
-                logger.info(f"Ad placement for product {product}: {ad_placement}")
-
-            return {"result": {"emotion": emotion, "emotion_graph": gemini_emotion_graph_loc, "ad_placement_report": final_ad_palcement}}
+            return {"result": placement_pipeline.run_pipeline(context_engine, video_id, ads_id)}
 
     else:
         return {"result": "No file or video_id provided. Either provide one of them"}
 
+UPLOADS_DIR = os.getenv("UPLOADS_DIR", "uploads")
+
+def _save_and_upload_main(file: UploadFile) -> tuple:
+    """(local copy path, TwelveLabs video id) of an uploaded main video"""
+    source_path = _save_main_upload(file)
+    with open(source_path, "rb") as f:
+        return source_path, context_engine.upload_vid(f)
+
+def _save_main_upload(file: UploadFile) -> str:
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    extension = os.path.splitext(file.filename or "")[1] or ".mp4"
+    path = os.path.join(UPLOADS_DIR, f"{uuid.uuid4().hex}{extension}")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+    return path
+
+@app.post("/ad_placement/jobs")
+async def create_ad_placement_job(request: Request, file: UploadFile = File(None), video_id: str = "",
+                                  window_seconds: float = 0,
+                                  emotion_source: str = placement_pipeline.EMOTION_SOURCE_LLM,
+                                  priority: str = PRIORITY_INTERACTIVE):
+    """
+    Start ad placement as a background job and return its id immediately.
+    Poll /ad_placement/jobs/{job_id} or stream /ad_placement/jobs/{job_id}/events for progress.
+    For long-form uploads pass window_seconds to analyze overlapping windows in parallel.
+    emotion_source: "llm", "audio" (fast local curve) or "calibrated"; local modes need a file upload.
+    priority: "interactive" or "batch" (bulk re-analysis yields provider quota to live traffic).
+    Returns 429 with Retry-After while the provider queues for that priority are full.
+    """
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+    if emotion_source not in placement_pipeline.EMOTION_SOURCES:
+        raise HTTPException(status_code=400,
+                            detail=f"emotion_source must be one of {', '.join(placement_pipeline.EMOTION_SOURCES)}")
+    if window_seconds > 0 and not file:
+        raise HTTPException(status_code=400, detail="window_seconds needs a file upload; windows are clipped locally")
+    scheduler.admit(priority)
+    source_path = None
+    if file:
+        # Keep a local copy: windowing, shot detection and audio analysis read the file itself.
+        # Copying and uploading block, so they run off the event loop
+        source_path, video_id = await run_in_threadpool(_save_and_upload_main, file)
+    if not video_id:
+        raise HTTPException(status_code=400, detail="No file or video_id provided. Either provide one of them")
+
+    params = {"video_id": video_id, "ads_id": placement_pipeline.default_ads_id(), "emotion_source": emotion_source,
+              "priority": priority, "tenant": request_tenant(request)}
+    if source_path:
+        params["source_path"] = source_path
+    if window_seconds > 0:
+        params["window_seconds"] = window_seconds
+    job_id = placement_jobs.submit(params)
+    return {"job_id": job_id, "video_id": video_id, "status_url": f"/ad_placement/jobs/{job_id}",
+            "events_url": f"/ad_placement/jobs/{job_id}/events"}
+
+@app.get("/ad_placement/jobs/{job_id}")
+async def get_ad_placement_job(job_id: str):
+    """Job status with per-stage progress and whatever partial results exist so far"""
+    job = placement_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    job["result"] = placement_pipeline.format_job_result(job.pop("results"))
+    return job
+
+@app.post("/ad_placement/jobs/{job_id}/retry")
+async def retry_ad_placement_job(job_id: str):
+    """Re-run a failed job from the stage that failed"""
+    if not placement_jobs.retry(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not in a failed state")
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/ad_placement/jobs/{job_id}/events")
+async def stream_ad_placement_job(job_id: str, poll_interval: float = 0.5):
+    """Server-Sent-Events stream: one event per stage transition, partial results included"""
+    if not placement_jobs.get(job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def event_stream():
+        last_update = None
+        while True:
+            job = placement_jobs.get(job_id)
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                # Only ship the fields each stage has produced so far
+                job["result"] = placement_pipeline.format_job_result(job.pop("results"), produced_only=True)
+                yield format_sse("progress", job)
+                if job["status"] in (JOB_COMPLETED, JOB_FAILED):
+                    yield format_sse(job["status"], {"job_id": job_id})
+                    return
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/ad_decision")
+async def ad_decision(video_id: str, t: float, viewer_id: Optional[str] = None):
+    """What ad to play at time t of a main video, with per-viewer frequency capping and pacing"""
+    # In memory; the shared store is read at most every few seconds per video, off the event loop
+    now = time.time()
+    if ad_decisions.needs_refresh(video_id, now):
+        await run_in_threadpool(ad_decisions.plan, video_id, now)
+    return ad_decisions.decide(video_id, t, viewer_id, now)
+
+@app.get("/placement_plans/{video_id}")
+async def get_placement_plan(video_id: str):
+    plan = await run_in_threadpool(ad_decisions.plan, video_id)
+    if not plan:
+        raise HTTPException(status_code=404, detail=f"No compiled placement plan for {video_id}")
+    return plan.to_dict()
+
+@app.get("/scheduler")
+async def get_scheduler_status():
+    """Per-provider slots, queues and token budgets of the outbound call scheduler"""
+    return scheduler.status()
+
+@app.get("/speculative")
+async def get_speculative_status(video_id: Optional[str] = None):
+    """Progress of speculative pre-analysis, for one video or all of them"""
+    if speculative is None:
+        raise HTTPException(status_code=404, detail="Speculative analysis is disabled (set SPECULATIVE_ANALYSIS=on)")
+    return speculative.status(video_id)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint: provider latency/errors/tokens, queues, in-flight work, caches"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# Live sources must resolve into one of these directories (os.pathsep-separated)
+LIVE_SOURCE_DIRS = [os.path.realpath(path) for path in os.getenv("LIVE_SOURCE_DIRS", UPLOADS_DIR).split(os.pathsep) if path]
+# Finished sessions stay readable this long for late subscribers, then are dropped
+LIVE_SESSION_TTL = float(os.getenv("LIVE_SESSION_TTL", "600"))
+
+live_sessions = {}
+metrics.in_flight.set_function(lambda: sum(1 for session in live_sessions.values() if not session.finished), scope="live_sessions")
+
+def _evict_live_sessions() -> None:
+    now = time.time()
+    for session_id, session in list(live_sessions.items()):
+        if session.finished and now - session.finished_at > LIVE_SESSION_TTL:
+            live_sessions.pop(session_id, None)
+
+@app.post("/live/sessions")
+async def create_live_session(request: LiveSessionRequest):
+    """
+    Start incremental ad-opportunity detection on a live source (a local file under
+    LIVE_SOURCE_DIRS, default the uploads directory, replayed at real-time speed).
+    Events use the ad ranking of the latest completed placement job (of videoId, if given);
+    409 until one exists.
+    """
+    _evict_live_sessions()
+    source = allowed_path(request.source, LIVE_SOURCE_DIRS)
+    if source is None:
+        raise HTTPException(status_code=403, detail="Source is not a file in the allowed live source directories")
+    if not ffmpeg_available():
+        raise HTTPException(status_code=503, detail="ffmpeg/ffprobe not found on PATH")
+    ranking = await run_in_threadpool(load_ranking, None, placement_jobs.store, request.videoId)
+    if not ranking:
+        raise HTTPException(status_code=409, detail="No completed placement job has ranked the ad pool yet")
+
+    session_id = str(uuid.uuid4())
+    session = LiveAdSession(
+        RealtimeChunkReader(source, request.chunkSeconds, request.speed),
+        GeminiChunkScorer(context_engine.gemini_client),
+        ranking,
+        min_spacing=request.minSpacing
+    )
+    live_sessions[session_id] = session
+    session.start()
+    return {"session_id": session_id, "events_url": f"/live/sessions/{session_id}/events"}
+
+@app.get("/live/sessions/{session_id}/events")
+async def stream_live_session(session_id: str):
+    """Server-Sent-Events stream of ad opportunities as they are detected"""
+    _evict_live_sessions()
+    session = live_sessions.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Live session {session_id} not found")
+
+    async def event_stream():
+        seen = 0
+        while True:
+            events = await run_in_threadpool(session.wait_for_events, seen)
+            for event in events:
+                yield format_sse("ad_opportunity", event)
+            seen += len(events)
+            if session.finished and seen == len(session.events):
+                yield format_sse("failed" if session.error else "completed",
+                                 {"session_id": session_id, "events": seen, "error": session.error})
+                return
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/get_file_ad", response_model=OutputData)
 async def get_file_ad(file: UploadFile = File(...)):
-    def process_ad(file: UploadFile) -> List[dict]:
-        print(UploadFile)
-        ad_id = context_engine.upload_ad(file.file)
-        return {"ad_id": ad_id}
-
-    result = process_ad(file)
+    """
+    Upload an ad, index it in TwelveLabs and ingest it: probe metadata is cached right away,
+    normalization to the house profile and HLS segmentation continue in the background
+    """
+    def process_ad(file: UploadFile) -> dict:
+        path = ad_ingestor.save_upload(file.file, file.filename)
+        with open(path, "rb") as f:
+            ad_id = context_engine.upload_ad(f)
+        ad_id = ad_id or os.path.splitext(os.path.basename(path))[0]
+        record = ad_ingestor.ingest(ad_id, path)
+        return _ad_summary(record)
+
+    result = await run_in_threadpool(process_ad, file)
     return {"result": result}
 
+def _ad_summary(record: dict) -> dict:
+    probe = record.get("probe") or {}
+    return {
+        "ad_id": record["ad_id"],
+        "ingest_status": record["status"],
+        "duration": probe.get("duration"),
+        "video": probe.get("video"),
+        "audio": probe.get("audio"),
+        "gop": record.get("gop"),
+        "normalized": record.get("normalized_path") is not None,
+        "error": record.get("error")
+    }
+
+@app.get("/ads/{ad_id}", response_model=OutputData)
+async def get_ad_metadata(ad_id: str):
+    """Cached ingest metadata for an ad"""
+    record = ad_ingestor.cache.get(ad_id)
+    if not record:
+        raise HTTPException(status_code=404, detail=f"Ad {ad_id} has not been ingested")
+    return {"result": _ad_summary(record)}
+
+def _build_stitch_items(request: StitchingRequest) -> Optional[List[dict]]:
+    """Map the sequence onto main-video ranges and ad sources; None if a source isn't readable"""
+    main_segments = {seg.get("id"): seg for seg in request.mainVideo.get("segments", [])}
+    ads = {ad.id: ad for ad in request.adSegments}
+    items = []
+    for seq_item in request.sequence:
+        if seq_item.type == 'ad':
+            ad = ads.get(seq_item.id)
+            # Prefer the ingested (house-profile) copy when the ad went through /get_file_ad
+            ingest_id = (ad.adData.get("ad_id") or ad.adData.get("id")) if ad else None
+            source = ad_ingestor.best_source(ingest_id) if ingest_id else None
+            source = source or (resolve_source(ad.adData) if ad else None)
+            if not source:
+                return None
+            items.append({"id": seq_item.id, "type": "ad", "source": source})
+        else:
+            segment = main_segments.get(seq_item.id, {})
+            items.append({
+                "id": seq_item.id,
+                "type": "video",
+                "start": float(segment.get("start", seq_item.startTime)),
+                "end": float(segment.get("end", seq_item.endTime))
+            })
+    return items
+
+def _retime_sequence(processed_sequence: List[dict], stitched_items: List[dict]) -> None:
+    """Rewrite sequence offsets from the durations of the segments actually stitched"""
+    offset = 0.0
+    for processed_item, stitched_item in zip(processed_sequence, stitched_items):
+        processed_item["startTime"] = offset
+        processed_item["endTime"] = offset + stitched_item["duration"]
+        processed_item["duration"] = stitched_item["duration"]
+        offset += stitched_item["duration"]
+
 @app.post("/create-stitched-video", response_model=StitchingResponse)
-async def create_stitched_video(request: StitchingRequest):
+async def create_stitched_video(request: StitchingRequest, http_request: Request):
     """
     Create a stitched video from main video segments and ad segments
     """
@@ -171,16 +506,16 @@ async def create_stitched_video(request: StitchingRequest):
         # Generate unique video ID
         stitched_video_id = f"stitched_{int(time.time())}_{str(uuid.uuid4())[:8]}"
         
-        print(f"=== STITCHING REQUEST RECEIVED ===")
-        print(f"Creating stitched video: {stitched_video_id}")
-        print(f"Main video: {request.mainVideo.get('url', 'No URL')}")
-        print(f"Ad segments: {len(request.adSegments)}")
-        print(f"Sequence items: {len(request.sequence)}")
-        print(f"Metadata: {request.metadata}")
+        logger.info("Stitching request", extra={
+            "stitched_video_id": stitched_video_id,
+            "main_video": request.mainVideo.get('url', 'No URL'),
+            "ad_segments": len(request.adSegments),
+            "sequence_items": len(request.sequence),
+        })
         
         # Debug: Print sequence details
         for i, seq in enumerate(request.sequence):
-            print(f"  Sequence {i}: {seq.id} ({seq.type}) - {seq.startTime}s to {seq.endTime}s")
+            logger.debug(f"  Sequence {i}: {seq.id} ({seq.type}) - {seq.startTime}s to {seq.endTime}s")
         
         # Validate input data
         if not request.mainVideo or not request.sequence:
@@ -215,20 +550,46 @@ async def create_stitched_video(request: StitchingRequest):
             processed_sequence.append(processed_item)
             total_duration = end_time_seg
         
-        # Simulate video processing time
+        # Stitch by stream copy when every source is readable locally or over http(s)
+        main_source = resolve_source(request.mainVideo)
+        stitch_items = _build_stitch_items(request) if main_source else None
+        stitch_result = None
+        stitching_mode = "passthrough"
+        if stitch_items is not None and ffmpeg_available():
+            try:
+                stitch_result = await run_in_threadpool(stitcher.stitch, main_source, stitch_items, stitched_video_id)
+                stitching_mode = "stream_copy"
+            except StitchingError as e:
+                logger.warning(f"Stream-copy stitching failed, falling back to passthrough: {e}")
+
         processing_time = time.time() - start_time
-        
-        # Create stitched video URL (in production, this would be the actual processed video)
-        stitched_video_url = request.mainVideo.get('url', '')
-        
+
+        if stitch_result:
+            # Re-time the sequence from the keyframe-aligned cuts that were actually used
+            _retime_sequence(processed_sequence, stitch_result["items"])
+            total_duration = stitch_result["duration"]
+            stitched_video_url = f"{str(http_request.base_url).rstrip('/')}/stitched/{os.path.basename(stitch_result['path'])}"
+            video_info = stitch_result["video"]
+            quality = f"{video_info['height']}p"
+            codec = video_info["codec_name"]
+            reencoded_segments = stitch_result["reencoded_segments"]
+        else:
+            # No stitched file: hand back the main video and report what we actually know
+            stitched_video_url = request.mainVideo.get('url', '')
+            quality = "unknown"
+            codec = "unknown"
+            reencoded_segments = []
+
         # Prepare processing results
         processing_results = {
             "videoSegments": len([s for s in request.sequence if s.type == 'video']),
             "adSegments": len([s for s in request.sequence if s.type == 'ad']),
             "transitions": len(request.sequence) - 1,
-            "quality": "1080p",
+            "quality": quality,
             "format": "mp4",
-            "codec": "h264",
+            "codec": codec,
+            "stitchingMode": stitching_mode,
+            "reencodedSegments": reencoded_segments,
             "totalDuration": total_duration,
             "processingTime": f"{processing_time:.2f}s"
         }
@@ -242,9 +603,8 @@ async def create_stitched_video(request: StitchingRequest):
             "stitchedVideoId": stitched_video_id
         }
         
-        print(f"Stitched video created successfully: {stitched_video_id}")
-        print(f"Total duration: {total_duration:.2f}s")
-        print(f"Processing time: {processing_time:.2f}s")
+        logger.info(f"Stitched video created successfully: {stitched_video_id}",
+                    extra={"total_duration": round(total_duration, 2), "processing_seconds": round(processing_time, 3)})
         
         return StitchingResponse(
             success=True,
@@ -256,7 +616,7 @@ async def create_stitched_video(request: StitchingRequest):
         )
         
     except Exception as e:
-        print(f"Error creating stitched video: {str(e)}")
+        logger.exception(f"Error creating stitched video: {str(e)}")
         return StitchingResponse(
             success=False,
             stitchedVideoId="",
@@ -266,6 +626,71 @@ async def create_stitched_video(request: StitchingRequest):
             processingResults={}
         )
 
+@app.post("/create-stitched-manifest", response_model=StitchingResponse)
+async def create_stitched_manifest(request: StitchingRequest, http_request: Request):
+    """
+    Virtual stitching: return an HLS playlist that interleaves pre-segmented main-video
+    and ad chunks. Sources are segmented once; playlists are cached by sequence hash.
+    """
+    start_time = time.time()
+    main_source = resolve_source(request.mainVideo)
+    stitch_items = _build_stitch_items(request) if main_source else None
+    if stitch_items is None:
+        return StitchingResponse(
+            success=False,
+            stitchedVideoId="",
+            stitchedVideoUrl="",
+            sequence=[],
+            metadata={"error": "Main video and ad sources must be uploaded files or URLs on an allowed host"},
+            processingResults={}
+        )
+
+    try:
+        manifest = await run_in_threadpool(manifest_stitcher.stitch, main_source, stitch_items)
+    except StitchingError as e:
+        logger.exception(f"Error creating stitched manifest: {str(e)}")
+        return StitchingResponse(
+            success=False,
+            stitchedVideoId="",
+            stitchedVideoUrl="",
+            sequence=[],
+            metadata={"error": str(e)},
+            processingResults={}
+        )
+
+    processed_sequence = [{"id": item["id"], "order": i, "type": item["type"], "processed": True}
+                          for i, item in enumerate(stitch_items)]
+    _retime_sequence(processed_sequence, manifest["items"])
+    processing_time = time.time() - start_time
+    stitched_video_id = f"manifest_{manifest['hash']}"
+    manifest_url = f"{str(http_request.base_url).rstrip('/')}/hls/manifests/{os.path.basename(manifest['path'])}"
+
+    return StitchingResponse(
+        success=True,
+        stitchedVideoId=stitched_video_id,
+        stitchedVideoUrl=manifest_url,
+        sequence=processed_sequence,
+        metadata={
+            **request.metadata,
+            "totalDuration": manifest["duration"],
+            "processingTime": f"{processing_time:.2f}s",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "stitchedVideoId": stitched_video_id
+        },
+        processingResults={
+            "videoSegments": len([s for s in request.sequence if s.type == 'video']),
+            "adSegments": len([s for s in request.sequence if s.type == 'ad']),
+            "transitions": len(request.sequence) - 1,
+            "format": "hls",
+            "segmentType": "fmp4",
+            "stitchingMode": "manifest",
+            "manifestCached": manifest["cached"],
+            "sequenceHash": manifest["hash"],
+            "totalDuration": manifest["duration"],
+            "processingTime": f"{processing_time:.2f}s"
+        }
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the FastAPI model API!"}
@@ -284,9 +709,6 @@ async def test_stitching():
 @app.post("/swayable", response_model=OutputData)
 async def swayableMetrics():
     import pandas as pd
-    from sklearn.model_selection import train_test_split
-    from sklearn.linear_model import LinearRegression
-    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
     data = pd.read_csv("Patagonia-PR Results.csv")
     data['lift'] = (data['testGroupMean'] - data['baselineMean']) / data['baselineMean']
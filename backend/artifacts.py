@@ -0,0 +1,82 @@
+"""
+Per-request artifact context.
+Pipeline stages hand results to each other in memory through an ArtifactContext instead
+of fixed global files; persistence is optional and namespaced per job so concurrent
+requests never overwrite each other.
+"""
+
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+ARTIFACTS_ROOT = os.getenv("ARTIFACTS_DIR", "artifacts")
+
+
+class ArtifactContext:
+    """In-memory artifact map with optional on-disk persistence under root/namespace"""
+
+    def __init__(self, namespace: str = None, persist: bool = False, root: str = None):
+        self.namespace = namespace or uuid.uuid4().hex
+        self.persist = persist
+        self.root = root or ARTIFACTS_ROOT
+        self._artifacts: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, value: Any, filename: str = None) -> Optional[str]:
+        """Store an artifact; when persisting, also write it to disk and return its path"""
+        with self._lock:
+            self._artifacts[name] = value
+        if self.persist and filename:
+            return self.save(name, filename)
+        return None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        with self._lock:
+            if name in self._artifacts:
+                return self._artifacts[name]
+        return default
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._artifacts
+
+    def path(self, filename: str) -> str:
+        """Namespaced path for a file belonging to this context"""
+        directory = os.path.join(self.root, self.namespace)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    def save(self, name: str, filename: str) -> str:
+        """Write an artifact to its namespaced file (JSON for dict/list, raw for bytes/str)"""
+        value = self.get(name)
+        file_path = self.path(filename)
+        if isinstance(value, bytes):
+            with open(file_path, "wb") as f:
+                f.write(value)
+        elif isinstance(value, str):
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(value)
+        else:
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, indent=2, ensure_ascii=False)
+        return file_path
+
+    def load(self, name: str, filename: str, binary: bool = False) -> Any:
+        """Load a persisted artifact back into memory (used when resuming a job)"""
+        file_path = os.path.join(self.root, self.namespace, filename)
+        if not os.path.exists(file_path):
+            return None
+        if binary:
+            with open(file_path, "rb") as f:
+                value = f.read()
+        elif filename.endswith(".json"):
+            with open(file_path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                value = f.read()
+        with self._lock:
+            self._artifacts[name] = value
+        return value
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Audio-energy excitement curve.
+Decodes the main video's audio track once and computes per-second RMS energy, spectral
+flux and a voice-band pitch proxy with vectorized NumPy FFTs, then fuses them into a
+0-10 curve on the same scale as the Gemini emotion timeline. Usable on its own as a
+fast local emotion signal or to calibrate the LLM curve.
+
+Usage:
+    python audio_excitement.py match.mp4 > emotion_timeline.csv
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+from stitching import FFMPEG, StitchingError
+from timecodes import format_timestamp
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 1024
+HOP_SIZE = 512
+# Frames windowed and transformed at once, so peak memory (~15 MB) does not grow with the duration
+BLOCK_FRAMES = 512
+# Commentator/crowd voice fundamental range used for the pitch proxy
+PITCH_BAND = (80.0, 500.0)
+FEATURE_WEIGHTS = {"energy": 0.5, "flux": 0.3, "pitch": 0.2}
+SMOOTHING_SECONDS = 3
+
+
+def decode_audio(source: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Mono float32 samples of the first audio track via an ffmpeg f32le pipe"""
+    process = subprocess.run(
+        [FFMPEG, "-nostdin", "-v", "error", "-i", source, "-map", "0:a:0", "-vn",
+         "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if process.returncode != 0:
+        raise StitchingError(f"audio decode failed: {process.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+def frame_features(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Dict[str, np.ndarray]:
+    """Per-frame RMS, spectral flux and voice-band dominant frequency from batched rFFTs over blocks of frames"""
+    if len(samples) < FRAME_SIZE:
+        samples = np.pad(samples, (0, FRAME_SIZE - len(samples)))
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    count = len(frames)
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    frequencies = np.fft.rfftfreq(FRAME_SIZE, 1.0 / sample_rate)
+    band = (frequencies >= PITCH_BAND[0]) & (frequencies <= PITCH_BAND[1])
+
+    rms = np.empty(count)
+    flux = np.empty(count)
+    pitch = np.empty(count)
+    previous = None
+    for start in range(0, count, BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES]
+        end = start + len(block)
+        rms[start:end] = np.sqrt(np.mean(np.square(block, dtype=np.float64), axis=1))
+
+        spectrum = np.abs(np.fft.rfft(block * window, axis=1))
+        normalized = spectrum / (spectrum.sum(axis=1, keepdims=True) + 1e-9)
+        # Flux of the block's first frame is measured against the previous block's last frame
+        reference = normalized[:1] if previous is None else previous
+        flux[start:end] = np.maximum(np.diff(normalized, axis=0, prepend=reference), 0).sum(axis=1)
+        previous = normalized[-1:]
+        pitch[start:end] = frequencies[band][np.argmax(spectrum[:, band], axis=1)]
+
+    # Pitch is meaningless in near-silent frames
+    pitch = np.where(rms > np.percentile(rms, 20), pitch, np.nan)
+    return {"energy": rms, "flux": flux, "pitch": pitch}
+
+
+def per_second(features: Dict[str, np.ndarray], sample_rate: int = SAMPLE_RATE) -> Dict[str, np.ndarray]:
+    """Aggregate frame features into 1-second bins (energy in dB)"""
+    frames_per_second = sample_rate / HOP_SIZE
+    seconds = int(np.ceil(len(features["energy"]) / frames_per_second))
+    bins = (np.arange(len(features["energy"])) / frames_per_second).astype(int)
+    counts = np.maximum(np.bincount(bins, minlength=seconds), 1)
+
+    energy = np.bincount(bins, weights=features["energy"] ** 2, minlength=seconds) / counts
+    flux = np.bincount(bins, weights=features["flux"], minlength=seconds) / counts
+    voiced = ~np.isnan(features["pitch"])
+    pitch_counts = np.bincount(bins[voiced], minlength=seconds)
+    pitch = np.bincount(bins[voiced], weights=features["pitch"][voiced], minlength=seconds) / np.maximum(pitch_counts, 1)
+    pitch[pitch_counts == 0] = np.nan
+    return {"energy": 10 * np.log10(energy + 1e-10), "flux": flux, "pitch": pitch}
+
+
+def _robust_scale(values: np.ndarray) -> np.ndarray:
+    """Map the 5th-95th percentile range onto 0-1"""
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return np.zeros_like(values)
+    low, high = np.percentile(finite, [5, 95])
+    scaled = (values - low) / (high - low) if high > low else np.full_like(values, 0.5)
+    return np.clip(np.nan_to_num(scaled, nan=0.0), 0.0, 1.0)
+
+
+def excitement_curve(source: str, sample_rate: int = SAMPLE_RATE) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """0-10 excitement value per second of the source, plus timing stats"""
+    started = time.time()
+    samples = decode_audio(source, sample_rate)
+    decoded = time.time()
+    curve = excitement_from_samples(samples, sample_rate)
+    finished = time.time()
+    duration = len(samples) / sample_rate
+    return curve, {
+        "duration": round(duration, 2),
+        "decode_seconds": round(decoded - started, 3),
+        "analysis_seconds": round(finished - decoded, 3),
+        "realtime_factor": round(duration / (finished - started), 1) if finished > started else None
+    }
+
+
+def excitement_from_samples(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    seconds = per_second(frame_features(samples, sample_rate), sample_rate)
+    fused = sum(weight * _robust_scale(seconds[name]) for name, weight in FEATURE_WEIGHTS.items())
+    kernel = np.ones(SMOOTHING_SECONDS) / SMOOTHING_SECONDS
+    smoothed = np.convolve(np.pad(fused, SMOOTHING_SECONDS // 2, mode="edge"), kernel, mode="valid")
+    return np.round(smoothed[:len(fused)] * 10, 1)
+
+
+def curve_to_csv(curve, labels: List[str] = None) -> str:
+    """Render values as the emotion timeline CSV (one header row, one row per second by default)"""
+    labels = labels or [format_timestamp(second) for second in range(len(curve))]
+    lines = ["Timestamp,Emotion"] + [f"{label},{float(value):.1f}" for label, value in zip(labels, curve)]
+    return "\n".join(lines)
+
+
+def calibrate_curve(llm_points: List[Tuple[float, float]], audio_curve: np.ndarray,
+                    audio_weight: float = 0.4) -> Tuple[List[Tuple[float, float]], Dict[str, float]]:
+    """
+    Blend the LLM timeline with the audio curve. The audio curve is first rescaled to the
+    LLM curve's mean/spread so only its shape contributes; returns the blended points
+    and the correlation between the two signals.
+    """
+    if not llm_points or not len(audio_curve):
+        return llm_points, {"correlation": None}
+    times = np.array([seconds for seconds, _ in llm_points])
+    llm = np.array([value for _, value in llm_points])
+    audio = np.interp(times, np.arange(len(audio_curve)), audio_curve)
+
+    audio_std = audio.std()
+    rescaled = (audio - audio.mean()) / audio_std * llm.std() + llm.mean() if audio_std > 0 else llm
+    blended = np.clip((1 - audio_weight) * llm + audio_weight * rescaled, 0.0, 10.0)
+    correlation = float(np.corrcoef(llm, audio)[0, 1]) if audio_std > 0 and llm.std() > 0 else None
+    return [(float(t), round(float(v), 1)) for t, v in zip(times, blended)], {"correlation": correlation}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute a 0-10 audio excitement curve")
+    parser.add_argument("source", help="Local video or audio file")
+    args = parser.parse_args()
+
+    curve, stats = excitement_curve(args.source)
+    print(curve_to_csv(curve))
+    print(f"{stats['duration']}s of audio in {stats['decode_seconds'] + stats['analysis_seconds']:.2f}s "
+          f"({stats['realtime_factor']}x real time)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
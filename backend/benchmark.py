@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the analysis hot paths.
+Runs persona_main, EmbeddingSimilarityAnalyzer.generate_analysis_report and the /ad_placement
+flow (placement_pipeline.run_pipeline, which the endpoint calls) against the provider fakes in
+provider_fakes.py, at several ad-pool sizes, and reports throughput and p50/p95/p99 latency.
+Results are written as JSON so a later run can be compared against them.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --pool-sizes 3,10,30 --iterations 10 --latency-scale 0.05
+    python benchmark.py --error-rate 0.02 --output bench_new.json --compare bench_baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Callable
+
+import numpy as np
+
+# Quiet the per-call INFO logging before any backend module configures it
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from provider_fakes import FakeProviders
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ("persona_main", "similarity_report", "ad_placement")
+MAIN_VIDEO_ID = "main-benchmark"
+# A regression is flagged when p95 or throughput moves by more than this fraction
+REGRESSION_THRESHOLD = 0.10
+
+
+def ad_pool(size: int) -> List[str]:
+    return [f"ad-{number}" for number in range(size)]
+
+
+def summarize_samples(samples: List[float], errors: int, wall_seconds: float) -> Dict[str, Any]:
+    latencies = np.array(samples) if samples else np.zeros(1)
+    return {
+        "iterations": len(samples) + errors,
+        "errors": errors,
+        "error_rate": round(errors / max(1, len(samples) + errors), 4),
+        "throughput_per_second": round(len(samples) / wall_seconds, 4) if wall_seconds else None,
+        "mean_seconds": round(float(latencies.mean()), 4),
+        "p50_seconds": round(float(np.percentile(latencies, 50)), 4),
+        "p95_seconds": round(float(np.percentile(latencies, 95)), 4),
+        "p99_seconds": round(float(np.percentile(latencies, 99)), 4),
+    }
+
+
+def run_scenario(fn: Callable[[int], Any], iterations: int, concurrency: int) -> Dict[str, Any]:
+    """Call fn(iteration) `iterations` times on `concurrency` threads"""
+    samples, errors = [], []
+
+    def timed(iteration):
+        started = time.perf_counter()
+        try:
+            fn(iteration)
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    # The analysis code prints progress; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, range(iterations)))
+    result = summarize_samples(samples, len(errors), time.perf_counter() - started)
+    if errors:
+        result["sample_errors"] = sorted(set(errors))[:5]
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    fakes = FakeProviders(scale=args.latency_scale, error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate, seed=args.seed, root=BACKEND_DIR).start()
+
+    # Personas and artifacts are read/written relative to the working directory
+    original_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    os.makedirs(os.path.join(workdir, "json"))
+    shutil.copy(os.path.join(BACKEND_DIR, "persona_categories.json"), os.path.join(workdir, "json"))
+    os.chdir(workdir)
+
+    import placement_pipeline
+    from artifacts import ArtifactContext
+    from embedding_similarity_analysis import EmbeddingSimilarityAnalyzer
+    from main import Context_engine
+    from run_multi_video_analysis import persona_main
+
+    context_engine = Context_engine()
+    fakes.attach(context_engine)
+
+    results = {}
+    try:
+        for size in args.pool_sizes:
+            ads_id = ad_pool(size)
+            print(f"Ad pool of {size}")
+            results[str(size)] = {}
+
+            if "persona_main" in args.scenarios or "similarity_report" in args.scenarios:
+                # One untimed run doubles as warm-up and as input for the similarity report
+                with contextlib.redirect_stdout(io.StringIO()):
+                    comprehensive = persona_main(MAIN_VIDEO_ID, ads_id, ArtifactContext())
+
+            if "persona_main" in args.scenarios:
+                results[str(size)]["persona_main"] = run_scenario(
+                    lambda _: persona_main(MAIN_VIDEO_ID, ads_id, ArtifactContext()),
+                    args.iterations, args.concurrency)
+
+            if "similarity_report" in args.scenarios:
+                results[str(size)]["similarity_report"] = run_scenario(
+                    lambda _: EmbeddingSimilarityAnalyzer(results=comprehensive).generate_analysis_report(),
+                    args.iterations * 10, args.concurrency)
+
+            if "ad_placement" in args.scenarios:
+                results[str(size)]["ad_placement"] = run_scenario(
+                    lambda _: placement_pipeline.run_pipeline(context_engine, MAIN_VIDEO_ID, ads_id),
+                    args.iterations, args.concurrency)
+
+            for scenario, stats in results[str(size)].items():
+                print(f"  {scenario:<18} {stats['throughput_per_second'] or 0:>8.2f}/s  "
+                      f"p50 {stats['p50_seconds']:.3f}s  p95 {stats['p95_seconds']:.3f}s  "
+                      f"p99 {stats['p99_seconds']:.3f}s  errors {stats['errors']}")
+    finally:
+        os.chdir(original_cwd)
+        fakes.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "config": {
+                "pool_sizes": args.pool_sizes,
+                "iterations": args.iterations,
+                "concurrency": args.concurrency,
+                "latency_scale": args.latency_scale,
+                "error_rate": args.error_rate,
+                "throttle_rate": args.throttle_rate,
+                "seed": args.seed
+            }
+        },
+        "results": results
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], label: str = "pool") -> List[str]:
+    """Print p95/throughput deltas against a baseline run; returns the regressions found.
+
+    Both runs are {"metadata": ..., "results": {step: {scenario: stats}}}; label names the step.
+    """
+    if baseline["metadata"]["config"] != current["metadata"]["config"]:
+        print("WARNING: baseline was run with a different configuration")
+
+    regressions = []
+    print(f"\nCompared with {baseline['metadata'].get('git_revision')} ({baseline['metadata']['timestamp']}):")
+    for size, scenarios in current["results"].items():
+        for scenario, stats in scenarios.items():
+            before = baseline["results"].get(size, {}).get(scenario)
+            if not before:
+                continue
+            p95_change = stats["p95_seconds"] / before["p95_seconds"] - 1 if before["p95_seconds"] else 0.0
+            throughput_change = (stats["throughput_per_second"] / before["throughput_per_second"] - 1
+                                 if before["throughput_per_second"] else 0.0)
+            flag = ""
+            if p95_change > REGRESSION_THRESHOLD or throughput_change < -REGRESSION_THRESHOLD:
+                flag = "  REGRESSION"
+                regressions.append(f"{scenario}@{size}")
+            print(f"  {scenario:<22} {label} {size:>4}: p95 {p95_change:+7.1%}  throughput {throughput_change:+7.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis paths against provider fakes")
+    parser.add_argument("--pool-sizes", default="3,10,30",
+                        type=lambda text: [int(size) for size in text.split(",")],
+                        help="Comma-separated ad-pool sizes")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per scenario and pool size")
+    parser.add_argument("--concurrency", type=int, default=1, help="Runs in flight at once")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda text: [name for name in text.split(",") if name],
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--latency-scale", type=float, default=0.05,
+                        help="Multiplier on the recorded provider latencies (1.0 = production-like)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of provider calls failing with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of provider calls failing with 429")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("Analysis benchmark")
+    print("=" * 50)
+
+    report = run_benchmarks(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Central scheduler for outbound model calls (TwelveLabs, Gemini, Bedrock).
+Every provider call takes a slot here first. Each provider has a concurrency limit and a
+tokens-per-minute bucket; waiting calls are served interactive-before-batch, round-robin
+across tenants within a class, and batch work may only use part of the concurrency so
+live traffic always has headroom. When a queue is full or a wait runs too long callers
+get SchedulerBusy with a retry-after estimate (the API turns it into a 429).
+
+Priority and tenant travel with the request context:
+
+    with scheduling(PRIORITY_BATCH, tenant="nightly-reanalysis"):
+        persona_main(...)
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+# Dispatch order: earlier classes are always served first
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+DEFAULT_TENANT = "default"
+
+# Work outside an HTTP request or placement job (CLIs, re-analysis scripts) is batch
+call_priority: contextvars.ContextVar = contextvars.ContextVar("call_priority", default=PRIORITY_BATCH)
+call_tenant: contextvars.ContextVar = contextvars.ContextVar("call_tenant", default=DEFAULT_TENANT)
+# The slot the current provider call holds; pool threads see it through structured_logging.propagate
+current_ticket: contextvars.ContextVar = contextvars.ContextVar("current_ticket", default=None)
+_usage_lock = threading.Lock()
+
+DEFAULT_CONCURRENCY = {"twelvelabs": 8, "gemini": 8, "bedrock": 8}
+# Reserved per call on top of the prompt estimate, until the provider reports real usage
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("SCHEDULER_EXPECTED_OUTPUT_TOKENS", "1000"))
+MAX_WAIT_SECONDS = float(os.getenv("SCHEDULER_MAX_WAIT", "120"))
+
+queued_calls = metrics.REGISTRY.gauge(
+    "scheduler_queued_calls", "Provider calls waiting for a scheduler slot", ("provider", "priority"))
+running_calls = metrics.REGISTRY.gauge(
+    "scheduler_running_calls", "Provider calls holding a scheduler slot", ("provider", "priority"))
+tokens_available = metrics.REGISTRY.gauge(
+    "scheduler_tokens_available", "Tokens left in the provider's per-minute budget", ("provider",))
+wait_seconds = metrics.REGISTRY.histogram(
+    "scheduler_wait_seconds", "Time calls spent waiting for a scheduler slot", ("provider", "priority"))
+rejections = metrics.REGISTRY.counter(
+    "scheduler_rejections_total", "Calls rejected for backpressure", ("provider", "priority", "reason"))
+
+
+class SchedulerBusy(Exception):
+    """Backpressure: the provider's queue is full or the wait exceeded its limit"""
+
+    def __init__(self, provider: str, reason: str, retry_after: float):
+        super().__init__(f"{provider} is saturated ({reason}); retry after {retry_after:.0f}s")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@contextmanager
+def scheduling(priority: str = None, tenant: str = None) -> Iterator[None]:
+    """Run a block (and the pool work it propagates to) under a priority class and tenant"""
+    tokens = []
+    if priority:
+        tokens.append((call_priority, call_priority.set(priority)))
+    if tenant:
+        tokens.append((call_tenant, call_tenant.set(tenant)))
+    try:
+        yield
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+
+class ProviderLimits:
+    def __init__(self, concurrency: int, tokens_per_minute: int = 0, batch_share: float = 0.5,
+                 max_queue: int = 256):
+        self.concurrency = concurrency
+        # 0 disables the token budget
+        self.tokens_per_minute = tokens_per_minute
+        # Largest fraction of the concurrency batch calls may hold at once
+        self.batch_share = batch_share
+        self.max_queue = max_queue
+
+    @classmethod
+    def from_env(cls, provider: str) -> "ProviderLimits":
+        prefix = f"SCHEDULER_{provider.upper()}_"
+        return cls(
+            concurrency=int(os.getenv(prefix + "CONCURRENCY", DEFAULT_CONCURRENCY.get(provider, 4))),
+            tokens_per_minute=int(os.getenv(prefix + "TPM", "0")),
+            batch_share=float(os.getenv(prefix + "BATCH_SHARE", "0.5")),
+            max_queue=int(os.getenv(prefix + "MAX_QUEUE", "256"))
+        )
+
+
+class _Waiter:
+    __slots__ = ("priority", "tenant", "tokens", "granted", "event")
+
+    def __init__(self, priority: str, tenant: str, tokens: int):
+        self.priority = priority
+        self.tenant = tenant
+        self.tokens = tokens
+        self.granted = False
+        self.event = threading.Event()
+
+
+class ProviderQueue:
+    """Slots and token budget for one provider, with per-priority, per-tenant wait queues"""
+
+    def __init__(self, provider: str, limits: ProviderLimits):
+        self.provider = provider
+        self.limits = limits
+        self.running = {priority: 0 for priority in PRIORITIES}
+        # priority -> tenant -> waiters; tenants rotate to the back after each grant
+        self.waiting: Dict[str, "OrderedDict[str, deque]"] = {priority: OrderedDict() for priority in PRIORITIES}
+        self.tokens = float(limits.tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._average_call_seconds = 1.0
+        self._lock = threading.Lock()
+        for priority in PRIORITIES:
+            queued_calls.set_function(lambda priority=priority: self.queued(priority),
+                                      provider=provider, priority=priority)
+            running_calls.set_function(lambda priority=priority: self.running[priority],
+                                       provider=provider, priority=priority)
+        if limits.tokens_per_minute:
+            tokens_available.set_function(lambda: self.tokens, provider=provider)
+
+    def queued(self, priority: str = None) -> int:
+        priorities = [priority] if priority else PRIORITIES
+        return sum(len(waiters) for p in priorities for waiters in self.waiting[p].values())
+
+    def _refill(self) -> None:
+        if not self.limits.tokens_per_minute:
+            return
+        now = time.monotonic()
+        rate = self.limits.tokens_per_minute / 60.0
+        self.tokens = min(float(self.limits.tokens_per_minute), self.tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _blocked_on(self, waiter: _Waiter) -> Optional[str]:
+        """Why the waiter can't start now (None if it can)"""
+        if sum(self.running.values()) >= self.limits.concurrency:
+            return "concurrency"
+        if waiter.priority != PRIORITY_INTERACTIVE:
+            batch_slots = max(1, int(self.limits.concurrency * self.limits.batch_share))
+            if self.running[waiter.priority] >= batch_slots:
+                return "batch_share"
+        # A call bigger than the whole budget runs once the bucket is full
+        if self.limits.tokens_per_minute and self.tokens < min(waiter.tokens, self.limits.tokens_per_minute):
+            return "tokens"
+        return None
+
+    def _dispatch(self) -> None:
+        """Grant slots in priority order, round-robin over tenants; caller holds the lock"""
+        self._refill()
+        for priority in PRIORITIES:
+            tenants = self.waiting[priority]
+            while tenants:
+                tenant, waiters = next(iter(tenants.items()))
+                waiter = waiters[0]
+                reason = self._blocked_on(waiter)
+                if reason == "batch_share":
+                    break
+                if reason:
+                    # Lower classes must not overtake a blocked higher-priority call
+                    return
+                waiters.popleft()
+                tenants.pop(tenant)
+                if waiters:
+                    tenants[tenant] = waiters
+                self.running[priority] += 1
+                self.tokens -= waiter.tokens if self.limits.tokens_per_minute else 0
+                waiter.granted = True
+                waiter.event.set()
+
+    def _retry_after(self, priority: str) -> float:
+        ahead = sum(self.queued(p) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(1.0, ahead / max(1, self.limits.concurrency) * self._average_call_seconds)
+
+    def acquire(self, priority: str, tenant: str, tokens: int, max_wait: float) -> float:
+        """Block until a slot is granted; returns the seconds waited"""
+        started = time.monotonic()
+        waiter = _Waiter(priority, tenant, tokens)
+        with self._lock:
+            if self.queued(priority) >= self.limits.max_queue:
+                rejections.inc(provider=self.provider, priority=priority, reason="queue_full")
+                raise SchedulerBusy(self.provider, "queue_full", self._retry_after(priority))
+            self.waiting[priority].setdefault(tenant, deque()).append(waiter)
+            self._dispatch()
+
+        while not waiter.granted:
+            remaining = max_wait - (time.monotonic() - started)
+            if remaining <= 0:
+                with self._lock:
+                    if not waiter.granted:
+                        waiters = self.waiting[priority].get(tenant)
+                        waiters.remove(waiter)
+                        if not waiters:
+                            self.waiting[priority].pop(tenant)
+                        rejections.inc(provider=self.provider, priority=priority, reason="timeout")
+                        raise SchedulerBusy(self.provider, "timeout", self._retry_after(priority))
+                break
+            # Token refills don't signal anyone, so waiters re-run dispatch periodically
+            if not waiter.event.wait(min(remaining, 0.25)):
+                with self._lock:
+                    self._dispatch()
+        return time.monotonic() - started
+
+    def release(self, priority: str, reserved: int, used: Optional[float], seconds: float) -> None:
+        with self._lock:
+            self.running[priority] -= 1
+            if self.limits.tokens_per_minute and used is not None:
+                # Settle the reservation against what the provider actually reported
+                self.tokens -= used - reserved
+            self._average_call_seconds = 0.8 * self._average_call_seconds + 0.2 * seconds
+            self._dispatch()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {
+                "running": dict(self.running),
+                "queued": {priority: self.queued(priority) for priority in PRIORITIES},
+                "tenants_waiting": {priority: list(self.waiting[priority]) for priority in PRIORITIES},
+                "concurrency": self.limits.concurrency,
+                "tokens_available": round(self.tokens) if self.limits.tokens_per_minute else None,
+                "tokens_per_minute": self.limits.tokens_per_minute or None
+            }
+
+
+class CallScheduler:
+    def __init__(self, limits: Dict[str, ProviderLimits] = None):
+        self._limits = limits or {}
+        self.queues: Dict[str, ProviderQueue] = {}
+        self._lock = threading.Lock()
+
+    def queue(self, provider: str) -> ProviderQueue:
+        with self._lock:
+            if provider not in self.queues:
+                limits = self._limits.get(provider) or ProviderLimits.from_env(provider)
+                self.queues[provider] = ProviderQueue(provider, limits)
+            return self.queues[provider]
+
+    @contextmanager
+    def slot(self, provider: str, prompt_tokens: int = 0, priority: str = None,
+             max_wait: float = None) -> Iterator[Dict[str, Any]]:
+        """
+        Hold a slot for one provider call. Yields a ticket; set ticket["usage"] to the
+        provider's usage dict (or call record_usage under the slot) so the token budget
+        is charged for real consumption.
+        """
+        priority = priority or call_priority.get()
+        tenant = call_tenant.get()
+        reserved = prompt_tokens + EXPECTED_OUTPUT_TOKENS
+        queue = self.queue(provider)
+        waited = queue.acquire(priority, tenant, reserved, MAX_WAIT_SECONDS if max_wait is None else max_wait)
+        wait_seconds.observe(waited, provider=provider, priority=priority)
+
+        ticket = {"provider": provider, "priority": priority, "tenant": tenant, "waited": waited}
+        token = current_ticket.set(ticket)
+        started = time.monotonic()
+        try:
+            yield ticket
+        finally:
+            current_ticket.reset(token)
+            usage = ticket.get("usage")
+            used = ticket.get("used")
+            if used is None and usage:
+                used = sum(metrics.token_counts(usage).values())
+            queue.release(priority, reserved, used, time.monotonic() - started)
+
+    def admit(self, priority: str = PRIORITY_INTERACTIVE) -> None:
+        """Reject new work up front when any provider's queue for this class is already full"""
+        for queue in list(self.queues.values()):
+            if queue.queued(priority) >= queue.limits.max_queue:
+                rejections.inc(provider=queue.provider, priority=priority, reason="admission")
+                raise SchedulerBusy(queue.provider, "admission", queue._retry_after(priority))
+
+    def status(self) -> Dict[str, Any]:
+        return {provider: queue.status() for provider, queue in list(self.queues.items())}
+
+
+scheduler = CallScheduler()
+
+
+def record_usage(usage: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Charge provider-reported usage to the slot held by the current call (hedges add up); returns usage"""
+    ticket = current_ticket.get()
+    if ticket is not None and usage:
+        with _usage_lock:
+            ticket["used"] = ticket.get("used", 0) + sum(metrics.token_counts(usage).values())
+    return usage
+
+
+def scheduled(provider: str, prompt_tokens: int = 0, **options):
+    """Shorthand for scheduler.slot(...)"""
+    return scheduler.slot(provider, prompt_tokens, **options)
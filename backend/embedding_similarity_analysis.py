@@ -4,13 +4,25 @@ Uses existing persona analysis data to create embeddings and calculate similarit
 """
 
 import json
+import sys
 from typing import Dict, Any
 
 class EmbeddingSimilarityAnalyzer:
-    def __init__(self, results_file: str = "json/comprehensive_video_analysis_results.json"):
-        """Initialize with existing analysis results"""
+    def __init__(self, results_file: str = "json/comprehensive_video_analysis_results.json",
+                 results: Dict[str, Any] = None, store=None):
+        """
+        Initialize with an in-memory results object, a PersonaScoreStore (scores are read from
+        its .npy columns instead of the JSON), or load existing results from file
+        """
         self.results_file = results_file
-        self.results = self._load_results()
+        self.store = store
+        if store is not None:
+            self.results = {}
+        else:
+            self.results = results if results is not None else self._load_results()
+
+    def has_results(self) -> bool:
+        return bool(self.store.videos) if self.store is not None else bool(self.results)
         
     def _load_results(self) -> Dict[str, Any]:
         """Load existing analysis results"""
@@ -23,6 +35,10 @@ class EmbeddingSimilarityAnalyzer:
     
     def _extract_content_overviews(self) -> Dict[str, str]:
         """Extract content overviews for each video"""
+        if self.store is not None:
+            overviews = self.store.combined_overviews()
+            return {video["video_name"]: overviews[video["video_key"]] for video in self.store.videos}
+
         content_overviews = {}
         
         for video_key, video_data in self.results.get("video_analyses", {}).items():
@@ -44,6 +60,12 @@ class EmbeddingSimilarityAnalyzer:
     
     def _extract_persona_affinity_scores(self) -> Dict[str, float]:
         """Extract persona affinity scores for each video"""
+        if self.store is not None:
+            # Same 40/60 weighting, computed over the store's score matrix
+            affinity = self.store.persona_affinity()
+            return {video["video_name"]: round(float(affinity[row]), 2)
+                    for row, video in enumerate(self.store.videos)}
+
         affinity_scores = {}
         
         for video_key, video_data in self.results.get("video_analyses", {}).items():
@@ -378,11 +400,17 @@ class EmbeddingSimilarityAnalyzer:
         return report
 
 def main():
-    """Main function to run embedding similarity analysis"""
-    
-    analyzer = EmbeddingSimilarityAnalyzer()
+    """Main function to run embedding similarity analysis
+
+    Usage: python embedding_similarity_analysis.py [persona_store_dir]
+    """
+    if len(sys.argv) > 1:
+        from persona_store import PersonaScoreStore
+        analyzer = EmbeddingSimilarityAnalyzer(store=PersonaScoreStore(sys.argv[1]))
+    else:
+        analyzer = EmbeddingSimilarityAnalyzer()
     
-    if not analyzer.results:
+    if not analyzer.has_results():
         print("No analysis results found. Please run the multi-video analysis first.")
         return
     
@@ -0,0 +1,169 @@
+"""
+Manifest-based virtual stitching.
+The main video and each ad are segmented once into HLS fMP4 chunks; a stitched "video"
+is then just a generated playlist interleaving those chunks with discontinuity markers.
+Manifests are cached by sequence hash, so a new placement plan costs kilobytes, not a transcode.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Any
+
+from metrics import cache_lookup
+from stitching import FFMPEG, StitchingError, ffmpeg_available, run_tool
+
+HLS_DIR = os.getenv("HLS_DIR", "hls")
+SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+
+
+def source_key(source: str) -> str:
+    """Stable cache key for a source; local files also key on size and mtime"""
+    fingerprint = source
+    if os.path.exists(source):
+        stat = os.stat(source)
+        fingerprint = f"{os.path.abspath(source)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+def sequence_hash(items: List[Dict[str, Any]]) -> str:
+    """Hash of the ordered sequence that identifies a generated manifest; sources count by content
+    fingerprint, so a file replaced at the same path gets a new manifest"""
+    canonical = [{"type": item.get("type"), "start": item.get("start"), "end": item.get("end"),
+                  "source": source_key(item["source"]) if item.get("source") else None} for item in items]
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def parse_media_playlist(playlist_path: str) -> Dict[str, Any]:
+    """Read init segment and (start, duration, uri) chunks from an ffmpeg VOD playlist"""
+    init_uri = None
+    segments = []
+    duration = None
+    position = 0.0
+    with open(playlist_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXT-X-MAP:"):
+                match = re.search(r'URI="([^"]+)"', line)
+                init_uri = match.group(1) if match else None
+            elif line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append({"start": position, "duration": duration, "uri": line})
+                position += duration
+                duration = None
+    return {"init": init_uri, "segments": segments}
+
+
+class HlsSegmentCache:
+    """Segments each source once into fMP4 chunks and reuses them for every manifest"""
+
+    def __init__(self, root: str = None, segment_seconds: float = None):
+        self.root = root or HLS_DIR
+        self.segment_seconds = segment_seconds or SEGMENT_SECONDS
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(os.path.join(self.root, "manifests"), exist_ok=True)
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def segment(self, source: str) -> Dict[str, Any]:
+        """Return the chunk list for a source, segmenting it by stream copy on first use"""
+        key = source_key(source)
+        directory = os.path.join(self.root, key)
+        playlist = os.path.join(directory, "index.m3u8")
+        with self._lock_for(key):
+            cache_lookup("hls_segments", os.path.exists(playlist))
+            if not os.path.exists(playlist):
+                if not ffmpeg_available():
+                    raise StitchingError("ffmpeg/ffprobe not found on PATH")
+                os.makedirs(directory, exist_ok=True)
+                run_tool([FFMPEG, "-nostdin", "-v", "error", "-y", "-i", source,
+                      "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+                      "-f", "hls", "-hls_time", f"{self.segment_seconds:g}",
+                      "-hls_playlist_type", "vod", "-hls_segment_type", "fmp4",
+                      "-hls_fmp4_init_filename", "init.mp4",
+                      "-hls_segment_filename", os.path.join(directory, "seg_%05d.m4s"),
+                      playlist])
+        media = parse_media_playlist(playlist)
+        media["key"] = key
+        return media
+
+
+class ManifestStitcher:
+    """Builds interleaved HLS playlists from pre-segmented main video and ads"""
+
+    def __init__(self, cache: HlsSegmentCache = None):
+        self.cache = cache or HlsSegmentCache()
+
+    def manifest_path(self, digest: str) -> str:
+        return os.path.join(self.cache.root, "manifests", f"{digest}.m3u8")
+
+    def stitch(self, main_source: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        items: ordered dicts with "id", "type" ('video' or 'ad'), and either
+        "start"/"end" (main video range) or "source" (ad file/URL).
+        Returns the manifest path, its sequence hash and whether it came from cache.
+        """
+        for item in items:
+            if item["type"] != "ad":
+                item["source"] = main_source
+
+        digest = sequence_hash(items)
+        path = self.manifest_path(digest)
+        info_path = f"{path[:-len('.m3u8')]}.json"
+        cache_lookup("hls_manifest", os.path.exists(path) and os.path.exists(info_path))
+        if os.path.exists(path) and os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                durations = json.load(f)["durations"]
+            for item, duration in zip(items, durations):
+                item["duration"] = duration
+            return {"path": path, "hash": digest, "cached": True, "duration": sum(durations), "items": items}
+
+        lines = []
+        total = 0.0
+        max_duration = 0.0
+        previous_key = None
+        for item in items:
+            media = self.cache.segment(item["source"])
+            if item["type"] == "ad":
+                chosen = media["segments"]
+            else:
+                # Chunks whose midpoint falls inside the range; chunk edges are keyframes
+                chosen = [seg for seg in media["segments"]
+                          if item["start"] <= seg["start"] + seg["duration"] / 2 < item["end"]]
+            if not chosen:
+                item["duration"] = 0.0
+                continue
+
+            if previous_key is not None:
+                lines.append("#EXT-X-DISCONTINUITY")
+            if previous_key != media["key"]:
+                lines.append(f'#EXT-X-MAP:URI="../{media["key"]}/{media["init"]}"')
+            previous_key = media["key"]
+
+            item["duration"] = sum(seg["duration"] for seg in chosen)
+            for seg in chosen:
+                lines.append(f"#EXTINF:{seg['duration']:.6f},")
+                lines.append(f"../{media['key']}/{seg['uri']}")
+                max_duration = max(max_duration, seg["duration"])
+            total += item["duration"]
+
+        header = ["#EXTM3U", "#EXT-X-VERSION:7",
+                  f"#EXT-X-TARGETDURATION:{int(max_duration + 0.999) or 1}",
+                  "#EXT-X-PLAYLIST-TYPE:VOD", "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        # The info file lands first: a manifest on disk always has complete durations next to it
+        temp_path = f"{info_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"durations": [item["duration"] for item in items]}, f)
+        os.replace(temp_path, info_path)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(header + lines + ["#EXT-X-ENDLIST"]) + "\n")
+        os.replace(temp_path, path)
+
+        return {"path": path, "hash": digest, "cached": False, "duration": total, "items": items}
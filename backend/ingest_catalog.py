@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Bulk Ad Catalog Ingest
+Uploads a directory or manifest of ad files to TwelveLabs in parallel (deduplicated by
+content hash), waits for indexing, runs persona analysis across the pool and builds the
+similarity index in one pipelined, resumable run.
+
+Usage:
+    python ingest_catalog.py ads_folder/
+    python ingest_catalog.py campaign_manifest.json --upload-workers 8 --analysis-workers 4
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable
+
+import requests
+from dotenv import load_dotenv
+
+from persona_analyzer import PersonaAnalyzer, TWELVELABS_BASE_URL, wait_for_index
+from resilience import REQUEST_TIMEOUT
+from embedding_similarity_analysis import EmbeddingSimilarityAnalyzer
+
+load_dotenv()
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".mkv", ".webm", ".avi"}
+TASKS_URL = f"{TWELVELABS_BASE_URL}/tasks"
+
+STAGE_NEW = "new"
+STAGE_UPLOADED = "uploaded"
+STAGE_INDEXED = "indexed"
+STAGE_ANALYZED = "analyzed"
+STAGE_FAILED = "failed"
+
+
+def discover_ads(source: str) -> List[Dict[str, str]]:
+    """List ad files from a directory, or from a JSON/CSV manifest of {path, name} entries"""
+    if os.path.isdir(source):
+        ads = []
+        for root, _, files in os.walk(source):
+            for filename in sorted(files):
+                if os.path.splitext(filename)[1].lower() in VIDEO_EXTENSIONS:
+                    path = os.path.join(root, filename)
+                    ads.append({"path": path, "name": os.path.splitext(filename)[0]})
+        return ads
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        if source.endswith(".csv"):
+            entries = list(csv.DictReader(f))
+        else:
+            data = json.load(f)
+            entries = data.get("ads", []) if isinstance(data, dict) else data
+
+    ads = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        path = entry["path"] if os.path.isabs(entry["path"]) else os.path.join(base_dir, entry["path"])
+        ads.append({"path": path, "name": entry.get("name") or os.path.splitext(os.path.basename(path))[0]})
+    return ads
+
+
+def file_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class CatalogState:
+    """Resumable per-ad progress, keyed by content hash and saved atomically after each step"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.ads: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.ads = json.load(f).get("ads", {})
+
+    def get(self, digest: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.ads.get(digest, {}))
+
+    def update(self, digest: str, **fields) -> None:
+        with self._lock:
+            self.ads.setdefault(digest, {}).update(fields)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"ads": self.ads}, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+
+
+class CatalogIngest:
+    """
+    Pipelined upload -> index wait -> persona analysis. Each stage has its own pool, and an
+    ad is handed to the next stage's pool as soon as it clears the previous one, so uploads
+    keep flowing while earlier ads index and analyze.
+    """
+
+    def __init__(self, state: CatalogState, upload_workers: int = 4, analysis_workers: int = 2,
+                 poll_interval: float = 5.0, index_timeout: float = 1800.0, index_workers: int = 16):
+        self.state = state
+        self.api_key = os.getenv("twelve_API") or os.getenv("TWELVELABS_API_KEY")
+        self.index_id = os.getenv("twelve_index_id")
+        self.analyzer = PersonaAnalyzer(api_key=self.api_key)
+        self.session = requests.Session()
+        self.session.headers.update({"x-api-key": self.api_key})
+        self.upload_workers = upload_workers
+        self.analysis_workers = analysis_workers
+        # Index waits only poll and sleep, so many can be in flight without using provider quota
+        self.index_workers = index_workers
+        self.poll_interval = poll_interval
+        self.index_timeout = index_timeout
+        self.stage_seconds = {"upload": [], "indexing": [], "analysis": []}
+        self.bytes_uploaded = 0
+        self._stats_lock = threading.Lock()
+        self.pools: Dict[str, ThreadPoolExecutor] = {}
+        self.outcomes: List[str] = []
+        self._remaining = 0
+        self._finished = threading.Event()
+
+    def _record(self, stage: str, seconds: float, uploaded_bytes: int = 0) -> None:
+        with self._stats_lock:
+            self.stage_seconds[stage].append(seconds)
+            self.bytes_uploaded += uploaded_bytes
+
+    def _upload(self, digest: str, ad: Dict[str, Any]) -> None:
+        self.state.update(digest, stage=STAGE_NEW, error=None, **ad)
+        started = time.time()
+        with open(ad["path"], "rb") as f:
+            response = self.session.post(TASKS_URL, data={"index_id": self.index_id},
+                                         files={"video_file": f}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        body = response.json()
+        self._record("upload", time.time() - started, os.path.getsize(ad["path"]))
+        self.state.update(digest, stage=STAGE_UPLOADED, task_id=body.get("_id") or body.get("id"),
+                          video_id=body.get("video_id"))
+
+    def _wait_for_index(self, digest: str, ad: Dict[str, Any]) -> None:
+        record = self.state.get(digest)
+        started = time.time()
+        task = wait_for_index(record["task_id"], poll_seconds=self.poll_interval,
+                              timeout=self.index_timeout, session=self.session)
+        self._record("indexing", time.time() - started)
+        self.state.update(digest, stage=STAGE_INDEXED, video_id=task.get("video_id") or record.get("video_id"),
+                          error=None)
+
+    def _analyze(self, digest: str, ad: Dict[str, Any]) -> None:
+        record = self.state.get(digest)
+        started = time.time()
+        results = self.analyzer.analyze_video_for_all_personas(record["video_id"])
+        self._record("analysis", time.time() - started)
+        self.state.update(digest, stage=STAGE_ANALYZED, analysis=results, error=None)
+
+    def advance(self, digest: str, ad: Dict[str, Any]) -> None:
+        """Queue an ad on the pool of the stage its saved state is at"""
+        record = self.state.get(digest)
+        stage = record.get("stage")
+        if stage == STAGE_FAILED:
+            # Retry the step that failed: the index wait with the stored task id, analysis
+            # with the stored video id; only a failed upload starts over
+            stage = record.get("failed_stage") or STAGE_NEW
+            if (stage == STAGE_UPLOADED and not record.get("task_id")) or \
+                    (stage == STAGE_INDEXED and not record.get("video_id")):
+                stage = STAGE_NEW
+            self.state.update(digest, stage=stage)
+        if stage in (None, STAGE_NEW):
+            self.pools["upload"].submit(self._step, self._upload, digest, ad)
+        elif stage == STAGE_UPLOADED:
+            self.pools["indexing"].submit(self._step, self._wait_for_index, digest, ad)
+        elif stage == STAGE_INDEXED:
+            self.pools["analysis"].submit(self._step, self._analyze, digest, ad)
+        else:
+            print(f"Ready: {ad['name']} ({self.state.get(digest)['video_id']})")
+            self._finish(STAGE_ANALYZED)
+
+    def _step(self, step: Callable[[str, Dict[str, Any]], None], digest: str, ad: Dict[str, Any]) -> None:
+        try:
+            step(digest, ad)
+        except Exception as e:
+            failed_stage = self.state.get(digest).get("stage") or STAGE_NEW
+            self.state.update(digest, stage=STAGE_FAILED, failed_stage=failed_stage, error=str(e))
+            print(f"FAILED {ad['name']}: {e}")
+            self._finish(STAGE_FAILED)
+            return
+        self.advance(digest, ad)
+
+    def _finish(self, outcome: str) -> None:
+        with self._stats_lock:
+            self.outcomes.append(outcome)
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._finished.set()
+
+    def run(self, ads: List[Dict[str, str]]) -> Dict[str, Any]:
+        started = time.time()
+
+        # Dedup by content: identical files are uploaded and analyzed once
+        unique = {}
+        duplicates = 0
+        with ThreadPoolExecutor(max_workers=self.upload_workers + self.analysis_workers) as executor:
+            for ad, digest in zip(ads, executor.map(lambda ad: file_hash(ad["path"]), ads)):
+                if digest in unique:
+                    duplicates += 1
+                else:
+                    unique[digest] = ad
+
+        skipped = sum(1 for digest in unique if self.state.get(digest).get("stage") == STAGE_ANALYZED)
+        pending = {digest: ad for digest, ad in unique.items()
+                   if self.state.get(digest).get("stage") != STAGE_ANALYZED}
+        print(f"{len(ads)} files, {duplicates} duplicates, {skipped} already ingested, {len(pending)} to process")
+
+        self.pools = {
+            "upload": ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="ingest-upload"),
+            "indexing": ThreadPoolExecutor(max_workers=self.index_workers, thread_name_prefix="ingest-index"),
+            "analysis": ThreadPoolExecutor(max_workers=self.analysis_workers, thread_name_prefix="ingest-analysis")
+        }
+        self.outcomes = []
+        self._remaining = len(pending)
+        self._finished.clear()
+        try:
+            for digest, ad in pending.items():
+                # Resumed ads enter the pipeline at the stage they reached last time
+                self.advance(digest, ad)
+            if pending:
+                self._finished.wait()
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown(wait=True)
+        outcomes = self.outcomes
+
+        elapsed = time.time() - started
+        processed = outcomes.count(STAGE_ANALYZED)
+        return {
+            "files": len(ads),
+            "duplicates": duplicates,
+            "resumed_skipped": skipped,
+            "processed": processed,
+            "failed": outcomes.count(STAGE_FAILED),
+            "elapsed_seconds": round(elapsed, 2),
+            "ads_per_minute": round(processed / elapsed * 60, 2) if elapsed else 0.0,
+            "upload_mb_per_second": round(self.bytes_uploaded / (1 << 20) / elapsed, 2) if elapsed else 0.0,
+            "avg_stage_seconds": {stage: round(sum(values) / len(values), 2) if values else None
+                                  for stage, values in self.stage_seconds.items()}
+        }
+
+
+def build_similarity_index(state: CatalogState, output_file: str) -> Dict[str, Any]:
+    """Write the analyzed pool in the comprehensive-results schema plus precomputed affinities"""
+    video_analyses = {}
+    for digest, record in state.ads.items():
+        if record.get("stage") != STAGE_ANALYZED:
+            continue
+        analysis = dict(record["analysis"])
+        analysis["video_metadata"] = {
+            "video_key": f"ad_{digest[:12]}",
+            "video_name": record["name"],
+            "video_description": f"{record['name']} advertisement video",
+            "video_id": record["video_id"]
+        }
+        video_analyses[f"ad_{digest[:12]}"] = analysis
+
+    analyzer = EmbeddingSimilarityAnalyzer(results={"video_analyses": video_analyses})
+    overviews = analyzer._extract_content_overviews()
+    index = {
+        "video_analyses": video_analyses,
+        "persona_affinity_scores": analyzer._extract_persona_affinity_scores(),
+        "content_keywords": {name: sorted(set(text.lower().split())) for name, text in overviews.items()},
+        "ads_id": [analysis["video_metadata"]["video_id"] for analysis in video_analyses.values()]
+    }
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest an ad library")
+    parser.add_argument("source", help="Directory of ad files or a JSON/CSV manifest")
+    parser.add_argument("--state", default="json/catalog_ingest_state.json", help="Resumable state file")
+    parser.add_argument("--index", default="json/ad_catalog_index.json", help="Similarity index output")
+    parser.add_argument("--upload-workers", type=int, default=4)
+    parser.add_argument("--analysis-workers", type=int, default=2)
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("Bulk Ad Catalog Ingest")
+    print("=" * 50)
+
+    ads = discover_ads(args.source)
+    state = CatalogState(args.state)
+    ingest = CatalogIngest(state, args.upload_workers, args.analysis_workers, args.poll_interval)
+    summary = ingest.run(ads)
+
+    index = build_similarity_index(state, args.index)
+    summary["indexed_ads"] = len(index["video_analyses"])
+
+    print("\nTHROUGHPUT SUMMARY:")
+    print("=" * 50)
+    for key, value in summary.items():
+        print(f"{key:<22} {value}")
+    print(f"\nSimilarity index saved to: {args.index}")
+    print("The placement pipeline reads its ad pool from this file (AD_CATALOG_INDEX).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Background job subsystem for long-running pipelines.
+Jobs run their stages on a worker pool and persist per-stage progress and partial
+results in a local SQLite database so they can be polled, streamed and resumed after a restart.
+Every worker process sharing the database holds a lease on the jobs it runs and renews it
+with a heartbeat; only jobs whose lease has expired (their worker is gone) are resumed.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from structured_logging import correlation, span
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+STAGE_PENDING = "pending"
+STAGE_RUNNING = "running"
+STAGE_COMPLETED = "completed"
+STAGE_FAILED = "failed"
+
+# A worker that has not renewed its leases for this long is presumed dead
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+Stage = Tuple[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]]
+
+
+class JobStore:
+    """SQLite persistence for job state, stage progress and partial results"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv("JOBS_DB_PATH", "jobs.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    owner TEXT,
+                    lease_expires REAL,
+                    video_id TEXT
+                )
+            """)
+            # Databases created before leases and the video_id column existed
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_expires", "REAL"), ("video_id", "TEXT")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            if "video_id" not in columns:
+                self._conn.execute("UPDATE jobs SET video_id = json_extract(params, '$.video_id')")
+            # Plan lookups by main video (latest_completed) stay an index seek as the table grows
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_by_video ON jobs (kind, video_id, status, updated_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_by_kind ON jobs (kind, status, updated_at)")
+
+    def create(self, kind: str, params: Dict[str, Any], stage_names: List[str], owner: str = None,
+               lease_seconds: float = LEASE_SECONDS) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        stages = [{"name": name, "status": STAGE_PENDING, "started_at": None, "finished_at": None}
+                  for name in stage_names]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, stages, results, error, created_at, updated_at, "
+                "owner, lease_expires, video_id) VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?)",
+                (job_id, kind, JOB_QUEUED, json.dumps(params), json.dumps(stages), "{}", now, now,
+                 owner, now + lease_seconds if owner else None, params.get("video_id"))
+            )
+        return job_id
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float = LEASE_SECONDS,
+              statuses: Tuple[str, ...] = (JOB_QUEUED, JOB_RUNNING)) -> bool:
+        """
+        Take (or renew) the lease on a job in one of statuses; False if another live
+        worker holds it. The conditional UPDATE makes the claim atomic across processes.
+        """
+        now = time.time()
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET owner = ?, lease_expires = ? WHERE id = ? AND status IN ({placeholders}) "
+                "AND (owner IS NULL OR owner = ? OR lease_expires IS NULL OR lease_expires < ?)",
+                (owner, now + lease_seconds, job_id, *statuses, owner, now)
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, owner: str, lease_seconds: float = LEASE_SECONDS) -> int:
+        """Heartbeat: extend the lease of every unfinished job held by owner"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time() + lease_seconds, owner, JOB_QUEUED, JOB_RUNNING)
+            )
+        return cursor.rowcount
+
+    def update(self, job_id: str, **fields) -> None:
+        """Update job columns; dict/list values are stored as JSON"""
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        values = [json.dumps(value) if isinstance(value, (dict, list)) else value for value in fields.values()]
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", values + [job_id])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_completed(self, kind: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND status = ? ORDER BY updated_at",
+                (kind, JOB_COMPLETED)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def latest_completed(self, kind: str, video_id: str = None) -> Optional[Dict[str, Any]]:
+        """{job_id, results} of the most recently finished job of this kind, for a main video if given"""
+        query = "SELECT id, results FROM jobs WHERE kind = ? AND status = ?"
+        values = [kind, JOB_COMPLETED]
+        if video_id is not None:
+            query += " AND video_id = ?"
+            values.append(video_id)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY updated_at DESC LIMIT 1", values).fetchone()
+        return {"job_id": row["id"], "results": json.loads(row["results"])} if row else None
+
+    def list_unfinished(self, orphaned: bool = False) -> List[Dict[str, Any]]:
+        """Queued/running jobs; with orphaned, only those whose worker's lease has lapsed"""
+        query = "SELECT * FROM jobs WHERE status IN (?, ?)"
+        values = [JOB_QUEUED, JOB_RUNNING]
+        if orphaned:
+            query += " AND (owner IS NULL OR lease_expires IS NULL OR lease_expires < ?)"
+            values.append(time.time())
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at", values).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "stages": json.loads(row["stages"]),
+            "results": json.loads(row["results"]),
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "owner": row["owner"]
+        }
+
+
+class JobManager:
+    """Runs staged jobs on a worker pool, persisting progress after every stage"""
+
+    def __init__(self, kind: str, stages: List[Stage], store: JobStore = None, max_workers: int = None,
+                 on_complete: Callable[[Dict[str, Any], Dict[str, Any]], None] = None,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.kind = kind
+        self.stages = stages
+        self.store = store or JobStore()
+        # Called with (params, results) after a job completes, e.g. to compile its output
+        self.on_complete = on_complete
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("JOB_WORKERS", "2")),
+            thread_name_prefix=f"{kind}-job"
+        )
+        # Unique per process, so a restarted worker never inherits a dead one's leases
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name=f"{kind}-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def submit(self, params: Dict[str, Any]) -> str:
+        """Create a job and queue it; returns the job id immediately"""
+        job_id = self.store.create(self.kind, params, [name for name, _ in self.stages],
+                                   self.owner, self.lease_seconds)
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def retry(self, job_id: str) -> bool:
+        """Re-queue a failed job; completed stages are kept and not re-run"""
+        job = self.store.get(job_id)
+        if not job or job["status"] != JOB_FAILED:
+            return False
+        if not self.store.claim(job_id, self.owner, self.lease_seconds, statuses=(JOB_FAILED,)):
+            return False
+        self.store.update(job_id, status=JOB_QUEUED, error=None)
+        self.executor.submit(self._run, job_id)
+        return True
+
+    def resume_pending(self) -> int:
+        """Re-queue jobs whose worker is gone (lease expired); jobs a live worker holds are left alone"""
+        resumed = 0
+        for job in self.store.list_unfinished(orphaned=True):
+            if job["kind"] == self.kind and self.store.claim(job["job_id"], self.owner, self.lease_seconds):
+                logger.info("Resuming job %s abandoned by %s", job["job_id"], job["owner"] or "an older worker")
+                self.executor.submit(self._run, job["job_id"])
+                resumed += 1
+        return resumed
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self.executor.shutdown(wait=False)
+
+    def _heartbeat_loop(self) -> None:
+        # Renew our leases, and pick up jobs of workers that died since startup
+        while not self._stopped.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew(self.owner, self.lease_seconds)
+                self.resume_pending()
+            except Exception as e:
+                logger.warning("Job lease heartbeat failed: %s", e)
+
+    def _run(self, job_id: str) -> None:
+        # Every record logged while the job runs carries its id as the correlation id
+        with correlation(job_id):
+            if not self.store.claim(job_id, self.owner, self.lease_seconds):
+                logger.info("Job %s is held by another worker; not running it here", job_id)
+                return
+            self._run_stages(job_id)
+
+    def _run_stages(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if not job:
+            return
+
+        # Stages get the job id so they can namespace their artifacts per job
+        params = {**job["params"], "job_id": job_id}
+        results = job["results"]
+        stage_states = job["stages"]
+        self.store.update(job_id, status=JOB_RUNNING)
+
+        for (name, stage), state in zip(self.stages, stage_states):
+            if state["status"] == STAGE_COMPLETED:
+                continue
+            if not self.store.claim(job_id, self.owner, self.lease_seconds):
+                # Our lease lapsed (e.g. the process stalled) and another worker took the job over
+                logger.warning("Lost the lease on job %s before stage %s; stopping", job_id, name)
+                return
+
+            state["status"] = STAGE_RUNNING
+            state["started_at"] = time.time()
+            self.store.update(job_id, stages=stage_states)
+            try:
+                with span(f"stage.{name}", job_kind=self.kind):
+                    results.update(stage(params, results))
+            except Exception as e:
+                state["status"] = STAGE_FAILED
+                state["finished_at"] = time.time()
+                logger.exception("Job %s failed in stage %s: %s", job_id, name, e)
+                self.store.update(job_id, status=JOB_FAILED, stages=stage_states,
+                                  error=f"{name}: {e}")
+                return
+
+            state["status"] = STAGE_COMPLETED
+            state["finished_at"] = time.time()
+            # Persist partial results so status/stream clients see them right away
+            self.store.update(job_id, stages=stage_states, results=results)
+
+        self.store.update(job_id, status=JOB_COMPLETED)
+        if self.on_complete:
+            try:
+                self.on_complete(params, results)
+            except Exception as e:
+                logger.exception("Job %s completion hook failed: %s", job_id, e)
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent-Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Live-stream incremental ad opportunities.
+Consumes a stream in fixed-size chunks, scores each chunk's emotion as it arrives, keeps a
+sliding-window timeline and emits ad-opportunity events shortly after a peak or a lull,
+choosing the ad from the precomputed persona ranking of the ad pool.
+A local file replayed at real-time speed stands in for a live feed.
+
+Usage:
+    python live_placement.py match.mp4
+    python live_placement.py match.mp4 --chunk-seconds 5 --speed 4 --video-id <main video id>
+    python live_placement.py match.mp4 --ranking artifacts/<job id>/embedding_similarity_results.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+
+from call_scheduler import PRIORITY_INTERACTIVE, scheduled
+from job_manager import JobStore
+from metrics import gemini_usage
+from prompt_compaction import estimate_tokens, parse_emotion_csv
+from placement_solver import PlacementSolver
+from structured_logging import span
+from timecodes import format_timestamp
+
+CHUNK_SECONDS = float(os.getenv("LIVE_CHUNK_SECONDS", "10"))
+# Optional similarity report to rank ads from instead of the job store
+RANKING_FILE = os.getenv("LIVE_RANKING_FILE")
+PLACEMENT_JOB_KIND = "ad_placement"
+
+CHUNK_EMOTION_PROMPT = ("let's say sad is 0 and happy and exicted is 10 with this metric rate every second "
+                        "of this clip. Just give me a csv with the header row second,emotion and one row per second "
+                        "counted from the start of the clip")
+
+EVENT_PEAK = "peak"
+EVENT_LULL = "lull"
+
+# Detected shape -> trend the placement solver scores the break point with
+EVENT_TRENDS = {EVENT_PEAK: "falling", EVENT_LULL: "low"}
+
+Chunk = Tuple[int, float, float, str]
+
+
+def load_ranking(path: str = None, store: JobStore = None, video_id: str = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Precomputed ad ranking (final_score): from an embedding similarity report when a path is
+    given, else from the latest completed placement job (of video_id, if given) in the job store.
+    None when no ranking exists yet.
+    """
+    path = path or RANKING_FILE
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["final_score"]
+    job = (store or JobStore()).latest_completed(PLACEMENT_JOB_KIND, video_id)
+    return job["results"].get("final_score") if job else None
+
+
+class RealtimeChunkReader:
+    """Replays a local file as a live feed: chunk i is released once it has fully 'aired'"""
+
+    def __init__(self, source: str, chunk_seconds: float = CHUNK_SECONDS, speed: float = 1.0):
+        self.source = source
+        self.chunk_seconds = chunk_seconds
+        self.speed = speed
+
+    def __iter__(self) -> Iterator[Chunk]:
+        from stitching import FFMPEG, probe_media, run_tool
+
+        duration = probe_media(self.source)["duration"]
+        work_dir = tempfile.mkdtemp(prefix="live_chunks_")
+        started = time.monotonic()
+        try:
+            index, start = 0, 0.0
+            while start < duration:
+                length = min(self.chunk_seconds, duration - start)
+                wait = started + (start + length) / self.speed - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                path = os.path.join(work_dir, f"chunk_{index:05d}.mp4")
+                run_tool([FFMPEG, "-nostdin", "-v", "error", "-y", "-ss", f"{start:.3f}", "-i", self.source,
+                          "-t", f"{length:.3f}", "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy", path])
+                yield index, start, length, path
+                os.remove(path)
+                index, start = index + 1, start + length
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class GeminiChunkScorer:
+    """Per-second emotion values for one chunk, sent inline to Gemini (no indexing round-trip)"""
+
+    def __init__(self, gemini_client, model: str = "gemini-2.5-flash"):
+        self.gemini_client = gemini_client
+        self.model = model
+
+    def __call__(self, path: str, start: float, length: float) -> List[Tuple[float, float]]:
+        from google.genai import types
+
+        with open(path, "rb") as f:
+            clip = types.Part.from_bytes(data=f.read(), mime_type="video/mp4")
+        # Live scoring is the most latency-sensitive traffic there is
+        with scheduled("gemini", estimate_tokens(CHUNK_EMOTION_PROMPT), priority=PRIORITY_INTERACTIVE) as ticket, \
+                span("gemini.generate_content", prompt_type="live_chunk") as call:
+            response = self.gemini_client.models.generate_content(
+                model=self.model, contents=[clip, CHUNK_EMOTION_PROMPT],
+                config={"response_mime_type": "text/plain"})
+            call["usage"] = ticket["usage"] = gemini_usage(response)
+        _, rows = parse_emotion_csv(response.text)
+        return [(start + seconds, value) for _, seconds, value in rows if seconds <= length]
+
+
+class SlidingEmotionTimeline:
+    """Smoothed emotion values over the last `window_seconds` of stream time"""
+
+    def __init__(self, window_seconds: float = 120.0, smoothing: float = 0.4):
+        self.window_seconds = window_seconds
+        self.smoothing = smoothing
+        self.points = deque()
+        self._smoothed = None
+
+    def add(self, points: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        """Append raw (time, value) points; returns the smoothed points that were added"""
+        added = []
+        for seconds, value in sorted(points):
+            if self.points and seconds <= self.points[-1][0]:
+                continue
+            self._smoothed = value if self._smoothed is None else \
+                self.smoothing * value + (1 - self.smoothing) * self._smoothed
+            self.points.append((seconds, self._smoothed))
+            added.append((seconds, self._smoothed))
+        while self.points and self.points[-1][0] - self.points[0][0] > self.window_seconds:
+            self.points.popleft()
+        return added
+
+    def baseline(self) -> Tuple[float, float]:
+        """Mean and spread of the window, used as adaptive peak/lull thresholds"""
+        values = [value for _, value in self.points]
+        if len(values) < 2:
+            return (values[0] if values else 5.0), 1.0
+        return statistics.fmean(values), max(statistics.pstdev(values), 0.5)
+
+
+class OpportunityDetector:
+    """
+    Turns the smoothed timeline into peak and lull events.
+    A peak is confirmed once the value has dropped `drop` below it, or at the latest
+    `max_delay` seconds after it; a lull once values stay low for `lull_seconds`.
+    """
+
+    def __init__(self, timeline: SlidingEmotionTimeline, drop: float = 1.0, lull_seconds: float = 8.0,
+                 max_delay: float = 15.0, min_spacing: float = 60.0):
+        self.timeline = timeline
+        self.drop = drop
+        self.lull_seconds = lull_seconds
+        self.max_delay = max_delay
+        self.min_spacing = min_spacing
+        self._peak = None
+        self._lull_start = None
+        self._last_event = None
+
+    def _emit(self, kind: str, at: float, value: float, now: float) -> Optional[Dict[str, Any]]:
+        if self._last_event is not None and at - self._last_event < self.min_spacing:
+            return None
+        self._last_event = at
+        return {"type": kind, "time": at, "emotion_value": round(value, 2), "confirmed_at": now,
+                "stream_delay": round(now - at, 2)}
+
+    def update(self, points: List[Tuple[float, float]]) -> List[Dict[str, Any]]:
+        events = []
+        for seconds, value in points:
+            mean, spread = self.timeline.baseline()
+
+            if value >= mean + spread and (self._peak is None or value > self._peak[1]):
+                self._peak = (seconds, value)
+            elif self._peak is not None and (value <= self._peak[1] - self.drop
+                                             or seconds - self._peak[0] >= self.max_delay):
+                event = self._emit(EVENT_PEAK, self._peak[0], self._peak[1], seconds)
+                if event:
+                    events.append(event)
+                self._peak = None
+
+            if value <= mean - spread:
+                if self._lull_start is None:
+                    self._lull_start = (seconds, value)
+                elif seconds - self._lull_start[0] >= self.lull_seconds:
+                    event = self._emit(EVENT_LULL, self._lull_start[0], self._lull_start[1], seconds)
+                    if event:
+                        events.append(event)
+                    self._lull_start = None
+            else:
+                self._lull_start = None
+        return events
+
+
+class LiveAdSession:
+    """Runs reader -> scorer -> timeline -> detector and picks an ad for every opportunity"""
+
+    def __init__(self, chunks, scorer: Callable[[str, float, float], List[Tuple[float, float]]],
+                 ranking: List[Dict[str, Any]], window_seconds: float = 120.0, min_spacing: float = 60.0,
+                 max_delay: float = 15.0, on_event: Callable[[Dict[str, Any]], None] = None):
+        self.chunks = chunks
+        self.scorer = scorer
+        self.ranking = ranking
+        self.timeline = SlidingEmotionTimeline(window_seconds)
+        self.detector = OpportunityDetector(self.timeline, max_delay=max_delay, min_spacing=min_spacing)
+        self.solver = PlacementSolver(min_spacing=min_spacing)
+        self.on_event = on_event
+        self.events: List[Dict[str, Any]] = []
+        self.finished = False
+        self.finished_at = None
+        self.error = None
+        self._changed = threading.Condition()
+
+    def _recent_ads(self) -> List[str]:
+        """Ads shown since the pool was last exhausted, so the pool rotates without repeats"""
+        window = len(self.events) % max(len(self.ranking), 1)
+        return [event["ad"] for event in self.events[len(self.events) - window:]] if window else []
+
+    def _place(self, event: Dict[str, Any], chunk_end: float) -> Dict[str, Any]:
+        slot = {"time": event["time"], "trend": EVENT_TRENDS[event["type"]],
+                "emotion_value": event["emotion_value"], "ad_categories": []}
+        ad = self.solver.best_ad(self.ranking, slot, exclude=self._recent_ads()) or {}
+        return {
+            **event,
+            "timestamp": format_timestamp(event["time"]),
+            "ad": ad.get("ad"),
+            "product": ad.get("product"),
+            "ad_score": ad.get("score"),
+            "confidence": ad.get("confidence"),
+            # Stream time from the opportunity to the end of the chunk that revealed it
+            "detection_delay": round(chunk_end - event["time"], 2)
+        }
+
+    def run(self) -> List[Dict[str, Any]]:
+        try:
+            for index, start, length, path in self.chunks:
+                chunk_started = time.monotonic()
+                smoothed = self.timeline.add(self.scorer(path, start, length))
+                for event in self.detector.update(smoothed):
+                    placed = self._place(event, start + length)
+                    placed["processing_seconds"] = round(time.monotonic() - chunk_started, 3)
+                    with self._changed:
+                        self.events.append(placed)
+                        self._changed.notify_all()
+                    if self.on_event:
+                        self.on_event(placed)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            with self._changed:
+                self.finished = True
+                self.finished_at = time.time()
+                self._changed.notify_all()
+        return self.events
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="live-ad-session", daemon=True)
+        thread.start()
+        return thread
+
+    def wait_for_events(self, seen: int, timeout: float = 15.0) -> List[Dict[str, Any]]:
+        """Block until there are more than `seen` events (or the session ends); returns the new ones"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > seen or self.finished, timeout)
+            return self.events[seen:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video as a live stream and print ad opportunities")
+    parser.add_argument("source", help="Local video file replayed at real-time speed")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument("--window-seconds", type=float, default=120.0)
+    parser.add_argument("--min-spacing", type=float, default=60.0)
+    parser.add_argument("--ranking", default=RANKING_FILE, help="Embedding similarity report with final_score")
+    parser.add_argument("--video-id", help="Rank ads from this main video's latest placement job")
+    args = parser.parse_args()
+
+    ranking = load_ranking(args.ranking, video_id=args.video_id)
+    if not ranking:
+        parser.error("no ad ranking yet: run a placement job first or pass --ranking")
+
+    from google import genai
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    print("Live Ad Opportunity Replay")
+    print("=" * 50)
+
+    session = LiveAdSession(
+        RealtimeChunkReader(args.source, args.chunk_seconds, args.speed),
+        GeminiChunkScorer(genai.Client(api_key=os.getenv("gemini_API"))),
+        ranking,
+        window_seconds=args.window_seconds,
+        min_spacing=args.min_spacing,
+        on_event=lambda event: print(f"{event['timestamp']:<14} {event['type']:<5} -> {event['product']} "
+                                     f"(confidence {event['confidence']}, delay {event['detection_delay']}s)")
+    )
+    events = session.run()
+    print(f"\n{len(events)} ad opportunities")
+
+
+if __name__ == "__main__":
+    main()
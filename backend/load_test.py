@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Load generator for one API worker.
+Drives /ad_placement, /create-stitched-video and /swayable with open-loop (Poisson) arrivals
+at each requested rate, or closed-loop at a rate of 0, capped at --concurrency requests in
+flight. Providers are replaced by the fakes in provider_fakes.py. Per step it records latency
+percentiles (measured from the scheduled arrival, so client-side queueing counts), error
+rates and event-loop lag, and writes the results in the same layout as benchmark.py so runs
+can be compared with --compare.
+
+Transports:
+    asgi  the app runs in this process and loop, requests go through httpx's ASGI transport
+    http  the app is served by uvicorn in this loop on 127.0.0.1, requests go over sockets
+    --url an already running worker (providers are whatever it is configured with, and
+          event-loop lag is not measured)
+
+Usage:
+    python load_test.py --rates 1,2,4,8 --duration 30
+    python load_test.py --transport http --endpoints ad_placement --rates 2,4 --concurrency 16
+    python load_test.py --output load_new.json --compare load_baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import httpx
+import numpy as np
+
+from benchmark import BACKEND_DIR, compare, git_revision, summarize_samples
+from provider_fakes import FakeProviders
+
+ENDPOINTS = ("ad_placement", "create_stitched_video", "swayable")
+SWAYABLE_CSV = "Patagonia-PR Results.csv"
+LAG_PROBE_INTERVAL = 0.05
+
+
+def stitching_payload(source: Optional[str]) -> Dict[str, Any]:
+    """A two-segment main video with one ad break; blob: URLs keep the endpoint in passthrough mode"""
+    main_url = source or "blob:http://localhost:3000/main-video"
+    ad_url = source or "blob:http://localhost:3000/ad-video"
+    return {
+        "mainVideo": {"url": main_url, "segments": [
+            {"id": "segment-1", "start": 0.0, "end": 16.0},
+            {"id": "segment-2", "start": 16.0, "end": 32.0}]},
+        "adSegments": [{"id": "ad-1", "adData": {"url": ad_url}, "duration": 15.0,
+                        "description": "Recorded load-test ad", "confidence": 0.9, "type": "ad"}],
+        "sequence": [
+            {"id": "segment-1", "order": 0, "type": "video", "startTime": 0.0, "endTime": 16.0},
+            {"id": "ad-1", "order": 1, "type": "ad", "startTime": 0.0, "endTime": 15.0},
+            {"id": "segment-2", "order": 2, "type": "video", "startTime": 16.0, "endTime": 32.0}],
+        "metadata": {"source": "load_test"}
+    }
+
+
+def write_swayable_fixture(path: str, seed: int = 0) -> None:
+    """Synthetic lift study with the columns /swayable reads"""
+    rng = random.Random(seed)
+    rows = ["treatment,metric,testGroupMean,baselineMean"]
+    for treatment in ("Ad A", "Ad B", "Ad C"):
+        for metric in ("1) Brand Lift", "2) Purchase Intent", "3) Favorability"):
+            for _ in range(20):
+                baseline = rng.uniform(0.3, 0.6)
+                rows.append(f"{treatment},{metric},{baseline * rng.uniform(0.95, 1.25):.4f},{baseline:.4f}")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(rows) + "\n")
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, endpoints: List[str], concurrency: int,
+                 ad_placement_mode: str = "upload", stitch_source: str = None, timeout: float = 120.0,
+                 seed: int = None, measure_lag: bool = True):
+        self.client = client
+        self.endpoints = endpoints
+        self.concurrency = concurrency
+        self.ad_placement_mode = ad_placement_mode
+        self.stitch_payload = stitching_payload(stitch_source)
+        self.timeout = timeout
+        self.measure_lag = measure_lag
+        self._random = random.Random(seed)
+
+    async def send(self, endpoint: str) -> int:
+        if endpoint == "ad_placement":
+            if self.ad_placement_mode == "video_id":
+                response = await self.client.post("/ad_placement", params={"video_id": "main-load-test"},
+                                                  timeout=self.timeout)
+            else:
+                files = {"file": ("clip.mp4", os.urandom(64 * 1024), "video/mp4")}
+                response = await self.client.post("/ad_placement", files=files, timeout=self.timeout)
+        elif endpoint == "create_stitched_video":
+            response = await self.client.post("/create-stitched-video", json=self.stitch_payload, timeout=self.timeout)
+        else:
+            response = await self.client.post("/swayable", timeout=self.timeout)
+        if response.status_code == 200 and endpoint == "create_stitched_video" and not response.json().get("success"):
+            # The stitching endpoint reports failures in the body
+            return 500
+        return response.status_code
+
+    async def _probe_lag(self, samples: List[float], stop: asyncio.Event) -> None:
+        """Sleep a fixed interval and record how late the loop woke us up"""
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            samples.append(max(0.0, time.perf_counter() - started - LAG_PROBE_INTERVAL))
+
+    async def run_step(self, rate: float, duration: float) -> Dict[str, Any]:
+        """One load level: rate requests/s (0 = closed loop) for duration seconds"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        records = {endpoint: {"latencies": [], "errors": 0, "statuses": {}} for endpoint in self.endpoints}
+        lag_samples: List[float] = []
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(self._probe_lag(lag_samples, stop)) if self.measure_lag else None
+
+        async def request(endpoint: str, arrived: float) -> None:
+            async with semaphore:
+                try:
+                    status = str(await self.send(endpoint))
+                except Exception as e:
+                    status = type(e).__name__
+            record = records[endpoint]
+            record["statuses"][status] = record["statuses"].get(status, 0) + 1
+            if status == "200":
+                record["latencies"].append(time.perf_counter() - arrived)
+            else:
+                record["errors"] += 1
+
+        started = time.perf_counter()
+        deadline = started + duration
+        tasks = []
+        if rate > 0:
+            next_arrival = started
+            while next_arrival < deadline:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                tasks.append(asyncio.create_task(request(self._random.choice(self.endpoints), next_arrival)))
+                next_arrival += self._random.expovariate(rate)
+        else:
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await request(self._random.choice(self.endpoints), time.perf_counter())
+            tasks = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        await asyncio.gather(*tasks)
+        wall_seconds = time.perf_counter() - started
+
+        stop.set()
+        if lag_task:
+            await lag_task
+
+        results = {}
+        for endpoint, record in records.items():
+            results[endpoint] = summarize_samples(record["latencies"], record["errors"], wall_seconds)
+            results[endpoint]["status_counts"] = record["statuses"]
+        results["all"] = summarize_samples([latency for record in records.values() for latency in record["latencies"]],
+                                           sum(record["errors"] for record in records.values()), wall_seconds)
+        return {"endpoints": results, "event_loop_lag": lag_summary(lag_samples)}
+
+
+def lag_summary(samples: List[float]) -> Optional[Dict[str, float]]:
+    if not samples:
+        return None
+    lags = np.array(samples)
+    return {
+        "samples": len(samples),
+        "p50_seconds": round(float(np.percentile(lags, 50)), 4),
+        "p99_seconds": round(float(np.percentile(lags, 99)), 4),
+        "max_seconds": round(float(lags.max()), 4)
+    }
+
+
+def prepare_workdir() -> str:
+    """Scratch working directory holding the files the endpoints read by relative path"""
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    os.makedirs(os.path.join(workdir, "json"))
+    shutil.copy(os.path.join(BACKEND_DIR, "persona_categories.json"), os.path.join(workdir, "json"))
+    shutil.copy(os.path.join(BACKEND_DIR, "dummy.json"), workdir)
+    if os.path.exists(os.path.join(BACKEND_DIR, SWAYABLE_CSV)):
+        shutil.copy(os.path.join(BACKEND_DIR, SWAYABLE_CSV), workdir)
+    else:
+        write_swayable_fixture(os.path.join(workdir, SWAYABLE_CSV))
+    return workdir
+
+
+async def serve_http(app):
+    """Start uvicorn on an ephemeral localhost port inside the running loop"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+async def drive(args, fakes: Optional[FakeProviders]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    server = server_task = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits)
+    else:
+        import api
+
+        fakes.attach(api.context_engine)
+        if args.transport == "http":
+            server, server_task, base_url = await serve_http(api.app)
+            client = httpx.AsyncClient(base_url=base_url, limits=limits)
+        else:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://load-test")
+
+    generator = LoadGenerator(client, args.endpoints, args.concurrency, args.ad_placement_mode,
+                              args.stitch_source, args.timeout, args.seed, measure_lag=not args.url)
+    results, lag = {}, {}
+    try:
+        for rate in args.rates:
+            label = f"{rate:g}" if rate > 0 else "closed"
+            print(f"Rate {label}/s for {args.duration:g}s (concurrency {args.concurrency})")
+            step = await generator.run_step(rate, args.duration)
+            results[label] = step["endpoints"]
+            lag[label] = step["event_loop_lag"]
+            for endpoint, stats in step["endpoints"].items():
+                print(f"  {endpoint:<22} {stats['throughput_per_second'] or 0:>7.2f}/s  "
+                      f"p50 {stats['p50_seconds']:.3f}s  p95 {stats['p95_seconds']:.3f}s  "
+                      f"p99 {stats['p99_seconds']:.3f}s  errors {stats['error_rate']:.1%}")
+            if step["event_loop_lag"]:
+                print(f"  event loop lag         p50 {step['event_loop_lag']['p50_seconds']:.3f}s  "
+                      f"p99 {step['event_loop_lag']['p99_seconds']:.3f}s  max {step['event_loop_lag']['max_seconds']:.3f}s")
+    finally:
+        await client.aclose()
+        if server:
+            server.should_exit = True
+            await server_task
+    return {"results": results, "event_loop_lag": lag}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Drive one API worker with synthetic traffic")
+    parser.add_argument("--rates", default="1,2,4,8",
+                        type=lambda text: [float(rate) for rate in text.split(",")],
+                        help="Comma-separated arrival rates in requests/s, one step each (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per step")
+    parser.add_argument("--concurrency", type=int, default=32, help="Most requests in flight at once")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        type=lambda text: [name for name in text.split(",") if name],
+                        help=f"Comma-separated subset of {', '.join(ENDPOINTS)}, picked uniformly per request")
+    parser.add_argument("--transport", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--url", help="Drive an already running worker instead of an in-process app")
+    parser.add_argument("--ad-placement-mode", choices=("upload", "video_id"), default="upload",
+                        help="Upload a small file (provider path) or pass a video_id")
+    parser.add_argument("--stitch-source", help="Local video used for stitching (default: passthrough)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--latency-scale", type=float, default=0.05,
+                        help="Multiplier on the recorded provider latencies (1.0 = production-like)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of provider calls failing with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of provider calls failing with 429")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    args.output = os.path.abspath(args.output)
+    if args.stitch_source:
+        args.stitch_source = os.path.abspath(args.stitch_source)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("API load test")
+    print("=" * 50)
+
+    original_cwd = os.getcwd()
+    workdir = fakes = None
+    if not args.url:
+        # Fakes first, so the backend picks up the local TwelveLabs URL when it is imported
+        fakes = FakeProviders(scale=args.latency_scale, error_rate=args.error_rate,
+                              throttle_rate=args.throttle_rate, seed=args.seed, root=BACKEND_DIR).start()
+        workdir = prepare_workdir()
+        os.chdir(workdir)
+    try:
+        run = asyncio.run(drive(args, fakes))
+    finally:
+        os.chdir(original_cwd)
+        if fakes:
+            fakes.stop()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "config": {
+                "rates": args.rates,
+                "duration": args.duration,
+                "concurrency": args.concurrency,
+                "endpoints": args.endpoints,
+                "transport": "external" if args.url else args.transport,
+                "ad_placement_mode": args.ad_placement_mode,
+                "stitch_source": bool(args.stitch_source),
+                "latency_scale": args.latency_scale,
+                "error_rate": args.error_rate,
+                "throttle_rate": args.throttle_rate,
+                "seed": args.seed
+            }
+        },
+        **run
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, label="rate")
+        for label, lag in report["event_loop_lag"].items():
+            before = baseline.get("event_loop_lag", {}).get(label)
+            if lag and before:
+                print(f"  event loop lag p99 at rate {label}: {before['p99_seconds']:.3f}s -> {lag['p99_seconds']:.3f}s")
+        if regressions:
+            print(f"\nRegressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,8 @@ import os
 from xmlrpc import client
 from dotenv import load_dotenv
 
-from twelvelabs import TwelveLabs
-from twelvelabs.indexes import IndexesCreateRequestModelsItem
-from twelvelabs.tasks import TasksRetrieveResponse
-
-
 from persona_analyzer import *
-
-import matplotlib.pyplot as plt
-from google import genai
+from persona_analyzer import TWELVELABS_BASE_URL, wait_for_index
 
 import requests
 
@@ -18,46 +11,92 @@ import requests
 
 import logging
 import json
+import hashlib
+from types import SimpleNamespace
+
+from analysis_cache import analysis_cache
+from call_scheduler import record_usage
+from metrics import gemini_usage
+from prompt_compaction import estimate_tokens
+from resilience import CALL_TIMEOUT_SECONDS, REQUEST_TIMEOUT, resilient_call
+from structured_logging import configure_logging, span
+from startup import lazy_property
+import base64
 import csv
 import io
 
 # Load environment variables from a .env file
 load_dotenv()
 
+# Degraded ad-categories answer: placements are still solved, just without category bonuses
+NO_AD_CATEGORIES = '{"advertisements": []}'
+
+
 class Context_engine:
     def __init__(self):
         self.api_key = os.getenv("twelve_API")
         self.index_id = os.getenv("twelve_index_id")
-        self.client = TwelveLabs(api_key=self.api_key)
+        # Called with (video_id, task_id, kind) after each upload; kind is "main" or "ad"
+        self.on_upload = None
         self.logging()
         self.logger.info("Context engine initialized.")
 
-        self.gemini_client = genai.Client(api_key=os.getenv("gemini_API"))
-        self.logger.info("Gemini client initialized.")
+    # SDK clients are built on first use so importing the API does not pay for them
+
+    @lazy_property
+    def client(self):
+        from twelvelabs import TwelveLabs
+        return TwelveLabs(api_key=self.api_key, timeout=CALL_TIMEOUT_SECONDS)
 
-        self.persona_analyzer = PersonaAnalyzer()
+    @lazy_property
+    def gemini_client(self):
+        from google import genai
+        client = genai.Client(api_key=os.getenv("gemini_API"),
+                              http_options={"timeout": int(CALL_TIMEOUT_SECONDS * 1000)})
+        self.logger.info("Gemini client initialized.")
+        return client
 
-        # Initialize other components as needed
+    @lazy_property
+    def persona_analyzer(self):
+        return PersonaAnalyzer()
 
     def logging(self):
+        # Handlers are installed once per process; constructing more engines adds none
+        configure_logging()
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG)
-        file_handler = logging.FileHandler("log.txt")
-        file_handler.setFormatter(
-            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        )
-        self.logger.addHandler(file_handler)
 
-    def upload_vid(self, video_file):
-        url = "https://api.twelvelabs.io/v1.3/tasks"
+    def upload_vid(self, video_file, kind="main", wait=False, notify=True):
+        """
+        Start indexing a video; returns its video id (once indexed when wait is set).
+        Internal uploads such as window clips pass notify=False to skip on_upload.
+        """
+        url = f"{TWELVELABS_BASE_URL}/tasks"
         files = {"video_file": video_file}
         payload = {"index_id": self.index_id}
         headers = {"x-api-key": self.api_key}
-        response = requests.post(url, data=payload, files=files, headers=headers)
+        with span("twelvelabs.upload"):
+            response = requests.post(url, data=payload, files=files, headers=headers, timeout=REQUEST_TIMEOUT)
 
-        return response.json().get("video_id")
+        task = response.json()
+        video_id = task.get("video_id")
+        task_id = task.get("_id") or task.get("id")
+        if video_id and notify and self.on_upload:
+            # e.g. speculative pre-analysis once the indexing task finishes
+            self.on_upload(video_id, task_id, kind)
+        if wait:
+            response.raise_for_status()
+            with span("twelvelabs.wait_for_index", video_id=video_id):
+                video_id = wait_for_index(task_id, self.api_key).get("video_id") or video_id
+        return video_id
     
-    def generate_emotion_timeline(self, response):
+    def upload_ad(self, video_file):
+        """Index an ad creative in TwelveLabs; ads share the index with main videos"""
+        return self.upload_vid(video_file, kind="ad")
+
+    def generate_emotion_timeline(self, response, artifacts=None):
+        if artifacts is not None:
+            return self._generate_emotion_timeline_in_memory(response, artifacts)
+
         csv_file_path = "emotion_timeline.csv"
         with open(csv_file_path, mode="w", newline="") as csv_file:
             csv_writer = csv.writer(csv_file)
@@ -81,24 +120,83 @@ class Context_engine:
                         except ValueError:
                             self.logger.warning(f"Skipping invalid emotion value: {row[1]}")
 
-        # Plot the data
-        plt.figure(figsize=(10, 6))
-        plt.plot(timestamps, emotions, marker="o", linestyle="-", color="b")
-        plt.title("Emotion Timeline")
-        plt.xlabel("Timestamp")
-        plt.ylabel("Emotion Value")
-        plt.xticks(rotation=45)
-        plt.grid(True)
-        plt.tight_layout()
-
         # Save the graph
         graph_file_path = "asserts/emotion_timeline_graph.png"
-        plt.savefig(graph_file_path)
-        plt.close()
+        self._plot_emotion_timeline(timestamps, emotions, graph_file_path)
 
         return graph_file_path
 
+    def _generate_emotion_timeline_in_memory(self, response, artifacts):
+        return self.render_emotion_timeline(response.text, artifacts)
+
+    def render_emotion_timeline(self, csv_text, artifacts):
+        """Parse the CSV and render the graph without touching shared files; returns the
+        graph's path when the context persists, otherwise a PNG data URL"""
+        timestamps = []
+        emotions = []
+        for row in csv.reader(io.StringIO(csv_text)):
+            if len(row) == 2:
+                try:
+                    emotions.append(float(row[1]))
+                    timestamps.append(row[0])
+                except ValueError:
+                    self.logger.warning(f"Skipping invalid emotion value: {row[1]}")
+
+        graph = io.BytesIO()
+        self._plot_emotion_timeline(timestamps, emotions, graph)
+
+        artifacts.put("emotion_csv", csv_text, "emotion_timeline.csv")
+        graph_path = artifacts.put("emotion_graph_png", graph.getvalue(), "emotion_timeline_graph.png")
+        # An in-memory context has no file to point at, so the graph travels as a data URL
+        return graph_path or "data:image/png;base64," + base64.b64encode(graph.getvalue()).decode("ascii")
+
+    def _plot_emotion_timeline(self, timestamps, emotions, target):
+        from matplotlib.figure import Figure
+
+        # Plot the data; Figure (not pyplot) keeps concurrent requests from sharing global state
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        ax.plot(timestamps, emotions, marker="o", linestyle="-", color="b")
+        ax.set_title("Emotion Timeline")
+        ax.set_xlabel("Timestamp")
+        ax.set_ylabel("Emotion Value")
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.grid(True)
+        fig.tight_layout()
+        fig.savefig(target, format="png")
+
     def call_pegasus(self, vid_id, query):
+        def analyze():
+            with span("twelvelabs.analyze", video_id=vid_id):
+                return self._call_pegasus(vid_id, query)
+        key = ("analyze", vid_id, query)
+        return analysis_cache.get_or_compute(key, lambda: resilient_call(
+            "twelvelabs", "analyze", analyze, cache_key=key, prompt_tokens=estimate_tokens(query)))
+
+    def _generate_content(self, prompt_type, contents, config, fallback_text=None):
+        """
+        Gemini generate_content through the resilience layer (hedging, circuit breaker, cache).
+        With fallback_text, an unavailable Gemini yields that degraded text, which is never cached.
+        """
+        def generate():
+            with span("gemini.generate_content", prompt_type=prompt_type) as call:
+                response = self.gemini_client.models.generate_content(model="gemini-2.5-flash", contents=contents, config=config)
+                call["usage"] = record_usage(gemini_usage(response))
+            return response
+        degraded = []
+        def fallback():
+            degraded.append(prompt_type)
+            return SimpleNamespace(text=fallback_text)
+        cache_key = ("generate_content", prompt_type, hashlib.sha1(contents.encode("utf-8")).hexdigest())
+        # Only the text is shared across requests; callers read nothing else from the response
+        text = analysis_cache.get_or_compute(
+            cache_key, lambda: resilient_call("gemini", "generate_content", generate, cache_key=cache_key,
+                                              fallback=fallback if fallback_text is not None else None,
+                                              prompt_tokens=estimate_tokens(contents)).text,
+            cacheable=lambda _: not degraded)
+        return SimpleNamespace(text=text)
+
+    def _call_pegasus(self, vid_id, query):
 
         # Replace with a valid video_id or index that supports the generate operation
         text_steam = self.client.analyze(
@@ -132,12 +230,14 @@ class Context_engine:
                 },
             },
         )
-        self.logger.info(f"Received timestamps and descriptions: {text_steam.data}")
+        # Payloads only at DEBUG; the argument is not formatted unless that level is enabled
+        self.logger.debug("Received timestamps and descriptions: %s", text_steam.data)
 
         return json.loads(text_steam.data)
 
 
-    def call_gemini(self, data, prompt_type="ads"):
+    def call_gemini(self, data, prompt_type="ads", artifacts=None):
+        """Ad categories JSON (prompt_type "ads"; no categories while Gemini is down) or the emotion CSV and graph"""
         data = str(data)
         prompt = "In a dict with a python list. What are the advertisments you can sell or linked? add the time stamps too. "
         
@@ -167,18 +267,18 @@ class Context_engine:
                     }
                 },
             }
-            response = self.gemini_client.models.generate_content(model="gemini-2.5-flash", contents=prompt + data, config={
+            response = self._generate_content(prompt_type, prompt + data, {
                 "response_mime_type": "application/json",
                 "response_schema": response_scehma,
-            })
-            self.logger.info(f"Received emotion graph: {response.text}")
+            }, fallback_text=NO_AD_CATEGORIES)
+            self.logger.debug("Received emotion graph: %s", response.text)
 
             return response.text
         else:
             prompt ="let's say sad is 0 and happy and exicted is 10 with this metric can you create timeline with values.create an emotion graph for this timeline. Generate a csv file for every second. Just give me the csv file with just one header row"
-            response = self.gemini_client.models.generate_content(model="gemini-2.5-flash", contents=prompt + data, config={"response_mime_type": "text/plain",})
+            response = self._generate_content(prompt_type, prompt + data, {"response_mime_type": "text/plain",})
             # Save the response text as a CSV file
-            file_location = self.generate_emotion_timeline(response)
+            file_location = self.generate_emotion_timeline(response, artifacts)
             return response.text, file_location
         
     def call_pegausus_for_emotion(self, vid_id, query):
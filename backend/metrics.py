@@ -0,0 +1,290 @@
+"""
+In-process metrics registry rendered in the Prometheus text format.
+Counters, gauges and histograms are plain locked dicts keyed by label values. External
+call latency, errors/429s and token usage are fed from structured_logging spans, so
+instrumented code only needs span(); caches and queues report through small helpers.
+"""
+
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from structured_logging import add_span_listener
+
+# Seconds; wide enough for sub-ms decisions and multi-minute video analysis calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_RATE_LIMIT_PATTERN = re.compile(r'\b429\b|Throttl|RESOURCE_EXHAUSTED|rate.?limit|Too Many Requests', re.I)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Sample the value at scrape time (e.g. a queue's qsize)"""
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        return self._functions[key]() if key in self._functions else self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                items.append((key, float(function())))
+            except Exception:
+                continue
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def snapshot(self, **labels) -> Optional[Tuple[List[int], float]]:
+        entry = self._values.get(self._key(labels))
+        return (list(entry[0]), entry[1]) if entry else None
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Approximate quantile from bucket counts (upper bound of the bucket holding it)"""
+        snapshot = self.snapshot(**labels)
+        if not snapshot:
+            return None
+        counts, _ = snapshot
+        target = q * sum(counts)
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            if running >= target and count:
+                return bound
+        return None
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+external_call_seconds = REGISTRY.histogram(
+    "external_call_duration_seconds", "Latency of calls to model providers", ("provider", "endpoint"))
+external_call_errors = REGISTRY.counter(
+    "external_call_errors_total", "Failed provider calls; reason is rate_limited (429) or error",
+    ("provider", "endpoint", "reason"))
+tokens_consumed = REGISTRY.counter(
+    "tokens_consumed_total", "Model tokens reported by providers, per pipeline stage",
+    ("provider", "stage", "direction"))
+stage_seconds = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds", "Duration of pipeline stages", ("stage", "kind", "status"))
+local_task_seconds = REGISTRY.histogram(
+    "local_task_duration_seconds", "Duration of local CPU tasks (shot detection, audio)", ("task",))
+http_request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds", "API request latency", ("method", "route", "status"))
+in_flight = REGISTRY.gauge(
+    "in_flight", "Requests or provider calls currently in progress", ("scope",))
+queue_depth = REGISTRY.gauge(
+    "queue_depth", "Items waiting in internal work queues", ("queue",))
+cache_requests = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by result (hit or miss)", ("cache", "result"))
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def executor_queue_depth(name: str, executor) -> None:
+    """Export a ThreadPoolExecutor's backlog as queue_depth{queue=name}"""
+    queue_depth.set_function(lambda: executor._work_queue.qsize(), queue=name)
+
+
+def token_counts(usage: Dict[str, Any]) -> Dict[str, float]:
+    """Normalize provider usage dicts (Bedrock, Gemini, TwelveLabs) into input/output counts"""
+    counts: Dict[str, float] = {}
+    for key, value in (usage or {}).items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        lowered = key.lower()
+        if "total" in lowered:
+            direction = "total"
+        elif "input" in lowered or "prompt" in lowered:
+            direction = "input"
+        elif "output" in lowered or "candidates" in lowered or "completion" in lowered:
+            direction = "output"
+        else:
+            continue
+        counts[direction] = counts.get(direction, 0) + value
+    # Only fall back to the provider's total when it doesn't split input/output
+    if "input" in counts or "output" in counts:
+        counts.pop("total", None)
+    return counts
+
+
+def gemini_usage(response) -> Dict[str, Any]:
+    """Token counts from a Gemini response's usage_metadata, in the shape token_counts reads"""
+    metadata = getattr(response, "usage_metadata", None)
+    return {key: getattr(metadata, key, None)
+            for key in ("prompt_token_count", "candidates_token_count", "total_token_count")}
+
+
+def _is_rate_limited(finished: Dict[str, Any]) -> bool:
+    return finished.get("http_status") == 429 or bool(_RATE_LIMIT_PATTERN.search(finished.get("error", "")))
+
+
+def record_span(finished: Dict[str, Any]) -> None:
+    """Span listener: route finished spans to the matching metric families"""
+    name = finished["span"]
+    seconds = finished["duration_ms"] / 1000
+    prefix, _, rest = name.partition(".")
+
+    if prefix == "stage":
+        stage_seconds.observe(seconds, stage=rest, kind=finished.get("job_kind", ""), status=finished["status"])
+    elif prefix == "http":
+        http_request_seconds.observe(seconds, method=finished.get("method", ""), route=finished.get("route", ""),
+                                     status=finished.get("status_code", "error"))
+    elif prefix == "local":
+        local_task_seconds.observe(seconds, task=rest)
+    else:
+        external_call_seconds.observe(seconds, provider=prefix, endpoint=rest)
+        failed = finished["status"] == "error" or finished.get("http_status", 200) >= 400
+        if failed:
+            reason = "rate_limited" if _is_rate_limited(finished) else "error"
+            external_call_errors.inc(provider=prefix, endpoint=rest, reason=reason)
+        for direction, count in token_counts(finished.get("usage")).items():
+            tokens_consumed.inc(count, provider=prefix, stage=finished.get("stage") or "none", direction=direction)
+
+
+def record_span_start(name: str, fields: Dict[str, Any]) -> None:
+    prefix = name.partition(".")[0]
+    if prefix not in ("stage", "http", "local"):
+        in_flight.inc(scope=prefix)
+
+
+def record_span_end(finished: Dict[str, Any]) -> None:
+    record_span(finished)
+    prefix = finished["span"].partition(".")[0]
+    if prefix not in ("stage", "http", "local"):
+        in_flight.dec(scope=prefix)
+
+
+add_span_listener(record_span_end, on_start=record_span_start)
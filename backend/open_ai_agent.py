@@ -1,7 +1,12 @@
-import boto3
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import json
+import logging
+from call_scheduler import scheduled
+from prompt_compaction import compact_prompt_inputs, estimate_tokens
+from structured_logging import propagate, span
 # Load environment variables from a .env file
 load_dotenv()
 
@@ -9,11 +14,43 @@ api_key = os.getenv('AWS_BEARER_TOKEN_BEDROCK')
 # Set the API key as an environment variable
 os.environ['AWS_BEARER_TOKEN_BEDROCK'] =  api_key
 
-# Create the Bedrock client
-client = boto3.client(
-    service_name="bedrock-runtime",
-    region_name="us-east-1"
-)
+logger = logging.getLogger(__name__)
+
+# Bounded fan-out for batch placement calls; the connection pool is sized to
+# match so concurrent converse() calls reuse sockets instead of queueing.
+MAX_CONCURRENT_CALLS = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "8"))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared Bedrock client, created on first use (boto3 import and setup are slow)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.config import Config
+
+                client_config = Config(
+                    max_pool_connections=MAX_CONCURRENT_CALLS,
+                    connect_timeout=5,
+                    read_timeout=int(os.getenv("BEDROCK_READ_TIMEOUT", "60")),
+                    retries={"max_attempts": 3, "mode": "adaptive"},
+                )
+                _client = boto3.client(
+                    service_name="bedrock-runtime",
+                    region_name="us-east-1",
+                    config=client_config
+                )
+    return _client
+
+
+def set_client(client) -> None:
+    """Swap in another Bedrock client (e.g. the benchmark's fake)"""
+    global _client
+    _client = client
 
 
 def call_openai(product, data, emotion_graph):
@@ -22,12 +59,84 @@ def call_openai(product, data, emotion_graph):
     messages = [{"role": "user", "content": [{"text": f"would {product} Products fit  any of the segments  {data} and give the transition as well make sure it matches with {emotion_graph}. Give the answer in a Answer in JSON format with keys and make sure nothing is outside the dict"}]}]
 
     # Make the API call
-    response = client.converse(
-        modelId=model_id,
-        messages=messages,
-        
-    )
+    with scheduled("bedrock", estimate_tokens(messages[0]["content"][0]["text"])) as ticket, \
+            span("bedrock.converse", model=model_id, purpose="placement") as call:
+        response = get_client().converse(
+            modelId=model_id,
+            messages=messages,
+
+        )
+        call["usage"] = ticket["usage"] = response.get("usage", {})
 
     sample_dict = response['output']['message']['content'][1]['text']
 
-    return sample_dict
\ No newline at end of file
+    return sample_dict
+
+
+def call_openai_batch(products, data, emotion_graph, max_workers=MAX_CONCURRENT_CALLS, compact=True):
+    """Run call_openai for every product concurrently, returning results in input order.
+
+    A failed call yields a JSON error string in its slot so one bad product
+    does not drop the rest of the ranking. With compact=True the timeline and
+    ad categories are compacted once up front and shared by every call.
+    """
+    if not products:
+        return []
+
+    if compact:
+        data, emotion_graph, stats = compact_prompt_inputs(data, emotion_graph)
+        logger.info("Prompt compaction: %s -> %s tokens per call (%.0f%% saved, %s timeline points)",
+                    stats['original_tokens'], stats['compact_tokens'], stats['savings_ratio'] * 100,
+                    stats['timeline_points'])
+
+    def _call(product):
+        try:
+            return call_openai(product, data, emotion_graph)
+        except Exception as e:
+            return json.dumps({"product": product, "error": str(e)})
+
+    workers = max(1, min(max_workers, MAX_CONCURRENT_CALLS, len(products)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map() preserves submission order, i.e. the ranking order
+        return list(executor.map(propagate(_call), products))
+
+
+def call_openai_explanation(placement):
+    """Ask the LLM only for the explanation text of a placement chosen by the local solver"""
+    model_id = "openai.gpt-oss-120b-1:0"
+    messages = [{"role": "user", "content": [{"text": f"An ad for {placement['product']} is placed at {placement['timestamp']} where the emotion value is {placement['emotion_value']} on a 0-10 scale and the emotion trend is {placement['emotion_trend']}. The segment is associated with these ad categories: {', '.join(placement['ad_categories']) or 'none'}. In two sentences explain why this placement fits. Answer with plain text only"}]}]
+
+    with scheduled("bedrock", estimate_tokens(messages[0]["content"][0]["text"])) as ticket, \
+            span("bedrock.converse", model=model_id, purpose="explanation") as call:
+        response = get_client().converse(
+            modelId=model_id,
+            messages=messages,
+        )
+        call["usage"] = ticket["usage"] = response.get("usage", {})
+
+    return response['output']['message']['content'][1]['text']
+
+
+def explain_placements_batch(placements, max_workers=MAX_CONCURRENT_CALLS):
+    """Attach LLM explanation text to each solver placement, keeping placement order"""
+    if not placements:
+        return []
+
+    def _explain(placement):
+        try:
+            transition = call_openai_explanation(placement)
+        except Exception as e:
+            transition = f"Explanation unavailable: {e}"
+        return json.dumps({
+            "fits": True,
+            "segment_time": placement["timestamp"],
+            "current_advertisements": placement["ad_categories"],
+            "suggested_advertisement": [placement["product"]],
+            "emotion_trend": placement["emotion_trend"],
+            "confidence": placement["confidence"],
+            "transition": transition
+        }, indent=2, ensure_ascii=False)
+
+    workers = max(1, min(max_workers, MAX_CONCURRENT_CALLS, len(placements)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(propagate(_explain), placements))
@@ -8,19 +8,55 @@ the TwelveLabs summarize endpoint with persona-specific prompts.
 
 import os
 import json
+import logging
 import requests
+import time
 from typing import Dict, List, Any
 from dotenv import load_dotenv
 
+from analysis_cache import analysis_cache
+from call_scheduler import record_usage
+from prompt_compaction import estimate_tokens
+from resilience import REQUEST_TIMEOUT, resilient_call
+from structured_logging import span
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
+# Overridable so benchmarks can point the REST calls at a local stand-in server
+TWELVELABS_BASE_URL = os.getenv("TWELVELABS_BASE_URL", "https://api.twelvelabs.io/v1.3")
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "5"))
+INDEX_TIMEOUT_SECONDS = float(os.getenv("INDEX_TIMEOUT_SECONDS", "1800"))
+
+
+def wait_for_index(task_id: str, api_key: str = None, poll_seconds: float = INDEX_POLL_SECONDS,
+                   timeout: float = INDEX_TIMEOUT_SECONDS, session: requests.Session = None) -> Dict[str, Any]:
+    """Poll a TwelveLabs indexing task until it is ready and return it; raises if it fails or times out"""
+    get = session.get if session is not None else requests.get
+    headers = None if session is not None else {"x-api-key": api_key or os.getenv("TWELVELABS_API_KEY")}
+    started = time.time()
+    while True:
+        response = get(f"{TWELVELABS_BASE_URL}/tasks/{task_id}", headers=headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        task = response.json()
+        status = task.get("status")
+        if status == "ready":
+            return task
+        if status == "failed":
+            raise RuntimeError(f"Indexing failed for task {task_id}")
+        if time.time() - started > timeout:
+            raise TimeoutError(f"Indexing did not finish within {timeout:.0f}s")
+        time.sleep(poll_seconds)
+
+
 class PersonaAnalyzer:
     """Analyzes video content from different persona perspectives using TwelveLabs Summarize API"""
     
     def __init__(self, api_key: str = None):
         self.api_key = api_key or os.getenv("TWELVELABS_API_KEY") 
-        self.base_url = "https://api.twelvelabs.io/v1.3"
+        self.base_url = TWELVELABS_BASE_URL
         self.headers = {
             "x-api-key": self.api_key,
             "Content-Type": "application/json"
@@ -39,10 +75,10 @@ class PersonaAnalyzer:
                 data = json.load(f)
                 return data.get('personas', [])
         except FileNotFoundError:
-            print("Warning: persona_categories.json not found")
+            logger.warning("persona_categories.json not found")
             return []
         except json.JSONDecodeError as e:
-            print(f"Error parsing persona file: {e}")
+            logger.error("Error parsing persona file: %s", e)
             return []
     
     def _generate_persona_prompt(self, persona: Dict[str, Any]) -> str:
@@ -113,8 +149,12 @@ Provide specific, detailed analysis in the content_overview section and precise
             return 0.0
     
     def analyze_video_for_persona(self, video_id: str, persona: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze a video for a specific persona using the summarize API"""
-        
+        """Analyze a video for a specific persona using the summarize API (successful results are cached)"""
+        key = ("persona", video_id, persona["name"], self._generate_persona_prompt(persona))
+        return analysis_cache.get_or_compute(key, lambda: self._analyze_video_for_persona(video_id, persona),
+                                             cacheable=lambda result: result["status"] == "success")
+
+    def _analyze_video_for_persona(self, video_id: str, persona: Dict[str, Any]) -> Dict[str, Any]:
         try:
             # Generate persona-specific prompt
             prompt = self._generate_persona_prompt(persona)
@@ -127,14 +167,27 @@ Provide specific, detailed analysis in the content_overview section and precise
                 "temperature": 0.3  # Slightly creative but focused
             }
             
-            print(f"Analyzing for {persona['name']}...")
+            logger.info("Analyzing for %s", persona["name"], extra={"video_id": video_id})
             
-            # Make API request
-            response = requests.post(
-                f"{self.base_url}/summarize",
-                headers=self.headers,
-                json=payload
-            )
+            # Make API request (hedged and circuit-broken; 429/5xx count as provider failures)
+            def summarize():
+                with span("twelvelabs.summarize", video_id=video_id, persona=persona["name"]) as call:
+                    response = requests.post(
+                        f"{self.base_url}/summarize",
+                        headers=self.headers,
+                        json=payload,
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    call["http_status"] = response.status_code
+                    if response.status_code == 429 or response.status_code >= 500:
+                        response.raise_for_status()
+                    if response.status_code == 200:
+                        call["usage"] = record_usage(response.json().get("usage", {}))
+                return response
+
+            response = resilient_call("twelvelabs", "summarize", summarize,
+                                      cache_key=("summarize", video_id, persona["name"], prompt),
+                                      prompt_tokens=estimate_tokens(prompt))
             
             if response.status_code == 200:
                 result = response.json()
@@ -210,7 +263,7 @@ Provide specific, detailed analysis in the content_overview section and precise
     def analyze_video_for_all_personas(self, video_id: str) -> Dict[str, Any]:
         """Analyze a video for all personas"""
         
-        print(f"Analyzing video {video_id} for {len(self.personas)} personas...")
+        logger.info("Analyzing video %s for %d personas", video_id, len(self.personas))
         
         results = {
             "video_id": video_id,
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Compact columnar store for persona analysis results.
+Scores and status live in memory-mappable .npy arrays indexed by (video, persona); the
+long content_overview prose sits in a separate SQLite table that is only read on demand.
+Import/export round-trips the comprehensive_video_analysis_results.json schema.
+
+Usage:
+    python persona_store.py import json/comprehensive_video_analysis_results.json persona_store/
+    python persona_store.py export persona_store/ exported_results.json
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+SCORE_CATEGORIES = [
+    "overall_alignment",
+    "emotional_engagement",
+    "content_relevance",
+    "visual_appeal",
+    "narrative_quality"
+]
+# Score columns: the five categories followed by the persona's overall_score
+SCORE_COLUMNS = SCORE_CATEGORIES + ["overall_score"]
+
+STATUS_MISSING = 0
+STATUS_SUCCESS = 1
+STATUS_ERROR = 2
+STATUS_CODES = {"success": STATUS_SUCCESS, "error": STATUS_ERROR}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+class PersonaScoreStore:
+    """(video, persona) score matrix on disk as .npy plus an SQLite side table for text"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    row INTEGER PRIMARY KEY, video_key TEXT UNIQUE, video_id TEXT,
+                    video_name TEXT, video_description TEXT
+                );
+                CREATE TABLE IF NOT EXISTS personas (
+                    col INTEGER PRIMARY KEY, name TEXT UNIQUE, category TEXT, motto TEXT
+                );
+                CREATE TABLE IF NOT EXISTS overviews (
+                    row INTEGER, col INTEGER, content_overview TEXT, usage TEXT, error TEXT,
+                    PRIMARY KEY (row, col)
+                );
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+        self._scores = None
+        self._status = None
+        self._videos = None
+        self._video_rows = None
+        self._personas = None
+
+    # ---- loading -------------------------------------------------------
+
+    @property
+    def scores(self) -> np.ndarray:
+        """float32 array [video, persona, SCORE_COLUMNS], memory-mapped read-only"""
+        if self._scores is None:
+            path = os.path.join(self.root, "scores.npy")
+            self._scores = np.load(path, mmap_mode="r") if os.path.exists(path) \
+                else np.zeros((0, 0, len(SCORE_COLUMNS)), dtype=np.float32)
+        return self._scores
+
+    @property
+    def status(self) -> np.ndarray:
+        """int8 array [video, persona] of STATUS_* codes"""
+        if self._status is None:
+            path = os.path.join(self.root, "status.npy")
+            self._status = np.load(path, mmap_mode="r") if os.path.exists(path) \
+                else np.zeros((0, 0), dtype=np.int8)
+        return self._status
+
+    @property
+    def videos(self) -> List[Dict[str, Any]]:
+        if self._videos is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT video_key, video_id, video_name, video_description FROM videos ORDER BY row"
+                ).fetchall()
+            self._videos = [{"video_key": r[0], "video_id": r[1], "video_name": r[2], "video_description": r[3]}
+                            for r in rows]
+        return self._videos
+
+    @property
+    def personas(self) -> List[Dict[str, Any]]:
+        if self._personas is None:
+            with self._lock:
+                rows = self._conn.execute("SELECT name, category, motto FROM personas ORDER BY col").fetchall()
+            self._personas = [{"name": r[0], "category": r[1], "motto": r[2]} for r in rows]
+        return self._personas
+
+    def video_row(self, video_key: str) -> Optional[int]:
+        if self._video_rows is None:
+            self._video_rows = {video["video_key"]: row for row, video in enumerate(self.videos)}
+        return self._video_rows.get(video_key)
+
+    def overall_scores(self) -> np.ndarray:
+        """[video, persona] overall scores, NaN where the analysis did not succeed"""
+        overall = np.array(self.scores[:, :, SCORE_COLUMNS.index("overall_score")], dtype=np.float32)
+        overall[self.status != STATUS_SUCCESS] = np.nan
+        return overall
+
+    def persona_affinity(self, general_weight: float = 0.4, sports_weight: float = 0.6) -> np.ndarray:
+        """Per-video affinity (40% general + 60% sports persona averages), vectorized"""
+        overall = self.overall_scores()
+        categories = np.array([p["category"] for p in self.personas])
+        affinity = np.zeros(overall.shape[0], dtype=np.float32)
+        for category, weight in (("general", general_weight), ("sports", sports_weight)):
+            columns = overall[:, categories == category]
+            if columns.shape[1]:
+                counts = np.sum(~np.isnan(columns), axis=1)
+                sums = np.nansum(columns, axis=1)
+                affinity += weight * np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        return np.round(affinity, 2)
+
+    def get_overview(self, video_key: str, persona_name: str) -> Optional[str]:
+        """Lazily read one content_overview"""
+        row = self.video_row(video_key)
+        col = next((i for i, p in enumerate(self.personas) if p["name"] == persona_name), None)
+        if row is None or col is None:
+            return None
+        with self._lock:
+            result = self._conn.execute(
+                "SELECT content_overview FROM overviews WHERE row = ? AND col = ?", (row, col)
+            ).fetchone()
+        return result[0] if result else None
+
+    def combined_overviews(self) -> Dict[str, str]:
+        """Per video_key, the content overviews of its successful analyses joined in persona order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row, col, content_overview FROM overviews ORDER BY row, col").fetchall()
+        status = self.status
+        texts: Dict[int, List[str]] = {}
+        for row, col, overview in rows:
+            if overview and status[row, col] == STATUS_SUCCESS:
+                texts.setdefault(row, []).append(overview)
+        return {video["video_key"]: " ".join(texts.get(row, [])) for row, video in enumerate(self.videos)}
+
+    # ---- import / export -----------------------------------------------
+
+    def import_results(self, results: Dict[str, Any]) -> None:
+        """Replace the store contents with a comprehensive results object"""
+        video_analyses = results.get("video_analyses", {})
+        persona_index = {}
+        personas = []
+        for video_data in video_analyses.values():
+            for name, analysis in video_data.get("persona_analyses", {}).items():
+                if name not in persona_index:
+                    persona_index[name] = len(personas)
+                    personas.append((name, analysis.get("category"), analysis.get("motto")))
+
+        scores = np.zeros((len(video_analyses), len(personas), len(SCORE_COLUMNS)), dtype=np.float32)
+        status = np.zeros((len(video_analyses), len(personas)), dtype=np.int8)
+        videos = []
+        overviews = []
+        for row, (video_key, video_data) in enumerate(video_analyses.items()):
+            metadata = video_data.get("video_metadata", {})
+            videos.append((row, video_key, metadata.get("video_id") or video_data.get("video_id"),
+                           metadata.get("video_name"), metadata.get("video_description")))
+            for name, analysis in video_data.get("persona_analyses", {}).items():
+                col = persona_index[name]
+                status[row, col] = STATUS_CODES.get(analysis.get("status"), STATUS_ERROR)
+                analysis_scores = analysis.get("scores", {})
+                for k, column in enumerate(SCORE_CATEGORIES):
+                    value = analysis_scores.get(column, 0)
+                    scores[row, col, k] = value if isinstance(value, (int, float)) else 0
+                scores[row, col, -1] = analysis.get("overall_score", 0) or 0
+                overviews.append((row, col, analysis.get("content_overview"),
+                                  json.dumps(analysis.get("usage", {})), analysis.get("error")))
+
+        meta = {key: value for key, value in results.items() if key != "video_analyses"}
+        with self._lock, self._conn:
+            for table in ("videos", "personas", "overviews", "meta"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany("INSERT INTO videos VALUES (?, ?, ?, ?, ?)", videos)
+            self._conn.executemany("INSERT INTO personas VALUES (?, ?, ?, ?)",
+                                   [(col, *persona) for col, persona in enumerate(personas)])
+            self._conn.executemany("INSERT INTO overviews VALUES (?, ?, ?, ?, ?)", overviews)
+            self._conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in meta.items()])
+
+        np.save(os.path.join(self.root, "scores.npy"), scores)
+        np.save(os.path.join(self.root, "status.npy"), status)
+        self._scores = self._status = self._videos = self._video_rows = self._personas = None
+
+    def import_json(self, json_file: str) -> None:
+        with open(json_file, "r", encoding="utf-8") as f:
+            self.import_results(json.load(f))
+
+    def export_results(self) -> Dict[str, Any]:
+        """Rebuild the comprehensive results schema (reads every overview)"""
+        with self._lock:
+            meta = {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+            texts = {(row, col): (overview, usage, error) for row, col, overview, usage, error in
+                     self._conn.execute("SELECT row, col, content_overview, usage, error FROM overviews")}
+
+        scores = self.scores
+        status = self.status
+        video_analyses = {}
+        for row, video in enumerate(self.videos):
+            persona_analyses = {}
+            for col, persona in enumerate(self.personas):
+                code = int(status[row, col])
+                if code == STATUS_MISSING:
+                    continue
+                overview, usage, error = texts.get((row, col), (None, "{}", None))
+                if code == STATUS_SUCCESS:
+                    persona_analyses[persona["name"]] = {
+                        "persona": persona["name"],
+                        "category": persona["category"],
+                        "motto": persona["motto"],
+                        "content_overview": overview,
+                        "scores": {column: _as_number(scores[row, col, k])
+                                   for k, column in enumerate(SCORE_CATEGORIES)},
+                        "overall_score": round(float(scores[row, col, -1]), 2),
+                        "usage": json.loads(usage or "{}"),
+                        "status": "success"
+                    }
+                else:
+                    persona_analyses[persona["name"]] = {
+                        "persona": persona["name"],
+                        "category": persona["category"],
+                        "error": error,
+                        "status": STATUS_NAMES.get(code, "error")
+                    }
+            successful = sum(1 for a in persona_analyses.values() if a["status"] == "success")
+            video_analyses[video["video_key"]] = {
+                "video_id": video["video_id"],
+                "persona_analyses": persona_analyses,
+                "summary": {
+                    "total_personas": len(persona_analyses),
+                    "successful_analyses": successful,
+                    "failed_analyses": len(persona_analyses) - successful
+                },
+                "video_metadata": {
+                    "video_key": video["video_key"],
+                    "video_name": video["video_name"],
+                    "video_description": video["video_description"],
+                    "video_id": video["video_id"]
+                }
+            }
+
+        results = {"analysis_metadata": meta.pop("analysis_metadata", {}), "video_analyses": video_analyses}
+        results.update(meta)
+        return results
+
+    def export_json(self, json_file: str) -> None:
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(self.export_results(), f, indent=2, ensure_ascii=False)
+
+
+def _as_number(value) -> float:
+    """Return ints as ints so exported scores match the original JSON"""
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print(__doc__)
+        return
+
+    command, source, target = sys.argv[1:]
+    if command == "import":
+        store = PersonaScoreStore(target)
+        store.import_json(source)
+        print(f"Imported {len(store.videos)} videos x {len(store.personas)} personas into {target}")
+    else:
+        PersonaScoreStore(source).export_json(target)
+        print(f"Exported results to: {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Ad placement pipeline stages.
+Each stage takes the request params, the results of earlier stages and the request's
+ArtifactContext, and returns the partial results it adds, so the same stages can run
+inline or as a background job without sharing files between requests.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Tuple
+
+import run_multi_video_analysis
+from artifacts import ArtifactContext
+from call_scheduler import PRIORITY_INTERACTIVE, scheduling
+from audio_excitement import calibrate_curve, curve_to_csv, excitement_curve
+from embedding_similarity_analysis import EmbeddingSimilarityAnalyzer
+from open_ai_agent import explain_placements_batch
+from placement_solver import solve_placements
+from prompt_compaction import parse_emotion_csv
+from resilience import ProviderUnavailable
+from shot_detection import ShotBoundaryDetector, snap_placements
+from stitching import StitchingError, ffmpeg_available, probe_media
+from structured_logging import propagate, span
+from windowed_analysis import WindowedPegasus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADS_ID = ['68e1f22c830688fe0b91eb9b', '68e1ed5d17b39f617835dd41', '68e1a0e164ff05606e15297c']
+# Similarity index written by ingest_catalog.py; when present it is the ad pool
+AD_CATALOG_INDEX = os.getenv("AD_CATALOG_INDEX", "json/ad_catalog_index.json")
+
+_catalog_lock = threading.Lock()
+_catalog_cache: Dict[str, Any] = {}
+
+EMOTION_PROMPT = "chapterize the video for emotion timeline and time stamp it based on the video"
+KEY_FRAME_PROMPT = "What are the key frame timestamps of the video?"
+
+# Where the emotion timeline comes from: Gemini only, local audio only, or Gemini calibrated by audio
+EMOTION_SOURCE_LLM = "llm"
+EMOTION_SOURCE_AUDIO = "audio"
+EMOTION_SOURCE_CALIBRATED = "calibrated"
+EMOTION_SOURCES = (EMOTION_SOURCE_LLM, EMOTION_SOURCE_AUDIO, EMOTION_SOURCE_CALIBRATED)
+
+
+def load_ad_catalog(index_file: str = None) -> Dict[str, Any]:
+    """The catalog index as {ads_id, ad_analyses by video id}, reloaded when the file changes; empty if none"""
+    index_file = index_file or AD_CATALOG_INDEX
+    try:
+        mtime = os.path.getmtime(index_file)
+    except OSError:
+        return {}
+    with _catalog_lock:
+        if _catalog_cache.get("key") != (index_file, mtime):
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            analyses = {analysis["video_metadata"]["video_id"]: analysis
+                        for analysis in index.get("video_analyses", {}).values()}
+            _catalog_cache.update(key=(index_file, mtime), catalog={
+                "ads_id": index.get("ads_id") or list(analyses), "ad_analyses": analyses})
+            logger.info("Loaded %d catalog ads from %s.", len(analyses), index_file)
+        return _catalog_cache["catalog"]
+
+
+def default_ads_id() -> List[str]:
+    """The ingested catalog's ads, or the demo pool when no catalog index exists"""
+    return load_ad_catalog().get("ads_id") or DEFAULT_ADS_ID
+
+
+def _pegasus(context_engine, params: Dict[str, Any], prompts: List[str]) -> List[Dict[str, Any]]:
+    """call_pegasus per prompt in parallel, windowed when params carry a window_seconds and a local source"""
+    video_id = params["video_id"]
+    window_seconds = params.get("window_seconds")
+    source_path = params.get("source_path")
+    if window_seconds and not source_path:
+        # Windows are clipped from the local file; prompt-scoped calls on the full video save nothing
+        logger.warning("window_seconds needs a local source_path; analyzing %s whole.", video_id)
+        window_seconds = None
+    if not window_seconds:
+        with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+            return list(executor.map(propagate(lambda prompt: context_engine.call_pegasus(video_id, prompt)), prompts))
+
+    duration = params.get("duration") or probe_media(source_path)["duration"]
+    windowed = WindowedPegasus(context_engine, window_seconds,
+                               params.get("window_overlap", min(30.0, window_seconds / 4)))
+    return windowed.analyze_many(video_id, prompts, duration, source_path)
+
+
+def run_emotion_stage(context_engine, params: Dict[str, Any], results: Dict[str, Any],
+                      artifacts: ArtifactContext) -> Dict[str, Any]:
+    """Pegasus chapters + Gemini ad categories and emotion timeline (optionally from local audio)"""
+    emotion_source = params.get("emotion_source", EMOTION_SOURCE_LLM)
+    source_path = params.get("source_path")
+    if emotion_source != EMOTION_SOURCE_LLM and not source_path:
+        logger.warning("emotion_source=%s needs a local source_path; using the LLM timeline.", emotion_source)
+        emotion_source = EMOTION_SOURCE_LLM
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # The audio curve is local and cheap, so it runs while Pegasus is busy
+        audio_future = executor.submit(propagate(excitement_curve), source_path) \
+            if emotion_source != EMOTION_SOURCE_LLM else None
+
+        logger.info("Calling Pegasus for emotion analysis and key frame timestamps.")
+        emotion, emotion_objects = _pegasus(context_engine, params, [EMOTION_PROMPT, KEY_FRAME_PROMPT])
+
+        logger.info("Calling Gemini for ads category analysis.")
+        gemini_ads_cat = context_engine.call_gemini(emotion_objects)
+
+        audio_failed = False
+        if emotion_source == EMOTION_SOURCE_AUDIO:
+            try:
+                audio_curve, stats = audio_future.result()
+                logger.info("Using the local audio excitement curve (%sx real time).", stats["realtime_factor"])
+            except StitchingError as e:
+                logger.warning("Audio excitement curve failed (%s); using the LLM timeline.", e)
+                emotion_source = EMOTION_SOURCE_LLM
+                audio_failed = True
+
+        if emotion_source == EMOTION_SOURCE_AUDIO:
+            emotion_csv = curve_to_csv(audio_curve)
+            gemini_emotion_graph_loc = context_engine.render_emotion_timeline(emotion_csv, artifacts)
+        else:
+            logger.info("Calling Gemini for emotion CSV and graph generation.")
+            try:
+                emotion_csv, gemini_emotion_graph_loc = context_engine.call_gemini(emotion, "emotion", artifacts)
+            except ProviderUnavailable:
+                if not source_path or audio_failed:
+                    raise
+                # Degraded mode: the local audio curve stands in for the LLM timeline
+                logger.warning("Gemini unavailable; falling back to the local audio excitement curve.")
+                audio_curve, _ = audio_future.result() if audio_future else excitement_curve(source_path)
+                emotion_csv = curve_to_csv(audio_curve)
+                gemini_emotion_graph_loc = context_engine.render_emotion_timeline(emotion_csv, artifacts)
+                emotion_source = EMOTION_SOURCE_AUDIO
+
+        if emotion_source == EMOTION_SOURCE_CALIBRATED:
+            try:
+                audio_curve, _ = audio_future.result()
+            except StitchingError as e:
+                logger.warning("Audio calibration skipped: %s", e)
+                audio_curve = []
+            _, rows = parse_emotion_csv(emotion_csv)
+            blended, stats = calibrate_curve([(seconds, value) for _, seconds, value in rows], audio_curve)
+            logger.info("Calibrated the LLM timeline with audio (correlation %s).", stats["correlation"])
+            emotion_csv = curve_to_csv([value for _, value in blended], [label for label, _, _ in rows])
+            gemini_emotion_graph_loc = context_engine.render_emotion_timeline(emotion_csv, artifacts)
+
+    return {
+        "emotion": emotion,
+        "emotion_csv": emotion_csv,
+        "emotion_graph": gemini_emotion_graph_loc,
+        "ads_categories": gemini_ads_cat
+    }
+
+
+def run_ranking_stage(context_engine, params: Dict[str, Any], results: Dict[str, Any],
+                      artifacts: ArtifactContext) -> Dict[str, Any]:
+    """Persona analysis of main video and ads, then similarity ranking"""
+    logger.info("Running multi-video analysis for persona matching.")
+    # Catalog ads were analyzed at ingest time, so only ads outside it are analyzed again
+    ad_analyses = params.get("ad_analyses") or load_ad_catalog().get("ad_analyses")
+    comprehensive_results = run_multi_video_analysis.persona_main(
+        params["video_id"], params.get("ads_id") or default_ads_id(), artifacts, ad_analyses)
+
+    logger.info("Generating analysis report.")
+    report = EmbeddingSimilarityAnalyzer(results=comprehensive_results).generate_analysis_report()
+    artifacts.put("similarity_report", report, "embedding_similarity_results.json")
+    return {"final_score": report["final_score"]}
+
+
+def run_placement_stage(context_engine, params: Dict[str, Any], results: Dict[str, Any],
+                        artifacts: ArtifactContext) -> Dict[str, Any]:
+    """Local placement solver plus LLM explanations"""
+    logger.info("Generating final ad placement recommendations.")
+    placements = solve_placements(results["final_score"], results["emotion_csv"], results["ads_categories"])
+
+    source_path = params.get("source_path")
+    if source_path and ffmpeg_available():
+        # Snap breaks onto local shot boundaries so ads never land mid-shot
+        logger.info("Detecting shot boundaries for break alignment.")
+        with span("local.shot_detection"):
+            detection = ShotBoundaryDetector().detect(source_path)
+        artifacts.put("shot_boundaries", detection, "shot_boundaries.json")
+        placements = snap_placements(placements, detection["boundaries"])
+
+    return {
+        "placements": placements,
+        "ad_placement_report": explain_placements_batch(placements)
+    }
+
+
+STAGES = [
+    ("emotion_timeline", run_emotion_stage),
+    ("ranking", run_ranking_stage),
+    ("placements", run_placement_stage),
+]
+
+
+def build_stages(context_engine) -> List[Tuple[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]]]:
+    """Bind the stages to a context engine as (name, fn(params, results)) pairs for JobManager.
+
+    Job artifacts persist under the job id so a resumed job finds its earlier files.
+    params may carry "priority" (interactive by default) and "tenant" for the call scheduler.
+    """
+    def bind(stage):
+        def run(params, results):
+            artifacts = ArtifactContext(namespace=params.get("job_id"), persist=True)
+            # Provider calls are scheduled under the job's priority class and tenant
+            with scheduling(params.get("priority", PRIORITY_INTERACTIVE), params.get("tenant")):
+                return stage(context_engine, params, results, artifacts)
+        return run
+
+    return [(name, bind(stage)) for name, stage in STAGES]
+
+
+def run_pipeline(context_engine, video_id: str, ads_id: List[str] = None,
+                 artifacts: ArtifactContext = None, **options) -> Dict[str, Any]:
+    """Run every stage inline with one shared artifact context and return the /ad_placement payload.
+
+    options are extra stage params, e.g. source_path plus window_seconds for long-form videos.
+    """
+    params = {"video_id": video_id, "ads_id": ads_id or default_ads_id(), **options}
+    artifacts = artifacts or ArtifactContext()
+    results = {}
+    for name, stage in STAGES:
+        with span(f"stage.{name}", job_kind="inline"):
+            results.update(stage(context_engine, params, results, artifacts))
+    return format_result(results)
+
+
+def format_result(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape pipeline results like the synchronous /ad_placement response"""
+    return {
+        "emotion": results.get("emotion"),
+        "emotion_graph": results.get("emotion_graph"),
+        "ad_placement_report": results.get("ad_placement_report", [])
+    }
+
+
+def format_job_result(results: Dict[str, Any], produced_only: bool = False) -> Dict[str, Any]:
+    """
+    Results of a placement job so far: the /ad_placement fields plus the ranking (final_score)
+    and the solver's placements. produced_only drops fields no finished stage has produced yet.
+    """
+    payload = {**format_result(results), "final_score": results.get("final_score"),
+               "placements": results.get("placements")}
+    if produced_only:
+        return {key: value for key, value in payload.items() if key in results}
+    return payload
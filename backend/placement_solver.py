@@ -0,0 +1,237 @@
+"""
+Deterministic local placement solver.
+Chooses which ranked ad goes into which emotion slot without an LLM: a DP picks the
+best set of slots under spacing/load constraints and the Hungarian method assigns
+ads to those slots with no repeats.
+"""
+
+import bisect
+import json
+from typing import Dict, List, Any, Optional
+
+from prompt_compaction import parse_emotion_csv, rdp_indices
+from timecodes import IntervalIndex, format_timestamp
+
+# How attractive each local emotion trend is as a break point (natural pauses first)
+DEFAULT_TREND_PREFERENCE = {
+    "falling": 1.0,
+    "low": 0.8,
+    "peak": 0.6,
+    "rising": 0.3,
+}
+
+
+def _classify_trend(previous: Optional[float], value: float, following: Optional[float]) -> str:
+    """Classify the emotion shape at a point from its neighbours"""
+    previous = value if previous is None else previous
+    following = value if following is None else following
+    if value >= previous and value >= following and (value > previous or value > following):
+        return "peak"
+    if value <= previous and value <= following:
+        return "low"
+    return "falling" if following < value else "rising"
+
+
+def candidate_slots_from_timeline(emotion_csv: str, ads_json: Any = None,
+                                  epsilon: float = 0.5) -> List[Dict[str, Any]]:
+    """Build candidate ad slots from the shape-defining points of the emotion timeline"""
+    _, rows = parse_emotion_csv(emotion_csv)
+    if not rows:
+        return []
+
+    ads_segments = IntervalIndex([])
+    if ads_json:
+        try:
+            ads_data = json.loads(ads_json) if isinstance(ads_json, str) else ads_json
+            ads_segments = IntervalIndex.from_segments(ads_data.get("advertisements", []))
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            ads_segments = IntervalIndex([])
+
+    indices = rdp_indices([(seconds, value) for _, seconds, value in rows], epsilon)
+    slots = []
+    for position, i in enumerate(indices):
+        previous = rows[indices[position - 1]][2] if position > 0 else None
+        following = rows[indices[position + 1]][2] if position + 1 < len(indices) else None
+        label, seconds, value = rows[i]
+        slots.append({
+            "time": seconds,
+            "timestamp": format_timestamp(seconds),
+            "emotion_value": value,
+            "trend": _classify_trend(previous, value, following),
+            "ad_categories": ads_segments.active_at(seconds, {}).get("advertisement", [])
+        })
+    return slots
+
+
+def hungarian(cost: List[List[float]]) -> List[int]:
+    """Minimum-cost assignment for an n x m matrix (n <= m); returns the column for each row"""
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if current < minv[j]:
+                        minv[j] = current
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+class PlacementSolver:
+    """Assigns ranked ads to emotion slots under spacing, load, trend and no-repeat constraints"""
+
+    def __init__(self,
+                 min_spacing: float = 10.0,
+                 max_ads: Optional[int] = None,
+                 ads_per_minute: float = 2.0,
+                 trend_preference: Dict[str, float] = None,
+                 category_bonus: float = 0.25):
+        self.min_spacing = min_spacing
+        self.max_ads = max_ads
+        self.ads_per_minute = ads_per_minute
+        self.trend_preference = trend_preference or DEFAULT_TREND_PREFERENCE
+        self.category_bonus = category_bonus
+
+    def _slot_quality(self, slot: Dict[str, Any]) -> float:
+        """Break-point quality from trend preference, weighted by audience attention"""
+        preference = self.trend_preference.get(slot.get("trend"), 0.5)
+        attention = 0.5 + slot.get("emotion_value", 5.0) / 20.0
+        return preference * attention
+
+    def _ad_load_limit(self, slots: List[Dict[str, Any]], ad_count: int) -> int:
+        """Maximum number of ads allowed for this timeline"""
+        limit = ad_count
+        if self.max_ads is not None:
+            limit = min(limit, self.max_ads)
+        if slots and self.ads_per_minute:
+            duration = max(slot["time"] for slot in slots) - min(slot["time"] for slot in slots)
+            limit = min(limit, max(1, int(duration / 60.0 * self.ads_per_minute) + 1))
+        return limit
+
+    def _select_slots(self, slots: List[Dict[str, Any]], limit: int) -> List[int]:
+        """DP over time-ordered slots: best total quality with at most `limit` slots, min spacing apart"""
+        times = [slot["time"] for slot in slots]
+        weights = [self._slot_quality(slot) for slot in slots]
+        n = len(slots)
+        # previous[i]: number of slots (prefix length) compatible with slot i
+        previous = [bisect.bisect_right(times, times[i] - self.min_spacing) for i in range(n)]
+
+        best = [[0.0] * (limit + 1) for _ in range(n + 1)]
+        for i in range(1, n + 1):
+            for count in range(limit + 1):
+                best[i][count] = best[i - 1][count]
+                if count:
+                    candidate = best[previous[i - 1]][count - 1] + weights[i - 1]
+                    if candidate > best[i][count]:
+                        best[i][count] = candidate
+
+        chosen = []
+        i, count = n, max(range(limit + 1), key=lambda c: (best[n][c], -c))
+        while i > 0 and count > 0:
+            if best[i][count] == best[i - 1][count]:
+                i -= 1
+            else:
+                chosen.append(i - 1)
+                i, count = previous[i - 1], count - 1
+        return sorted(chosen)
+
+    def _affinity(self, ad: Dict[str, Any], slot: Dict[str, Any]) -> float:
+        """Ad-to-slot fit: ranking score times slot quality, plus a category-match bonus"""
+        affinity = ad.get("score", 0.0) * self._slot_quality(slot)
+        product_words = set(str(ad.get("product", "")).lower().replace("-", " ").split())
+        for category in slot.get("ad_categories", []):
+            if product_words & set(str(category).lower().replace("-", " ").split()):
+                affinity += self.category_bonus
+                break
+        return affinity
+
+    def best_ad(self, ranked_ads: List[Dict[str, Any]], slot: Dict[str, Any],
+                exclude: List[str] = ()) -> Optional[Dict[str, Any]]:
+        """Greedy single-slot pick (live mode): highest-affinity ad not in `exclude`, with confidence"""
+        candidates = [ad for ad in ranked_ads if ad.get("ad") not in exclude] or list(ranked_ads)
+        if not candidates:
+            return None
+        scored = [(self._affinity(ad, slot), -rank, ad) for rank, ad in enumerate(candidates)]
+        affinity, _, ad = max(scored, key=lambda item: item[:2])
+        top_affinity = max(self._affinity(ad, slot) for ad in ranked_ads) or 1.0
+        return {**ad, "confidence": round(affinity / top_affinity, 4)}
+
+    def solve(self, ranked_ads: List[Dict[str, Any]], slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return placements sorted by time, each with the ad, slot and a confidence value"""
+        if not ranked_ads or not slots:
+            return []
+
+        slots = sorted(slots, key=lambda x: x["time"])
+        chosen = self._select_slots(slots, self._ad_load_limit(slots, len(ranked_ads)))
+        if not chosen:
+            return []
+
+        chosen_slots = [slots[i] for i in chosen]
+        affinity = [[self._affinity(ad, slot) for ad in ranked_ads] for slot in chosen_slots]
+        # Ties are broken towards higher-ranked ads so the result is fully deterministic
+        cost = [[-value + rank * 1e-9 for rank, value in enumerate(row)] for row in affinity]
+        assignment = hungarian(cost)
+
+        top_affinity = max(max(row) for row in affinity) or 1.0
+        placements = []
+        for slot, row, ad_index in zip(chosen_slots, affinity, assignment):
+            ad = ranked_ads[ad_index]
+            placements.append({
+                "time": slot["time"],
+                "timestamp": slot["timestamp"],
+                "ad": ad.get("ad"),
+                "product": ad.get("product"),
+                "ad_score": ad.get("score"),
+                "emotion_value": slot.get("emotion_value"),
+                "emotion_trend": slot.get("trend"),
+                "ad_categories": slot.get("ad_categories", []),
+                "confidence": round(row[ad_index] / top_affinity, 4)
+            })
+        return placements
+
+
+def solve_placements(final_score: List[Dict[str, Any]], emotion_csv: str, ads_json: Any = None,
+                     **solver_options) -> List[Dict[str, Any]]:
+    """Convenience wrapper: build slots from the timeline and solve against the ranked ads"""
+    slots = candidate_slots_from_timeline(emotion_csv, ads_json)
+    return PlacementSolver(**solver_options).solve(final_score, slots)
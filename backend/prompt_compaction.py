@@ -0,0 +1,171 @@
+"""
+Prompt compaction for LLM placement calls.
+Simplifies the per-second emotion timeline with Ramer-Douglas-Peucker and dedupes
+the Gemini ad-category lists so prompt size stays roughly flat as videos get longer.
+"""
+
+import csv
+import io
+import json
+import re
+from typing import Dict, List, Any, Tuple
+
+from timecodes import format_timestamp, parse_time_range, parse_timestamp
+
+# Hard cap on timeline points sent to the LLM, independent of video length
+DEFAULT_MAX_POINTS = 60
+# Max vertical error (emotion units, 0-10 scale) tolerated by the simplification
+DEFAULT_EPSILON = 0.5
+MIN_EPSILON = 0.01
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for savings reports"""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def parse_emotion_csv(emotion_csv: str) -> Tuple[List[str], List[Tuple[str, float, float]]]:
+    """Split the Gemini emotion CSV into its header and (label, seconds, value) rows"""
+    text = re.sub(r'```[a-zA-Z]*', '', emotion_csv or '').strip()
+    header = []
+    rows = []
+    for row in csv.reader(io.StringIO(text)):
+        if len(row) < 2:
+            continue
+        try:
+            value = float(row[1])
+        except ValueError:
+            if not header and not rows:
+                header = row
+            continue
+        rows.append((row[0].strip(), parse_timestamp(row[0], float(len(rows))), value))
+    return header, rows
+
+
+def _perpendicular_distance(point, start, end) -> float:
+    """Vertical distance of point from the start-end chord (time axis is exact)"""
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    if x2 == x1:
+        return abs(y - y1)
+    return abs(y - (y1 + (y2 - y1) * (x - x1) / (x2 - x1)))
+
+
+def rdp_indices(points: List[Tuple[float, float]], epsilon: float) -> List[int]:
+    """Ramer-Douglas-Peucker simplification; returns the indices of the kept points"""
+    if len(points) < 3:
+        return list(range(len(points)))
+
+    keep = {0, len(points) - 1}
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        index = first
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if max_distance > epsilon:
+            keep.add(index)
+            stack.append((first, index))
+            stack.append((index, last))
+    return sorted(keep)
+
+
+def simplify_timeline(points: List[Tuple[float, float]],
+                      epsilon: float = DEFAULT_EPSILON,
+                      max_points: int = DEFAULT_MAX_POINTS) -> Tuple[List[int], float]:
+    """Simplify within epsilon, widening the error bound until at most max_points remain"""
+    # The endpoints are always kept, and a zero bound would never widen
+    max_points = max(max_points, 2)
+    epsilon = max(epsilon, MIN_EPSILON)
+    indices = rdp_indices(points, epsilon)
+    while len(indices) > max_points:
+        epsilon *= 1.5
+        indices = rdp_indices(points, epsilon)
+    return indices, epsilon
+
+
+def compact_emotion_csv(emotion_csv: str,
+                        epsilon: float = DEFAULT_EPSILON,
+                        max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Return the emotion CSV reduced to its shape-defining points"""
+    header, rows = parse_emotion_csv(emotion_csv)
+    if len(rows) < 3:
+        return emotion_csv
+
+    indices, _ = simplify_timeline([(seconds, value) for _, seconds, value in rows], epsilon, max_points)
+
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(header or ["timestamp", "emotion_value"])
+    for i in indices:
+        label, _, value = rows[i]
+        writer.writerow([label, f"{value:g}"])
+    return output.getvalue()
+
+
+def compact_ads_json(ads_json: Any) -> str:
+    """
+    Dedupe ad-category lists and merge consecutive segments with the same categories; a
+    merged entry's time spans from the first merged segment to the end of the last one
+    """
+    try:
+        data = json.loads(ads_json) if isinstance(ads_json, str) else ads_json
+    except (json.JSONDecodeError, TypeError):
+        return ads_json if isinstance(ads_json, str) else str(ads_json)
+    if not isinstance(data, dict) or not isinstance(data.get("advertisements"), list):
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+    groups = []
+    previous = None
+    for entry in data["advertisements"]:
+        seen = set()
+        categories = []
+        for category in entry.get("advertisement", []):
+            key = str(category).strip().lower()
+            if key and key not in seen:
+                seen.add(key)
+                categories.append(str(category).strip())
+        if previous is not None and seen == previous:
+            groups[-1]["times"].append(entry.get("time", ""))
+            continue
+        previous = seen
+        groups.append({"times": [entry.get("time", "")], "advertisement": categories})
+
+    compacted = []
+    for index, group in enumerate(groups):
+        time_text = group["times"][0]
+        if len(group["times"]) > 1:
+            start, _ = parse_time_range(group["times"][0])
+            last_start, last_end = parse_time_range(group["times"][-1])
+            # A start-only segment runs until the next one begins
+            following = parse_time_range(groups[index + 1]["times"][0])[0] if index + 1 < len(groups) else None
+            end = last_end if last_end is not None else following if following is not None else last_start
+            if start is not None and end is not None:
+                time_text = f"{format_timestamp(start)} - {format_timestamp(end)}"
+        compacted.append({"time": time_text, "advertisement": group["advertisement"]})
+
+    return json.dumps({"advertisements": compacted}, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_prompt_inputs(emotion_csv: str, ads_json: Any,
+                          epsilon: float = DEFAULT_EPSILON,
+                          max_points: int = DEFAULT_MAX_POINTS) -> Tuple[str, str, Dict[str, Any]]:
+    """Compact both placement prompt inputs and report the token savings"""
+    compact_csv = compact_emotion_csv(emotion_csv, epsilon, max_points)
+    compact_ads = compact_ads_json(ads_json)
+
+    original_tokens = estimate_tokens(str(emotion_csv)) + estimate_tokens(str(ads_json))
+    compact_tokens = estimate_tokens(compact_csv) + estimate_tokens(compact_ads)
+    stats = {
+        "original_tokens": original_tokens,
+        "compact_tokens": compact_tokens,
+        "tokens_saved": original_tokens - compact_tokens,
+        "savings_ratio": round(1 - compact_tokens / original_tokens, 4) if original_tokens else 0.0,
+        "timeline_points": len(parse_emotion_csv(compact_csv)[1]),
+    }
+    return compact_csv, compact_ads, stats
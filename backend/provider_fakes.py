@@ -0,0 +1,291 @@
+"""
+Offline stand-ins for the model providers, used by benchmark.py and load_test.py.
+Responses are replayed from the recorded outputs kept in the repo (persona summaries in
+comprehensive_video_analysis_results.json, Pegasus chapters and Gemini/Bedrock outputs in
+dummy.json), with a configurable log-normal latency and error/429 rate per endpoint.
+
+- TwelveLabs REST (/summarize, /tasks, video info) is served by a local HTTP server
+- the TwelveLabs SDK (analyze), Gemini and Bedrock clients are in-process fakes
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, List, Any, Optional, Tuple
+
+from timecodes import format_timestamp, parse_time_range
+
+RECORDED_ANALYSES_FILE = "comprehensive_video_analysis_results.json"
+RECORDED_PLACEMENT_FILE = "dummy.json"
+
+# Endpoint -> (median seconds, log-normal sigma), roughly what the live APIs show
+DEFAULT_LATENCIES = {
+    "twelvelabs.summarize": (6.0, 0.45),
+    "twelvelabs.analyze": (9.0, 0.5),
+    "twelvelabs.tasks": (2.0, 0.3),
+    "twelvelabs.video_info": (0.15, 0.3),
+    "gemini.generate_content": (3.5, 0.5),
+    "bedrock.converse": (2.5, 0.45),
+}
+
+# Keyword -> emotion level used to turn recorded chapters into an emotion timeline
+_CHAPTER_LEVELS = (("celebrat", 9.0), ("achievement", 9.0), ("excitement", 8.0), ("action", 8.0),
+                   ("tension", 5.5), ("reflection", 5.0), ("analysis", 5.0))
+
+
+class FakeProviderError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+class LatencyModel:
+    """Log-normal latency plus independent error (503) and throttling (429) probabilities"""
+
+    def __init__(self, median: float, sigma: float = 0.5, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, scale: float = 1.0, seed: int = None):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.scale = scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> Tuple[float, Optional[int]]:
+        """(seconds to wait, failure status or None)"""
+        with self._lock:
+            seconds = self.median * self._random.lognormvariate(0.0, self.sigma) * self.scale
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return seconds * 0.1, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return seconds, 503
+        return seconds, None
+
+    def wait(self) -> None:
+        """Sleep for one sampled latency; raise FakeProviderError for sampled failures"""
+        seconds, status = self.sample()
+        threading.Event().wait(seconds)
+        if status == 429:
+            raise FakeProviderError(429, "Too Many Requests")
+        if status:
+            raise FakeProviderError(status, "Service Unavailable")
+
+
+def latency_models(scale: float = 1.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                   overrides: Dict[str, Tuple[float, float]] = None, seed: int = None) -> Dict[str, LatencyModel]:
+    profile = {**DEFAULT_LATENCIES, **(overrides or {})}
+    return {endpoint: LatencyModel(median, sigma, error_rate, throttle_rate, scale,
+                                   None if seed is None else seed + index)
+            for index, (endpoint, (median, sigma)) in enumerate(sorted(profile.items()))}
+
+
+class RecordedPayloads:
+    """Recorded provider outputs, replayed per video and persona"""
+
+    def __init__(self, root: str = "."):
+        with open(os.path.join(root, RECORDED_ANALYSES_FILE), "r", encoding="utf-8") as f:
+            analyses = json.load(f)["video_analyses"]
+        with open(os.path.join(root, RECORDED_PLACEMENT_FILE), "r", encoding="utf-8") as f:
+            placement = json.load(f)["result"]
+
+        self.main_analyses = analyses["main_sports_video"]["persona_analyses"]
+        self.ad_analyses = [video["persona_analyses"] for key, video in analyses.items() if key != "main_sports_video"]
+        self.chapters = placement["emotion"]["timestamps"]
+        reports = placement["ad_placement_report"]
+        # The recorded report mixes Gemini's ad-category answer with Bedrock placement answers
+        self.ads_categories = next(text for text in reports if '"advertisements"' in text)
+        self.placement_texts = [text for text in reports if text != self.ads_categories]
+        self.duration = max(parse_time_range(chapter["time"])[1] for chapter in self.chapters) + 1
+
+    def summarize(self, video_id: str, prompt: str) -> Dict[str, Any]:
+        """/summarize body for a video/persona: main-video ids contain "main", ads cycle the recorded ads"""
+        if "main" in video_id:
+            analyses = self.main_analyses
+        else:
+            digits = re.findall(r"\d+", video_id)
+            analyses = self.ad_analyses[int(digits[-1]) % len(self.ad_analyses) if digits else 0]
+        match = re.search(r'perspective of "([^"]+)"', prompt)
+        analysis = analyses.get(match.group(1) if match else "") or next(iter(analyses.values()))
+        summary = {"content_overview": analysis["content_overview"], "scores": analysis["scores"]}
+        return {"id": uuid.uuid4().hex, "summary_type": "summary", "summary": json.dumps(summary),
+                "usage": analysis.get("usage", {"output_tokens": len(summary["content_overview"]) // 4})}
+
+    def emotion_csv(self, duration: float = None) -> str:
+        """One row per second, levels taken from the recorded chapter descriptions"""
+        duration = int(duration or self.duration)
+        levels = []
+        for chapter in self.chapters:
+            start, end = parse_time_range(chapter["time"])
+            description = chapter["description"].lower()
+            level = next((value for keyword, value in _CHAPTER_LEVELS if keyword in description), 6.0)
+            levels.append((start, end, level))
+        rows = ["Timestamp,Emotion"]
+        for second in range(duration):
+            start, end, level = next(((s, e, v) for s, e, v in levels if s <= second % self.duration <= e), levels[-1])
+            ramp = 0.5 * ((second % self.duration) - start) / max(1.0, end - start)
+            rows.append(f"{format_timestamp(second)},{min(10.0, level + ramp):.1f}")
+        return "\n".join(rows)
+
+
+class FakeTwelveLabsClient:
+    """Stands in for twelvelabs.TwelveLabs: analyze() returns the recorded chapters"""
+
+    def __init__(self, payloads: RecordedPayloads, latency: LatencyModel):
+        self.payloads = payloads
+        self.latency = latency
+
+    def analyze(self, video_id: str, prompt: str, **kwargs):
+        self.latency.wait()
+        return SimpleNamespace(data=json.dumps({"timestamps": self.payloads.chapters}))
+
+
+class FakeGeminiClient:
+    """Stands in for google.genai.Client: JSON schema requests get ad categories, others the emotion CSV"""
+
+    def __init__(self, payloads: RecordedPayloads, latency: LatencyModel):
+        self.payloads = payloads
+        self.latency = latency
+        self.models = self
+
+    def generate_content(self, model: str, contents, config: Dict[str, Any] = None):
+        self.latency.wait()
+        text = self.payloads.ads_categories if (config or {}).get("response_schema") else self.payloads.emotion_csv()
+        prompt_tokens = len(str(contents)) // 4
+        output_tokens = len(text) // 4
+        return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens, candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens))
+
+
+class FakeBedrockClient:
+    """Stands in for the bedrock-runtime client; content[1] carries the answer like gpt-oss does"""
+
+    def __init__(self, payloads: RecordedPayloads, latency: LatencyModel):
+        self.payloads = payloads
+        self.latency = latency
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def converse(self, modelId: str, messages: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self.latency.wait()
+        with self._lock:
+            text = self.payloads.placement_texts[self._next % len(self.payloads.placement_texts)]
+            self._next += 1
+        prompt = messages[0]["content"][0]["text"]
+        return {
+            "output": {"message": {"role": "assistant", "content": [
+                {"reasoningContent": {"reasoningText": {"text": "Recorded reasoning."}}}, {"text": text}]}},
+            "usage": {"inputTokens": len(prompt) // 4, "outputTokens": len(text) // 4,
+                      "totalTokens": (len(prompt) + len(text)) // 4},
+            "stopReason": "end_turn"
+        }
+
+
+class FakeTwelveLabsServer:
+    """Local HTTP server for the TwelveLabs REST endpoints the backend calls with requests"""
+
+    def __init__(self, payloads: RecordedPayloads, latencies: Dict[str, LatencyModel], port: int = 0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _simulate(self, endpoint: str) -> bool:
+                try:
+                    latencies[endpoint].wait()
+                except FakeProviderError as e:
+                    self._reply(e.status, {"code": "simulated_failure", "message": str(e)})
+                    return False
+                return True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.endswith("/summarize"):
+                    if self._simulate("twelvelabs.summarize"):
+                        request = json.loads(body or b"{}")
+                        self._reply(200, payloads.summarize(request.get("video_id", ""), request.get("prompt", "")))
+                elif self.path.endswith("/tasks"):
+                    if self._simulate("twelvelabs.tasks"):
+                        video_id = f"main-upload-{next(server._uploads)}"
+                        self._reply(200, {"_id": uuid.uuid4().hex, "video_id": video_id})
+                else:
+                    self._reply(404, {"message": "not found"})
+
+            def do_GET(self):
+                if re.search(r"/indexes/[^/]+/videos/[^/]+$", self.path):
+                    if self._simulate("twelvelabs.video_info"):
+                        self._reply(200, {"system_metadata": {"duration": payloads.duration}})
+                elif re.search(r"/tasks/[^/]+$", self.path):
+                    # Uploads are indexed by the time anyone polls for them
+                    if self._simulate("twelvelabs.video_info"):
+                        self._reply(200, {"_id": self.path.rsplit("/", 1)[1], "status": "ready"})
+                else:
+                    self._reply(404, {"message": "not found"})
+
+        self._uploads = iter(range(1, 1 << 62))
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-twelvelabs", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1.3"
+
+    def start(self) -> str:
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeProviders:
+    """
+    Start the fake TwelveLabs server and wire every fake into the backend. Start it before
+    importing backend modules so TWELVELABS_BASE_URL is picked up; attach() also patches the
+    module-level URL for modules imported earlier.
+    """
+
+    def __init__(self, scale: float = 1.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 overrides: Dict[str, Tuple[float, float]] = None, seed: int = None, root: str = "."):
+        self.payloads = RecordedPayloads(root)
+        self.latencies = latency_models(scale, error_rate, throttle_rate, overrides, seed)
+        self.server = FakeTwelveLabsServer(self.payloads, self.latencies)
+
+    def start(self) -> "FakeProviders":
+        os.environ["TWELVELABS_BASE_URL"] = self.server.start()
+        return self
+
+    def attach(self, context_engine=None) -> None:
+        import main
+        import open_ai_agent
+        import persona_analyzer
+
+        persona_analyzer.TWELVELABS_BASE_URL = main.TWELVELABS_BASE_URL = self.server.base_url
+        open_ai_agent.set_client(FakeBedrockClient(self.payloads, self.latencies["bedrock.converse"]))
+        if context_engine is not None:
+            # Lazy clients live in the instance dict once built, so plain assignment replaces them
+            context_engine.client = FakeTwelveLabsClient(self.payloads, self.latencies["twelvelabs.analyze"])
+            context_engine.gemini_client = FakeGeminiClient(self.payloads, self.latencies["gemini.generate_content"])
+            context_engine.persona_analyzer = persona_analyzer.PersonaAnalyzer()
+
+    def stop(self) -> None:
+        self.server.stop()
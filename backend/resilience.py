@@ -0,0 +1,292 @@
+"""
+Resilience layer for provider calls (TwelveLabs analyze/summarize, Gemini generate_content).
+Each call runs on its provider's own pool (a stalled provider cannot starve the others); once it outlives the endpoint's observed p95 a hedged
+duplicate is sent and the first successful response wins. A per-provider circuit breaker
+fails fast after repeated failures and serves the last good result for the same request
+(or a caller-supplied degraded result) until a probe call succeeds again.
+State is exported through metrics: circuit_state, hedged_requests_total, circuit_rejections_total.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, Hashable, Optional
+
+import metrics
+from call_scheduler import SchedulerBusy, scheduler
+from structured_logging import propagate
+
+logger = logging.getLogger(__name__)
+
+CALL_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_CALL_TIMEOUT", "300"))
+# (connect, read) for HTTP calls made under the resilience layer, so an abandoned attempt
+# also releases its pool thread instead of blocking on the socket forever
+REQUEST_TIMEOUT = (float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "10")), CALL_TIMEOUT_SECONDS)
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Hedging starts once an endpoint has this many samples, and at most this share of calls is hedged
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_OPEN = "open"
+_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+circuit_state = metrics.REGISTRY.gauge(
+    "circuit_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open)", ("provider",))
+hedged_requests = metrics.REGISTRY.counter(
+    "hedged_requests_total", "Hedged duplicate requests sent, and how many of them won", ("provider", "endpoint", "outcome"))
+circuit_rejections = metrics.REGISTRY.counter(
+    "circuit_rejections_total", "Calls short-circuited or failed, by what was served instead",
+    ("provider", "endpoint", "served"))
+
+
+class ProviderUnavailable(Exception):
+    """The provider's circuit is open (or the call failed) and nothing cached could be served"""
+
+
+class LatencyTracker:
+    """Rolling window of successful call durations for one endpoint"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open after a cool-down -> one probe call"""
+
+    def __init__(self, provider: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_seconds: float = RESET_SECONDS):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        circuit_state.set(0, provider=provider)
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Circuit for %s: %s -> %s", self.provider, self.state, state)
+        self.state = state
+        circuit_state.set(_STATE_VALUES[state], provider=self.provider)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._transition(CIRCUIT_HALF_OPEN)
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._transition(CIRCUIT_CLOSED)
+
+    def cancel_probe(self) -> None:
+        """The call never reached the provider; let the next call probe instead"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(CIRCUIT_OPEN)
+
+
+class ResilientCaller:
+    """Hedging, timeouts, circuit breaking and last-good-result caching for provider calls"""
+
+    def __init__(self, max_workers: int = None, cache_size: int = 512):
+        # Threads per provider pool
+        self.max_workers = max_workers or int(os.getenv("RESILIENCE_WORKERS", "16"))
+        self.executors: Dict[str, ThreadPoolExecutor] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.calls: Dict[str, int] = {}
+        self.hedges: Dict[str, int] = {}
+        self.cache: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def executor(self, provider: str) -> ThreadPoolExecutor:
+        with self._lock:
+            if provider not in self.executors:
+                self.executors[provider] = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f"provider-call-{provider}")
+            return self.executors[provider]
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self.breakers:
+                self.breakers[provider] = CircuitBreaker(provider)
+            return self.breakers[provider]
+
+    def _tracker(self, key: str) -> LatencyTracker:
+        with self._lock:
+            return self.latency.setdefault(key, LatencyTracker())
+
+    def _may_hedge(self, key: str) -> bool:
+        with self._lock:
+            if self.hedges.get(key, 0) >= self.calls[key] * HEDGE_BUDGET_RATIO:
+                return False
+            self.hedges[key] = self.hedges.get(key, 0) + 1
+            return True
+
+    def _cached(self, cache_key: Optional[Hashable]):
+        with self._lock:
+            if cache_key is None or cache_key not in self.cache:
+                return False, None
+            self.cache.move_to_end(cache_key)
+            return True, self.cache[cache_key]
+
+    def _remember(self, cache_key: Optional[Hashable], value: Any) -> None:
+        if cache_key is None:
+            return
+        with self._lock:
+            self.cache[cache_key] = value
+            self.cache.move_to_end(cache_key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _degrade(self, provider: str, endpoint: str, cache_key, fallback, error: Exception):
+        hit, value = self._cached(cache_key)
+        if hit:
+            circuit_rejections.inc(provider=provider, endpoint=endpoint, served="cache")
+            logger.warning("%s.%s unavailable (%s); serving the last good result", provider, endpoint, error)
+            return value
+        if fallback is not None:
+            circuit_rejections.inc(provider=provider, endpoint=endpoint, served="fallback")
+            logger.warning("%s.%s unavailable (%s); serving a degraded result", provider, endpoint, error)
+            return fallback()
+        circuit_rejections.inc(provider=provider, endpoint=endpoint, served="error")
+        raise ProviderUnavailable(f"{provider}.{endpoint} unavailable: {error}") from error
+
+    def _attempts(self, key: str, provider: str, endpoint: str, fn: Callable[[], Any],
+                  hedge: bool, timeout: float) -> Any:
+        """Primary call plus at most one hedge after p95; returns the first successful result"""
+        executor = self.executor(provider)
+        started = time.monotonic()
+        pending = {executor.submit(propagate(fn))}
+        hedge_after = self._tracker(key).percentile(0.95) if hedge else None
+        hedge_future = None
+        errors = []
+
+        while pending:
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                raise TimeoutError(f"no response within {timeout:.0f}s")
+            wait_for = remaining
+            if hedge_future is None and hedge_after is not None:
+                wait_for = max(0.0, min(remaining, hedge_after - (time.monotonic() - started)))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    self._tracker(key).record(time.monotonic() - started)
+                    if future is hedge_future:
+                        hedged_requests.inc(provider=provider, endpoint=endpoint, outcome="won")
+                    return future.result()
+                errors.append(future.exception())
+
+            if hedge_future is None and hedge_after is not None and pending \
+                    and time.monotonic() - started >= hedge_after:
+                if self._may_hedge(key):
+                    hedge_future = executor.submit(propagate(fn))
+                    pending.add(hedge_future)
+                    hedged_requests.inc(provider=provider, endpoint=endpoint, outcome="sent")
+                    logger.info("Hedging %s.%s after %.1fs (p95)", provider, endpoint, hedge_after)
+                else:
+                    # Budget used up: no hedge for this call, so just wait for the primary
+                    hedge_after = None
+            elif hedge_future is None and not pending:
+                break
+        raise errors[-1]
+
+    def call(self, provider: str, endpoint: str, fn: Callable[[], Any], cache_key: Hashable = None,
+             fallback: Callable[[], Any] = None, hedge: bool = True, timeout: float = None,
+             prompt_tokens: int = None) -> Any:
+        """
+        Run fn (a zero-argument, idempotent provider call) with hedging and circuit breaking.
+        cache_key identifies the request so its last good result can be served while the
+        provider is down; fallback builds a degraded result when nothing is cached.
+        With prompt_tokens the call first waits for a scheduler slot on the caller's thread,
+        so queued calls hold no pool thread and queue wait counts toward neither the hedge
+        p95 nor the timeout; fn reports its usage with call_scheduler.record_usage.
+        """
+        key = f"{provider}.{endpoint}"
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+        breaker = self.breaker(provider)
+        if not breaker.allow():
+            return self._degrade(provider, endpoint, cache_key, fallback, ProviderUnavailable("circuit open"))
+
+        slot = scheduler.slot(provider, prompt_tokens) if prompt_tokens is not None else nullcontext()
+        try:
+            with slot:
+                result = self._attempts(key, provider, endpoint, fn, hedge and breaker.state == CIRCUIT_CLOSED,
+                                        timeout or CALL_TIMEOUT_SECONDS)
+        except SchedulerBusy:
+            # Local backpressure says nothing about the provider's health
+            breaker.cancel_probe()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            return self._degrade(provider, endpoint, cache_key, fallback, e)
+        breaker.record_success()
+        self._remember(cache_key, result)
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "circuits": {provider: {"state": breaker.state, "consecutive_failures": breaker.failures}
+                         for provider, breaker in self.breakers.items()},
+            "endpoints": {key: {"p95_seconds": tracker.percentile(0.95), "calls": self.calls.get(key, 0),
+                                "hedges": self.hedges.get(key, 0)}
+                          for key, tracker in self.latency.items()}
+        }
+
+
+_caller = None
+_caller_lock = threading.Lock()
+
+
+def get_caller() -> ResilientCaller:
+    """Process-wide caller, so breakers and latency history are shared by every request"""
+    global _caller
+    if _caller is None:
+        with _caller_lock:
+            if _caller is None:
+                _caller = ResilientCaller()
+    return _caller
+
+
+def resilient_call(provider: str, endpoint: str, fn: Callable[[], Any], **options) -> Any:
+    return get_caller().call(provider, endpoint, fn, **options)
@@ -9,8 +9,14 @@ import json
 import os
 from dotenv import load_dotenv
 
-def persona_main(main_video_id,ads_id=[]):
-    """Run analysis on all videos"""
+def persona_main(main_video_id,ads_id=[], artifacts=None, ad_analyses=None):
+    """Run analysis on all videos
+
+    With an ArtifactContext the results are handed over in memory (and only written
+    to the context's namespace if it persists) instead of the shared JSON file.
+    ad_analyses maps ad video ids to analyze_video_for_all_personas results computed
+    earlier (see run_playlist_analysis.py); those ads are not analyzed again.
+    """
     
     # Load environment variables
     load_dotenv()
@@ -21,11 +27,11 @@ def persona_main(main_video_id,ads_id=[]):
     # Initialize analyzer
     analyzer = PersonaAnalyzer()
     
-    # Get video IDs from environment
+    # Get video IDs from environment; the first three slots are the known demo ads
     main_sports_video_id = main_video_id
-    ad_volkswagen_video_id = ads_id[1]
-    ad_pg_video_id = ads_id[0]
-    ad_coco_cola_3_video_id = ads_id[2]
+    ad_volkswagen_video_id = ads_id[1] if len(ads_id) > 1 else None
+    ad_pg_video_id = ads_id[0] if ads_id else None
+    ad_coco_cola_3_video_id = ads_id[2] if len(ads_id) > 2 else None
     
     # Define video information
     videos = {
@@ -50,6 +56,13 @@ def persona_main(main_video_id,ads_id=[]):
             "description": "Coca-Cola advertisement video"
         }
     }
+    # Any further ads in the pool get generic entries
+    for number, ad_id in enumerate(ads_id[3:], start=4):
+        videos[f"ad_{number}"] = {
+            "id": ad_id,
+            "name": f"Ad {number}",
+            "description": f"Advertisement video {number}"
+        }
     
     print(f"Analyzing {len(videos)} videos for {len(analyzer.personas)} personas")
     print()
@@ -82,8 +95,11 @@ def persona_main(main_video_id,ads_id=[]):
         print(f"Analyzing: {video_name} ({video_id})")
         print("-" * 40)
         
-        # Run analysis for this video
-        video_results = analyzer.analyze_video_for_all_personas(video_id)
+        # Run analysis for this video, unless the ad pool was analyzed up front
+        if ad_analyses and video_id in ad_analyses:
+            video_results = dict(ad_analyses[video_id])
+        else:
+            video_results = analyzer.analyze_video_for_all_personas(video_id)
         
         # Add video metadata
         video_results["video_metadata"] = {
@@ -111,9 +127,7 @@ def persona_main(main_video_id,ads_id=[]):
     comprehensive_results["analysis_metadata"]["analysis_timestamp"] = datetime.now().isoformat()
     
     # Save comprehensive results
-    output_file = "json/comprehensive_video_analysis_results.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(comprehensive_results, f, indent=2, ensure_ascii=False)
+    output_file = _save_results(comprehensive_results, artifacts)
     
     print("=" * 50)
     print("COMPREHENSIVE ANALYSIS COMPLETE")
@@ -215,11 +229,25 @@ def persona_main(main_video_id,ads_id=[]):
     }
     
     # Save updated comprehensive results
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(comprehensive_results, f, indent=2, ensure_ascii=False)
+    output_file = _save_results(comprehensive_results, artifacts)
     
     print(f"\nUpdated results with persona affinity metrics saved to: {output_file}")
     print("\nHACKATHON READY! All analyses complete with persona affinity metrics.")
 
+    return comprehensive_results
+
+
+def _save_results(comprehensive_results, artifacts=None):
+    """Write results to the shared JSON file, or into the request's artifact context"""
+    if artifacts is not None:
+        path = artifacts.put("comprehensive_results", comprehensive_results,
+                             "comprehensive_video_analysis_results.json")
+        return path or "in-memory artifact context"
+
+    output_file = "json/comprehensive_video_analysis_results.json"
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(comprehensive_results, f, indent=2, ensure_ascii=False)
+    return output_file
+
 # if __name__ == "__main__":
 #     main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Playlist / Season Placement Planning
+Plans ad placements for many main videos against one shared ad pool. The ad pool's persona
+analysis does not depend on the main video, so it runs exactly once up front; episodes then
+go through the /ad_placement stages concurrently, reusing it. Writes a placement plan per
+episode plus an aggregate report for the season.
+
+Usage:
+    python run_playlist_analysis.py VIDEO_ID [VIDEO_ID ...]
+    python run_playlist_analysis.py --playlist season_1.json --ads AD_ID,AD_ID --episode-workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any
+
+from dotenv import load_dotenv
+
+import placement_pipeline
+from artifacts import ArtifactContext
+from main import Context_engine
+from persona_analyzer import PersonaAnalyzer
+from structured_logging import propagate, span
+
+
+def load_playlist(path: str) -> List[str]:
+    """Main video ids from a JSON list, a JSON object with "episodes", or one id per line"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+            entries = data.get("episodes", []) if isinstance(data, dict) else data
+            return [entry["video_id"] if isinstance(entry, dict) else entry for entry in entries]
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def analyze_ad_pool(ads_id: List[str], max_workers: int = 4) -> Dict[str, Dict[str, Any]]:
+    """Persona analysis of every ad, once, keyed by video id"""
+    analyzer = PersonaAnalyzer()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ads_id)))) as executor:
+        analyses = executor.map(propagate(analyzer.analyze_video_for_all_personas), ads_id)
+        return dict(zip(ads_id, analyses))
+
+
+def plan_episode(context_engine, video_id: str, ads_id: List[str], ad_analyses: Dict[str, Dict[str, Any]],
+                 **options) -> Dict[str, Any]:
+    """Run the /ad_placement stages for one episode with the shared ad-pool analyses"""
+    started = time.time()
+    params = {"video_id": video_id, "ads_id": ads_id, "ad_analyses": ad_analyses, **options}
+    artifacts = ArtifactContext(namespace=f"playlist_{video_id}")
+    results = {}
+    try:
+        for name, stage in placement_pipeline.STAGES:
+            with span(f"stage.{name}", job_kind="playlist"):
+                results.update(stage(context_engine, params, results, artifacts))
+    except Exception as e:
+        return {"video_id": video_id, "status": "failed", "error": str(e),
+                "seconds": round(time.time() - started, 2)}
+    return {
+        "video_id": video_id,
+        "status": "success",
+        "ranking": results["final_score"],
+        "placements": results["placements"],
+        "ad_placement_report": results["ad_placement_report"],
+        "seconds": round(time.time() - started, 2)
+    }
+
+
+def aggregate_report(plans: List[Dict[str, Any]], ads_id: List[str], ad_analyses: Dict[str, Dict[str, Any]],
+                     persona_count: int, elapsed: float) -> Dict[str, Any]:
+    """Season-level view: placements per product, top-ranked ads and the provider work saved"""
+    succeeded = [plan for plan in plans if plan["status"] == "success"]
+    placements = Counter()
+    episodes_placed = Counter()
+    top_ranked = Counter()
+    scores: Dict[str, List[float]] = {}
+    for plan in succeeded:
+        products = [placement["product"] for placement in plan["placements"]]
+        placements.update(products)
+        episodes_placed.update(set(products))
+        if plan["ranking"]:
+            top_ranked[plan["ranking"][0]["product"]] += 1
+        for entry in plan["ranking"]:
+            scores.setdefault(entry["product"], []).append(entry["score"])
+
+    return {
+        "episodes": len(plans),
+        "succeeded": len(succeeded),
+        "failed": [{"video_id": plan["video_id"], "error": plan["error"]} for plan in plans
+                   if plan["status"] != "success"],
+        "placements_total": sum(placements.values()),
+        "placements_per_episode": round(sum(placements.values()) / len(succeeded), 2) if succeeded else 0.0,
+        "products": {
+            product: {
+                "placements": placements[product],
+                "episodes_placed": episodes_placed[product],
+                "top_ranked_in": top_ranked[product],
+                "avg_score": round(sum(values) / len(values), 4)
+            }
+            for product, values in sorted(scores.items(), key=lambda item: -placements[item[0]])
+        },
+        "ad_pool": {ad_id: ad_analyses[ad_id]["summary"] for ad_id in ads_id},
+        # Ad persona analyses are amortized: len(ads) instead of len(ads) x episodes
+        "persona_analyses": {
+            "ads": len(ads_id) * persona_count,
+            "episodes": len(plans) * persona_count,
+            "ads_without_batching": len(ads_id) * len(plans) * persona_count
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "avg_episode_seconds": round(sum(plan["seconds"] for plan in plans) / len(plans), 2) if plans else 0.0
+    }
+
+
+def run_playlist(video_ids: List[str], ads_id: List[str] = None, episode_workers: int = 4,
+                 ad_workers: int = 4, verbose: bool = False, **options) -> Dict[str, Any]:
+    """Analyze the ad pool once, then plan every episode concurrently"""
+    ads_id = ads_id or placement_pipeline.default_ads_id()
+    video_ids = list(dict.fromkeys(video_ids))
+    started = time.time()
+    context_engine = Context_engine()
+
+    print(f"Analyzing ad pool of {len(ads_id)} ads once")
+    # persona_main and the similarity report print progress; interleaved across episodes it is noise
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        ad_analyses = analyze_ad_pool(ads_id, ad_workers)
+    print(f"Planning {len(video_ids)} episodes with {episode_workers} workers")
+    with output:
+        with ThreadPoolExecutor(max_workers=max(1, min(episode_workers, len(video_ids)))) as executor:
+            plans = list(executor.map(
+                propagate(lambda video_id: plan_episode(context_engine, video_id, ads_id, ad_analyses, **options)),
+                video_ids))
+
+    return {
+        "analysis_metadata": {
+            "analysis_timestamp": datetime.now().isoformat(),
+            "index_id": os.getenv("twelve_index_id"),
+            "ads_id": ads_id
+        },
+        "episodes": {plan["video_id"]: plan for plan in plans},
+        "aggregate": aggregate_report(plans, ads_id, ad_analyses, len(context_engine.persona_analyzer.personas),
+                                      time.time() - started)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan ad placements for a playlist against one ad pool")
+    parser.add_argument("video_ids", nargs="*", help="Main video ids")
+    parser.add_argument("--playlist", help="JSON list / {\"episodes\": [...]} or text file of main video ids")
+    parser.add_argument("--ads", help="Comma-separated ad video ids (default: the ingested catalog, else the demo ad pool)")
+    parser.add_argument("--episode-workers", type=int, default=4, help="Episodes planned at once")
+    parser.add_argument("--ad-workers", type=int, default=4, help="Ads analyzed at once")
+    parser.add_argument("--output", default="json/playlist_placement_plan.json")
+    parser.add_argument("--verbose", action="store_true", help="Show per-video analysis output")
+    args = parser.parse_args()
+
+    load_dotenv()
+    video_ids = list(args.video_ids) + (load_playlist(args.playlist) if args.playlist else [])
+    if not video_ids:
+        parser.error("no main video ids given")
+
+    print("Playlist Placement Planning")
+    print("=" * 50)
+    result = run_playlist(video_ids, args.ads.split(",") if args.ads else None,
+                          args.episode_workers, args.ad_workers, args.verbose)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    aggregate = result["aggregate"]
+    print("\nSEASON SUMMARY:")
+    print("=" * 50)
+    print(f"Episodes planned: {aggregate['succeeded']}/{aggregate['episodes']}")
+    for failure in aggregate["failed"]:
+        print(f"  FAILED {failure['video_id']}: {failure['error']}")
+    print(f"Placements: {aggregate['placements_total']} ({aggregate['placements_per_episode']} per episode)")
+    for product, stats in aggregate["products"].items():
+        print(f"  {product:<30} {stats['placements']:>3} placements in {stats['episodes_placed']} episodes, "
+              f"top-ranked in {stats['top_ranked_in']}")
+    work = aggregate["persona_analyses"]
+    print(f"Ad persona analyses: {work['ads']} (instead of {work['ads_without_batching']})")
+    print(f"Elapsed: {aggregate['elapsed_seconds']}s")
+    print(f"\nResults saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Local shot-boundary and scene-cut detection.
+A decode thread pipes reduced-resolution frames out of ffmpeg while a worker pool scores
+frame batches with vectorized NumPy colour-histogram and pixel differences. Hard cuts
+and fades become candidate ad breaks that placements are snapped to, so ads never land
+mid-shot. Runs entirely offline.
+
+Usage:
+    python shot_detection.py match.mp4
+    python shot_detection.py match.mp4 --fps 8 --workers 4
+"""
+
+import argparse
+import os
+import queue
+import subprocess
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+from stitching import FFMPEG, StitchingError, probe_media
+from timecodes import format_timestamp
+
+FRAME_WIDTH = 64
+FRAME_HEIGHT = 36
+ANALYSIS_FPS = float(os.getenv("SHOT_ANALYSIS_FPS", "10"))
+BATCH_FRAMES = 256
+HISTOGRAM_BINS = 16
+
+BOUNDARY_CUT = "cut"
+BOUNDARY_FADE = "fade"
+
+
+def _frame_batches(source: str, fps: float, batch_frames: int) -> Iterator[np.ndarray]:
+    """Decode thread side: yield uint8 arrays [n, h, w, 3] straight from an ffmpeg rawvideo pipe"""
+    frame_bytes = FRAME_WIDTH * FRAME_HEIGHT * 3
+    process = subprocess.Popen(
+        [FFMPEG, "-nostdin", "-v", "error", "-i", source, "-an", "-sn",
+         "-vf", f"fps={fps:g},scale={FRAME_WIDTH}:{FRAME_HEIGHT}:flags=area",
+         "-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes * batch_frames)
+            count = len(data) // frame_bytes
+            if count:
+                yield np.frombuffer(data[:count * frame_bytes], dtype=np.uint8).reshape(
+                    count, FRAME_HEIGHT, FRAME_WIDTH, 3)
+            if len(data) < frame_bytes * batch_frames:
+                break
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode("utf-8", "replace")
+        if process.wait() != 0:
+            raise StitchingError(f"ffmpeg decode failed: {stderr.strip()[-500:]}")
+
+
+def score_batch(frames: np.ndarray, previous: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-frame scores against the preceding frame: histogram distance (0-1), mean absolute
+    pixel difference (0-1) and mean luma (0-255). `previous` is the last frame of the
+    preceding batch so batches can be scored independently.
+    """
+    frames = frames.astype(np.int16)
+    if previous is not None:
+        frames = np.concatenate([previous.astype(np.int16)[None], frames])
+
+    # Joint per-channel histograms in one bincount: offset each channel's bins
+    bins = frames // (256 // HISTOGRAM_BINS)
+    offsets = np.arange(3) * HISTOGRAM_BINS
+    flat = (bins + offsets).reshape(len(frames), -1)
+    flat = flat + (np.arange(len(frames)) * 3 * HISTOGRAM_BINS)[:, None]
+    histograms = np.bincount(flat.ravel(), minlength=len(frames) * 3 * HISTOGRAM_BINS)
+    histograms = histograms.reshape(len(frames), 3 * HISTOGRAM_BINS) / (FRAME_WIDTH * FRAME_HEIGHT * 3)
+
+    histogram_diff = np.abs(np.diff(histograms, axis=0)).sum(axis=1) / 2
+    pixel_diff = np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2, 3)) / 255
+    luma = (frames[..., 0] * 0.299 + frames[..., 1] * 0.587 + frames[..., 2] * 0.114).mean(axis=(1, 2))
+    if previous is not None:
+        luma = luma[1:]
+    else:
+        # The first frame of the video has no predecessor
+        histogram_diff = np.concatenate([[0.0], histogram_diff])
+        pixel_diff = np.concatenate([[0.0], pixel_diff])
+    return histogram_diff, pixel_diff, luma
+
+
+def _adaptive_peaks(scores: np.ndarray, fps: float, threshold: float, sensitivity: float,
+                    min_shot_seconds: float) -> List[int]:
+    """Frames whose score beats both an absolute floor and the local median + k*MAD"""
+    window = max(3, int(fps * 2) | 1)
+    padded = np.pad(scores, window // 2, mode="edge")
+    local = np.lib.stride_tricks.sliding_window_view(padded, window)
+    median = np.median(local, axis=1)
+    mad = np.median(np.abs(local - median[:, None]), axis=1)
+    candidates = np.flatnonzero((scores > threshold) & (scores > median + sensitivity * (mad + 1e-3)))
+
+    peaks = []
+    min_gap = max(1, int(min_shot_seconds * fps))
+    for index in candidates:
+        if peaks and index - peaks[-1] < min_gap:
+            if scores[index] > scores[peaks[-1]]:
+                peaks[-1] = int(index)
+            continue
+        peaks.append(int(index))
+    return peaks
+
+
+def _fade_points(luma: np.ndarray, fps: float, dark_level: float, min_shot_seconds: float) -> List[int]:
+    """Darkest frame of each dark run (fade to/from black)"""
+    dark = luma < dark_level
+    points = []
+    index = 0
+    while index < len(dark):
+        if not dark[index]:
+            index += 1
+            continue
+        end = index
+        while end < len(dark) and dark[end]:
+            end += 1
+        if end - index >= max(1, int(fps * 0.1)):
+            points.append(index + int(np.argmin(luma[index:end])))
+        index = end
+    return [point for point in points if point >= min_shot_seconds * fps]
+
+
+class ShotBoundaryDetector:
+    """Decode thread + scoring worker pool; returns candidate break timestamps"""
+
+    def __init__(self, fps: float = ANALYSIS_FPS, workers: int = None, cut_threshold: float = 0.35,
+                 sensitivity: float = 6.0, dark_level: float = 18.0, min_shot_seconds: float = 1.0):
+        self.fps = fps
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.cut_threshold = cut_threshold
+        self.sensitivity = sensitivity
+        self.dark_level = dark_level
+        self.min_shot_seconds = min_shot_seconds
+
+    def _scores(self, source: str) -> Tuple[np.ndarray, np.ndarray]:
+        batches: "queue.Queue" = queue.Queue(maxsize=self.workers * 2)
+        decode_error = []
+
+        def decode():
+            try:
+                for batch in _frame_batches(source, self.fps, BATCH_FRAMES):
+                    batches.put(batch)
+            except Exception as e:
+                decode_error.append(e)
+            finally:
+                batches.put(None)
+
+        decoder = threading.Thread(target=decode, name="shot-decode", daemon=True)
+        decoder.start()
+
+        futures = []
+        previous = None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shot-score") as executor:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                futures.append(executor.submit(score_batch, batch, previous))
+                previous = batch[-1]
+            results = [future.result() for future in futures]
+        decoder.join()
+        if decode_error:
+            raise decode_error[0]
+        if not results:
+            return np.zeros(0), np.zeros(0)
+
+        histogram_diff, pixel_diff, luma = (np.concatenate(parts) for parts in zip(*results))
+        # Histograms catch colour/content changes, pixel differences catch same-palette cuts
+        return 0.6 * histogram_diff + 0.4 * np.minimum(pixel_diff * 2.5, 1.0), luma
+
+    def detect(self, source: str) -> Dict[str, Any]:
+        started = time.time()
+        scores, luma = self._scores(source)
+        cuts = _adaptive_peaks(scores, self.fps, self.cut_threshold, self.sensitivity, self.min_shot_seconds)
+        fades = _fade_points(luma, self.fps, self.dark_level, self.min_shot_seconds)
+
+        boundaries = [{"time": round(index / self.fps, 3), "type": BOUNDARY_CUT, "score": round(float(scores[index]), 4)}
+                      for index in cuts]
+        cut_times = [boundary["time"] for boundary in boundaries]
+        for index in fades:
+            time_point = round(index / self.fps, 3)
+            nearest = bisect_left(cut_times, time_point)
+            near_cut = any(0 <= j < len(cut_times) and abs(cut_times[j] - time_point) < self.min_shot_seconds
+                           for j in (nearest - 1, nearest))
+            if not near_cut:
+                boundaries.append({"time": time_point, "type": BOUNDARY_FADE,
+                                   "score": round(float(1 - luma[index] / 255), 4)})
+        boundaries.sort(key=lambda boundary: boundary["time"])
+
+        elapsed = time.time() - started
+        duration = len(scores) / self.fps
+        return {
+            "boundaries": boundaries,
+            "frames_analyzed": int(len(scores)),
+            "duration": round(duration, 3),
+            "elapsed_seconds": round(elapsed, 3),
+            "realtime_factor": round(duration / elapsed, 1) if elapsed else None
+        }
+
+
+def snap_placements(placements: List[Dict[str, Any]], boundaries: List[Dict[str, Any]],
+                    max_shift: float = 5.0, min_spacing: float = 10.0) -> List[Dict[str, Any]]:
+    """
+    Move each placement onto the nearest shot boundary that keeps min_spacing (the solver's)
+    to its neighbours; placements keep their original time too. A placement with no such
+    boundary stays where the solver put it, so two breaks never collapse onto one cut.
+    """
+    boundary_times = [boundary["time"] for boundary in boundaries]
+    ordered = sorted(placements, key=lambda placement: placement["time"])
+    snapped = []
+    previous = None
+    for index, placement in enumerate(ordered):
+        original = placement["time"]
+        following = ordered[index + 1]["time"] if index + 1 < len(ordered) else None
+        candidates = sorted((t for t in boundary_times[bisect_left(boundary_times, original - max_shift):]
+                             if t <= original + max_shift), key=lambda t: abs(t - original))
+        # The next placement can always fall back to its own time, so never move closer to it than that allows
+        target = next((t for t in candidates
+                       if (previous is None or t - previous >= min_spacing)
+                       and (following is None or following - t >= min_spacing)), None)
+        if target is None:
+            snapped.append({**placement, "shot_aligned": False})
+            previous = original
+            continue
+        snapped.append({**placement, "time": target, "timestamp": format_timestamp(target),
+                        "original_time": original, "shot_aligned": True})
+        previous = target
+    return snapped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect shot boundaries as candidate ad breaks")
+    parser.add_argument("source", help="Local video file")
+    parser.add_argument("--fps", type=float, default=ANALYSIS_FPS, help="Analysis frame rate")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    print("Shot Boundary Detection")
+    print("=" * 50)
+    print(f"Duration: {probe_media(args.source)['duration']:.1f}s")
+    result = ShotBoundaryDetector(fps=args.fps, workers=args.workers).detect(args.source)
+    for boundary in result["boundaries"]:
+        print(f"{format_timestamp(boundary['time']):<16} {boundary['type']:<5} score {boundary['score']}")
+    print(f"\n{len(result['boundaries'])} boundaries, {result['frames_analyzed']} frames in "
+          f"{result['elapsed_seconds']}s ({result['realtime_factor']}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Speculative pre-analysis of uploaded videos (opt-in with SPECULATIVE_ANALYSIS=on).
+Once a main video or ad finishes indexing, its provider work runs in the background at
+batch priority, so it only uses the provider quota live traffic leaves free:
+
+    main video  Pegasus chapters and key frames, Gemini ad categories and emotion timeline,
+                persona scores for it and the default ad pool, and the similarity report
+    ad          persona scores
+
+Results land in the analysis cache (analysis_cache.py), so a later /ad_placement for the
+same video is served mostly from cache. The similarity report itself is local keyword
+scoring; it runs here to surface errors early but is cheap enough to recompute.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+import metrics
+import placement_pipeline
+from artifacts import ArtifactContext
+from call_scheduler import PRIORITY_BATCH, scheduling
+from persona_analyzer import wait_for_index
+from structured_logging import correlation, new_correlation_id, span
+
+logger = logging.getLogger(__name__)
+
+KIND_MAIN = "main"
+KIND_AD = "ad"
+SPECULATIVE_TENANT = "speculative"
+INDEX_POLL_SECONDS = float(os.getenv("SPECULATIVE_POLL_SECONDS", "5"))
+INDEX_TIMEOUT_SECONDS = float(os.getenv("SPECULATIVE_INDEX_TIMEOUT", "1800"))
+
+STATE_WAITING = "waiting_for_index"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+speculative_runs = metrics.REGISTRY.counter(
+    "speculative_analyses_total", "Speculative pre-analyses finished, by video kind and outcome", ("kind", "outcome"))
+
+
+class SpeculativeAnalyzer:
+    """Background pre-analysis for freshly uploaded videos, one run per video id"""
+
+    def __init__(self, context_engine, max_workers: int = None, ads_id: List[str] = None,
+                 poll_seconds: float = INDEX_POLL_SECONDS, index_timeout: float = INDEX_TIMEOUT_SECONDS):
+        self.context_engine = context_engine
+        self.ads_id = ads_id or placement_pipeline.default_ads_id()
+        self.poll_seconds = poll_seconds
+        self.index_timeout = index_timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("SPECULATIVE_WORKERS", "2")),
+            thread_name_prefix="speculative"
+        )
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, video_id: str, task_id: Optional[str] = None, kind: str = KIND_MAIN) -> bool:
+        """Queue pre-analysis of a video (after its indexing task, if given); False if already queued"""
+        with self._lock:
+            if video_id in self.runs and self.runs[video_id]["state"] != STATE_FAILED:
+                return False
+            self.runs[video_id] = {"kind": kind, "task_id": task_id, "state": STATE_WAITING,
+                                   "queued_at": time.time(), "seconds": None, "error": None}
+        self.executor.submit(self._run, video_id, task_id, kind)
+        return True
+
+    def _update(self, video_id: str, **fields) -> None:
+        with self._lock:
+            self.runs[video_id].update(fields)
+
+    def _run(self, video_id: str, task_id: Optional[str], kind: str) -> None:
+        with correlation(new_correlation_id()), scheduling(PRIORITY_BATCH, SPECULATIVE_TENANT), \
+                span("local.speculative_analysis", video_id=video_id, kind=kind):
+            try:
+                if task_id:
+                    wait_for_index(task_id, self.context_engine.api_key, self.poll_seconds, self.index_timeout)
+                self._update(video_id, state=STATE_RUNNING)
+                started = time.time()
+                if kind == KIND_AD:
+                    self.context_engine.persona_analyzer.analyze_video_for_all_personas(video_id)
+                else:
+                    # The same stages /ad_placement runs, so every cache key matches the later request
+                    params = {"video_id": video_id, "ads_id": self.ads_id}
+                    artifacts = ArtifactContext()
+                    results = placement_pipeline.run_emotion_stage(self.context_engine, params, {}, artifacts)
+                    placement_pipeline.run_ranking_stage(self.context_engine, params, results, artifacts)
+            except Exception as e:
+                logger.warning("Speculative analysis of %s failed: %s", video_id, e)
+                self._update(video_id, state=STATE_FAILED, error=str(e))
+                speculative_runs.inc(kind=kind, outcome="failed")
+                return
+            self._update(video_id, state=STATE_DONE, seconds=round(time.time() - started, 2))
+            speculative_runs.inc(kind=kind, outcome="done")
+            logger.info("Speculative analysis of %s finished", video_id)
+
+    def status(self, video_id: str = None) -> Dict[str, Any]:
+        with self._lock:
+            if video_id:
+                return dict(self.runs.get(video_id) or {})
+            return {video: dict(run) for video, run in self.runs.items()}
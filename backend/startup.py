@@ -0,0 +1,83 @@
+"""
+Worker cold-start control.
+Provider clients and heavy libraries (matplotlib, pandas, boto3, the TwelveLabs and Gemini
+SDKs) are created on first use, so importing the API stays cheap. STARTUP_MODE decides
+what happens when a worker boots:
+
+    lazy     nothing is warmed; the first request pays for what it touches (default)
+    prewarm  warm-ups run on a background thread while the worker already serves
+    eager    warm-ups run before the worker accepts requests (the old behaviour)
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy").lower()
+
+# Libraries only some endpoints need; imported by the pre-warm hook, never at module import
+HEAVY_MODULES = ("matplotlib.figure", "pandas")
+
+_warmups: List[Tuple[str, Callable[[], object]]] = []
+
+
+class lazy_property:
+    """Compute an attribute on first access, once per instance, even under concurrent first use"""
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+        self._lock = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        if self.name in instance.__dict__:
+            return instance.__dict__[self.name]
+        with self._lock:
+            if self.name not in instance.__dict__:
+                instance.__dict__[self.name] = self.factory(instance)
+        return instance.__dict__[self.name]
+
+
+def register_warmup(name: str, warmup: Callable[[], object]) -> None:
+    """Add a callable (e.g. a client accessor) for the pre-warm hook to run"""
+    _warmups.append((name, warmup))
+
+
+def register_module_warmups(modules=HEAVY_MODULES) -> None:
+    for module in modules:
+        register_warmup(module, lambda module=module: importlib.import_module(module))
+
+
+def prewarm() -> Dict[str, float]:
+    """Run every registered warm-up; returns seconds per warm-up (failures are logged, not raised)"""
+    timings = {}
+    for name, warmup in list(_warmups):
+        started = time.perf_counter()
+        try:
+            warmup()
+        except Exception as e:
+            logger.warning("Warm-up %s failed: %s", name, e)
+            continue
+        timings[name] = round(time.perf_counter() - started, 3)
+    logger.info("Pre-warm finished in %.2fs: %s", sum(timings.values()), timings)
+    return timings
+
+
+def on_startup(mode: str = None) -> None:
+    """Worker boot hook: apply STARTUP_MODE"""
+    mode = mode or STARTUP_MODE
+    if mode == "eager":
+        prewarm()
+    elif mode == "prewarm":
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
@@ -0,0 +1,231 @@
+"""
+Stream-copy stitching engine.
+Cuts the main video at keyframe-aligned boundaries and concatenates it with the ad
+creatives using ffmpeg stream copy; only ads whose codec parameters differ from the
+main video are re-encoded, so stitching cost scales with the ads rather than the program.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Optional
+from urllib.parse import urlparse
+
+from metrics import cache_lookup
+
+FFMPEG = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE = os.getenv("FFPROBE_BIN", "ffprobe")
+STITCHED_DIR = os.getenv("STITCHED_DIR", "stitched")
+# Client-supplied sources must be files under these directories (os.pathsep-separated;
+# default: main-video uploads and ingested ads) or URLs on these hosts (comma-separated; none by default)
+MEDIA_SOURCE_DIRS = [os.path.realpath(path) for path in os.getenv(
+    "MEDIA_SOURCE_DIRS", os.pathsep.join([os.getenv("UPLOADS_DIR", "uploads"), os.getenv("ADS_DIR", "ads")])
+).split(os.pathsep) if path]
+MEDIA_URL_HOSTS = {host.strip().lower() for host in os.getenv("MEDIA_URL_HOSTS", "").split(",") if host.strip()}
+
+# Encoders used when an ad has to be conformed to the main video's codec
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265", "vp9": "libvpx-vp9", "av1": "libaom-av1"}
+AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus", "ac3": "ac3"}
+
+# Stream parameters that must match for two files to be concatenated by stream copy
+VIDEO_KEYS = ("codec_name", "profile", "width", "height", "pix_fmt", "r_frame_rate")
+AUDIO_KEYS = ("codec_name", "sample_rate", "channels")
+
+
+class StitchingError(Exception):
+    """Raised when a segment cannot be probed, cut or concatenated"""
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG) is not None and shutil.which(FFPROBE) is not None
+
+
+def allowed_path(source: str, directories: List[str] = None) -> Optional[str]:
+    """Real path of source if it is an existing file inside one of directories, else None"""
+    path = os.path.realpath(source)
+    for root in MEDIA_SOURCE_DIRS if directories is None else directories:
+        if os.path.commonpath([path, root]) == root and os.path.isfile(path):
+            return path
+    return None
+
+
+def resolve_source(media: Dict[str, Any]) -> Optional[str]:
+    """
+    Return a path/URL ffmpeg can read, or None (e.g. browser blob: URLs). Only files under
+    MEDIA_SOURCE_DIRS and URLs on MEDIA_URL_HOSTS are accepted; anything else a client sends
+    would let ffmpeg read arbitrary server files or fetch internal URLs.
+    """
+    for key in ("path", "file_path", "url"):
+        source = (media or {}).get(key)
+        if not source:
+            continue
+        if source.startswith(("http://", "https://")):
+            if (urlparse(source).hostname or "").lower() in MEDIA_URL_HOSTS:
+                return source
+            continue
+        path = allowed_path(source)
+        if path:
+            return path
+    return None
+
+
+def run_tool(args: List[str]) -> str:
+    process = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        raise StitchingError(f"{os.path.basename(args[0])} failed: {process.stderr.strip()[-500:]}")
+    return process.stdout
+
+
+def probe_media(source: str) -> Dict[str, Any]:
+    """Codec parameters and duration of the first video and audio streams"""
+    output = run_tool([FFPROBE, "-v", "error", "-show_streams", "-show_format", "-of", "json", source])
+    data = json.loads(output)
+    video = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), None)
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), None)
+    if video is None:
+        raise StitchingError(f"No video stream in {source}")
+    return {
+        "video": {key: video.get(key) for key in VIDEO_KEYS},
+        "audio": {key: audio.get(key) for key in AUDIO_KEYS} if audio else None,
+        "duration": float(data.get("format", {}).get("duration") or video.get("duration") or 0.0)
+    }
+
+
+def keyframe_times(source: str) -> List[float]:
+    """Keyframe timestamps read from packet flags, without decoding any frames"""
+    output = run_tool([FFPROBE, "-v", "error", "-select_streams", "v:0",
+                   "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", source])
+    times = []
+    for line in output.splitlines():
+        parts = line.split(",")
+        if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+            times.append(float(parts[0]))
+    return sorted(times)
+
+
+def snap_to_keyframe(seconds: float, keyframes: List[float]) -> float:
+    """Latest keyframe at or before the given time (stream copy can only start on one)"""
+    if not keyframes:
+        return seconds
+    index = bisect_right(keyframes, seconds + 1e-3) - 1
+    return keyframes[max(index, 0)]
+
+
+def is_compatible(main_probe: Dict[str, Any], other_probe: Dict[str, Any]) -> bool:
+    """True if other can be concatenated with main without re-encoding"""
+    if main_probe["video"] != other_probe["video"]:
+        return False
+    if (main_probe["audio"] is None) != (other_probe["audio"] is None):
+        return False
+    return main_probe["audio"] == other_probe["audio"]
+
+
+class StreamCopyStitcher:
+    """Builds one stitched MP4 from main-video ranges and ad files"""
+
+    def __init__(self, output_dir: str = None, max_workers: int = 4,
+                 probe_lookup: Callable[[str], Optional[Dict[str, Any]]] = None):
+        self.output_dir = output_dir or STITCHED_DIR
+        self.max_workers = max_workers
+        # Optional metadata cache (e.g. AdIngestor.cached_probe) consulted before running ffprobe
+        self.probe_lookup = probe_lookup
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _probe(self, source: str) -> Dict[str, Any]:
+        cached = self.probe_lookup(source) if self.probe_lookup else None
+        if self.probe_lookup:
+            cache_lookup("ad_probe", cached is not None)
+        return cached if cached is not None else probe_media(source)
+
+    def _cut(self, source: str, start: float, end: float, target: str) -> None:
+        """Copy the [start, end) range of the source without re-encoding"""
+        run_tool([FFMPEG, "-nostdin", "-v", "error", "-y", "-ss", f"{start:.3f}", "-i", source,
+              "-t", f"{max(end - start, 0.0):.3f}", "-map", "0:v:0", "-map", "0:a:0?",
+              "-c", "copy", "-avoid_negative_ts", "make_zero", target])
+
+    def _conform(self, source: str, source_probe: Dict[str, Any], main_probe: Dict[str, Any], target: str) -> None:
+        """Re-encode an ad to the main video's codec parameters"""
+        video = main_probe["video"]
+        audio = main_probe["audio"]
+        frame_rate = video.get("r_frame_rate") or "30/1"
+        args = [FFMPEG, "-nostdin", "-v", "error", "-y", "-i", source]
+        if audio and not source_probe["audio"]:
+            # Silent track for ads without audio; -shortest trims it to the video
+            args += ["-f", "lavfi", "-i",
+                     f"anullsrc=r={audio['sample_rate']}:cl={'mono' if audio['channels'] == 1 else 'stereo'}"]
+        args += ["-map", "0:v:0",
+                 "-vf", f"scale={video['width']}:{video['height']}:force_original_aspect_ratio=decrease,"
+                        f"pad={video['width']}:{video['height']}:(ow-iw)/2:(oh-ih)/2,fps={frame_rate}",
+                 "-c:v", VIDEO_ENCODERS.get(video["codec_name"], "libx264"),
+                 "-pix_fmt", video.get("pix_fmt") or "yuv420p"]
+        if audio:
+            args += ["-map", "0:a:0" if source_probe["audio"] else "1:a:0",
+                     "-c:a", AUDIO_ENCODERS.get(audio["codec_name"], "aac"),
+                     "-ar", str(audio["sample_rate"]), "-ac", str(audio["channels"]), "-shortest"]
+        run_tool(args + [target])
+
+    def stitch(self, main_source: str, items: List[Dict[str, Any]], output_id: str) -> Dict[str, Any]:
+        """
+        items: ordered dicts with "id", "type" ('video' or 'ad'), and either
+        "start"/"end" (main video range) or "source" (ad file/URL).
+        """
+        if not ffmpeg_available():
+            raise StitchingError("ffmpeg/ffprobe not found on PATH")
+
+        main_probe = self._probe(main_source)
+        keyframes = main_probe.get("keyframes") or keyframe_times(main_source)
+        ad_probes = {}
+        for item in items:
+            if item["type"] == "ad" and item["source"] not in ad_probes:
+                ad_probes[item["source"]] = self._probe(item["source"])
+
+        work_dir = tempfile.mkdtemp(prefix=f"{output_id}_", dir=self.output_dir)
+        parts = []
+        jobs = []
+        reencoded = []
+        for index, item in enumerate(items):
+            part = os.path.join(work_dir, f"part_{index:04d}.mp4")
+            parts.append(part)
+            if item["type"] == "ad":
+                item["duration"] = ad_probes[item["source"]]["duration"]
+                if is_compatible(main_probe, ad_probes[item["source"]]):
+                    jobs.append((self._cut, (item["source"], 0.0, ad_probes[item["source"]]["duration"], part)))
+                else:
+                    reencoded.append(item["id"])
+                    jobs.append((self._conform, (item["source"], ad_probes[item["source"]], main_probe, part)))
+            else:
+                start = snap_to_keyframe(item["start"], keyframes)
+                end = snap_to_keyframe(item["end"], keyframes) if item["end"] < main_probe["duration"] else item["end"]
+                item["aligned_start"], item["aligned_end"] = start, max(end, start)
+                item["duration"] = item["aligned_end"] - start
+                jobs.append((self._cut, (main_source, start, max(end, start), part)))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for future in [executor.submit(fn, *args) for fn, args in jobs]:
+                    future.result()
+
+            concat_list = os.path.join(work_dir, "concat.txt")
+            with open(concat_list, "w", encoding="utf-8") as f:
+                for part in parts:
+                    f.write(f"file '{os.path.abspath(part)}'\n")
+
+            output_path = os.path.join(self.output_dir, f"{output_id}.mp4")
+            run_tool([FFMPEG, "-nostdin", "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", concat_list,
+                      "-c", "copy", "-movflags", "+faststart", output_path])
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        output_probe = probe_media(output_path)
+        return {
+            "path": output_path,
+            "duration": output_probe["duration"],
+            "video": output_probe["video"],
+            "audio": output_probe["audio"],
+            "reencoded_segments": reencoded,
+            "items": items
+        }
@@ -0,0 +1,173 @@
+"""
+Non-blocking structured logging.
+Every record goes through a QueueHandler, so request and worker threads only enqueue;
+a single QueueListener thread formats JSON lines and writes them to the log file.
+Records carry the current request/job correlation id, and span() times external
+calls and pipeline stages as `span` records that listeners (e.g. metrics) can observe.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List
+
+LOG_FILE = os.getenv("LOG_FILE", "log.txt")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+correlation_id: contextvars.ContextVar = contextvars.ContextVar("correlation_id", default="-")
+# Name of the pipeline stage a span is nested in (used to attribute token usage)
+current_stage: contextvars.ContextVar = contextvars.ContextVar("current_stage", default=None)
+
+_span_logger = logging.getLogger("spans")
+_span_listeners: List[Callable[[Dict[str, Any]], None]] = []
+_span_start_listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+_listener = None
+_queue_handler = None
+_configure_lock = threading.Lock()
+
+# Standard LogRecord attributes; anything else passed via extra= becomes a JSON field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamp the caller's correlation id on the record before it crosses the queue"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation id and extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(log_file: str = None, level: str = None) -> None:
+    """Install the queue handler on the root logger once per process (later calls are no-ops)"""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            return
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(CorrelationFilter())
+
+        file_handler = logging.FileHandler(log_file or LOG_FILE)
+        file_handler.setFormatter(JsonFormatter())
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(correlation_id)s] %(name)s: %(message)s"))
+
+        root = logging.getLogger()
+        root.setLevel(level or LOG_LEVEL)
+        root.addHandler(queue_handler)
+        _queue_handler = queue_handler
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler,
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _listener is not None:
+            logging.getLogger().removeHandler(_queue_handler)
+            _listener.stop()
+            _listener = _queue_handler = None
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def correlation(value: str = None) -> Iterator[str]:
+    """Run a block under a correlation id (a fresh one if none is given)"""
+    token = correlation_id.set(value or new_correlation_id())
+    try:
+        yield correlation_id.get()
+    finally:
+        correlation_id.reset(token)
+
+
+def propagate(fn: Callable) -> Callable:
+    """Wrap fn so it runs in a copy of the caller's context (keeps the correlation id in pool threads)"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def add_span_listener(listener: Callable[[Dict[str, Any]], None],
+                      on_start: Callable[[str, Dict[str, Any]], None] = None) -> None:
+    """
+    Register a callback receiving every finished span (name, duration_ms, status, fields),
+    and optionally one called with (name, fields) when a span opens (for in-flight counts)
+    """
+    _span_listeners.append(listener)
+    if on_start is not None:
+        _span_start_listeners.append(on_start)
+
+
+@contextmanager
+def span(name: str, **fields) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block. Yields a dict the block may add fields to (e.g. token usage);
+    on exit a `span` record is logged and passed to the span listeners.
+    """
+    record = dict(fields)
+    stage_token = None
+    if name.startswith("stage."):
+        stage_token = current_stage.set(name.partition(".")[2])
+    elif current_stage.get() and "stage" not in record:
+        record["stage"] = current_stage.get()
+    for listener in _span_start_listeners:
+        try:
+            listener(name, record)
+        except Exception:
+            _span_logger.exception("Span listener failed")
+
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except BaseException as e:
+        status = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if stage_token is not None:
+            current_stage.reset(stage_token)
+        finished = {"span": name, "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "status": status, **record}
+        _span_logger.info(name, extra=finished)
+        for listener in _span_listeners:
+            try:
+                listener(finished)
+            except Exception:
+                _span_logger.exception("Span listener failed")
@@ -0,0 +1,197 @@
+"""
+Timestamp parsing and interval indexing for model outputs.
+Pegasus, Gemini and Bedrock all describe time as strings ("18s (00:18)",
+"5s (00:05) - 12s (00:12)", "01:02:03", ...). parse_timestamp/parse_time_range turn any
+of them into seconds once, and IntervalIndex answers point, overlap and snap queries
+over a video's segments in O(log n + k).
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_CLOCK = re.compile(r'(?<![\d.])(\d{1,3}):(\d{1,2}(?:[.,]\d+)?)(?::(\d{1,2}(?:[.,]\d+)?))?')
+_UNITS = re.compile(rf'({_NUMBER})\s*(h|hr|hrs|hours?|m|min|mins|minutes?|s|sec|secs|seconds?)(?![a-z])', re.I)
+_BARE = re.compile(rf'^\s*(?:t\s*=\s*)?({_NUMBER})\s*$', re.I)
+# Range separators: hyphen/en/em dash with spaces, "to", or a tight dash between two times
+_RANGE_SPLIT = re.compile(r'\s+[-–—]+\s+|\s*[–—]\s*|\s+to\s+|(?<=[\d)s])-(?=\s*\d)', re.I)
+
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1}
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format seconds the way Pegasus does, e.g. '18s (00:18)'"""
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    clock = f"{hours:02d}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+    return f"{seconds}s ({clock})"
+
+
+def parse_timestamp(value: Any, fallback: Optional[float] = None) -> Optional[float]:
+    """
+    Parse one timestamp into seconds. Accepts numbers, '65', '65s', '65.5 sec', '1m 5s',
+    '1h2m', '01:05', '1:02:03', '65s (01:05)' and '(01:05)'. A leading seconds value wins
+    over the parenthesized clock; a range ('5s-12s') gives its start; anything unparseable
+    returns fallback.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "").strip().strip('"\'[]')
+    if not text:
+        return fallback
+
+    bare = _BARE.match(text)
+    if bare:
+        return _number(bare.group(1))
+    if _RANGE_SPLIT.search(text):
+        start, _ = parse_time_range(text)
+        return fallback if start is None else start
+
+    head = text.split("(")[0]
+    units = _UNITS.findall(head) if ":" not in head else []
+    if units:
+        return float(sum(_number(amount) * _UNIT_SECONDS[unit[0].lower()] for amount, unit in units))
+
+    clock = _CLOCK.search(text)
+    if clock:
+        parts = [_number(part) for part in clock.groups() if part is not None]
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + part
+        return seconds
+
+    units = _UNITS.findall(text)
+    if units:
+        return float(sum(_number(amount) * _UNIT_SECONDS[unit[0].lower()] for amount, unit in units))
+    return fallback
+
+
+def parse_time_range(value: Any) -> Tuple[Optional[float], Optional[float]]:
+    """
+    '5s (00:05) - 12s (00:12)' -> (5.0, 12.0); a single timestamp gives (t, None).
+    A unit written only on the end ('5-12s') applies to both ends; reversed ranges are swapped.
+    """
+    text = str(value or "").strip()
+    parts = [part for part in _RANGE_SPLIT.split(text, maxsplit=1) if part.strip()]
+    if not parts:
+        return None, None
+    start = parse_timestamp(parts[0])
+    end = parse_timestamp(parts[1]) if len(parts) > 1 else None
+    if end is not None and _BARE.match(parts[0]):
+        # '1-2m': a bare start takes the unit written on the end
+        units = _UNITS.findall(parts[1].split("(")[0])
+        if units:
+            start *= _UNIT_SECONDS[units[0][1][0].lower()]
+    if start is None and end is not None:
+        start, end = end, None
+    if start is not None and end is not None and end < start:
+        start, end = end, start
+    return start, end
+
+
+class IntervalIndex:
+    """
+    Static interval tree over [start, end) segments: an implicit balanced tree on the
+    start-sorted array, where each node stores the max end of its subtree.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[float, float, Any]]):
+        ordered = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in ordered]
+        self.ends = [interval[1] for interval in ordered]
+        self.items = [interval[2] for interval in ordered]
+        self._sorted_ends = sorted(end for end in self.ends if end != float("inf"))
+        self._max_end = list(self.ends)
+        self._build(0, len(ordered))
+
+    def _build(self, low: int, high: int) -> float:
+        if low >= high:
+            return float("-inf")
+        mid = (low + high) // 2
+        self._max_end[mid] = max(self.ends[mid], self._build(low, mid), self._build(mid + 1, high))
+        return self._max_end[mid]
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict[str, Any]], time_key: str = "time",
+                      end: Optional[float] = None) -> "IntervalIndex":
+        """
+        Index model segments by their time strings. Segments with only a start run until the
+        next segment starts (the last one until `end`, or forever); unparseable ones are skipped.
+        """
+        parsed = []
+        for segment in segments or []:
+            start, stop = parse_time_range(segment.get(time_key))
+            if start is not None:
+                parsed.append([start, stop, segment])
+        parsed.sort(key=lambda interval: interval[0])
+        for current, following in zip(parsed, parsed[1:] + [None]):
+            if current[1] is None:
+                current[1] = following[0] if following else (end if end is not None else float("inf"))
+            if current[1] <= current[0]:
+                current[1] = current[0] + 1e-9
+        return cls(tuple(interval) for interval in parsed)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Tuple[float, float, Any]]:
+        return iter(zip(self.starts, self.ends, self.items))
+
+    def _query(self, low: float, high: float) -> List[int]:
+        """Indices of intervals with start < high and end > low, in start order"""
+        found = []
+        stack = [(0, len(self.starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] <= low:
+                continue
+            if self.starts[mid] < high:
+                if self.ends[mid] > low:
+                    found.append(mid)
+                stack.append((mid + 1, hi))
+            stack.append((lo, mid))
+        return sorted(found)
+
+    def at(self, t: float) -> List[Any]:
+        """Items whose interval contains t"""
+        return [self.items[i] for i in self._query(t, t + 1e-9) if self.starts[i] <= t]
+
+    def active_at(self, t: float, default: Any = None) -> Any:
+        """The most recently started item containing t"""
+        items = self.at(t)
+        return items[-1] if items else default
+
+    def overlapping(self, start: float, end: float) -> List[Tuple[float, float, Any]]:
+        return [(self.starts[i], self.ends[i], self.items[i]) for i in self._query(start, end)]
+
+    def join(self, other: "IntervalIndex") -> List[Tuple[Any, Any, float, float]]:
+        """Overlap join: (item, other_item, overlap_start, overlap_end) for every overlapping pair"""
+        pairs = []
+        for start, end, item in self:
+            for other_start, other_end, other_item in other.overlapping(start, end):
+                pairs.append((item, other_item, max(start, other_start), min(end, other_end)))
+        return pairs
+
+    def snap(self, t: float, max_distance: float = float("inf")) -> float:
+        """Align t to the nearest segment boundary (start or end) within max_distance, else t"""
+        best = t
+        best_distance = max_distance
+        for boundaries in (self.starts, self._sorted_ends):
+            i = bisect_left(boundaries, t)
+            for j in (i - 1, i):
+                if 0 <= j < len(boundaries) and abs(boundaries[j] - t) <= best_distance:
+                    best, best_distance = boundaries[j], abs(boundaries[j] - t)
+        return best
+
+    def boundaries_between(self, start: float, end: float) -> List[float]:
+        """Segment starts within [start, end)"""
+        return self.starts[bisect_left(self.starts, start):bisect_right(self.starts, end - 1e-9)]
@@ -0,0 +1,174 @@
+"""
+Windowed long-form analysis.
+Splits a long main video into overlapping time windows, runs Pegasus on every window in
+parallel and merges the per-window chapters into one timeline in the call_pegasus schema,
+so latency is bounded by one window instead of the full runtime. Windows are clipped from
+a local copy of the video; a remote-only video is analyzed whole, since a prompt-scoped
+call still processes the full video and would only multiply the cost.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple
+
+from structured_logging import propagate
+from timecodes import format_timestamp, parse_time_range
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = float(os.getenv("PEGASUS_WINDOW_SECONDS", "600"))
+DEFAULT_OVERLAP_SECONDS = float(os.getenv("PEGASUS_WINDOW_OVERLAP", "30"))
+
+
+def plan_windows(duration: float, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 overlap_seconds: float = DEFAULT_OVERLAP_SECONDS) -> List[Tuple[float, float]]:
+    """Overlapping [start, end) windows covering the whole duration"""
+    if duration <= window_seconds:
+        return [(0.0, duration)]
+    step = max(window_seconds - overlap_seconds, 1.0)
+    windows = []
+    start = 0.0
+    while start < duration:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    return windows
+
+
+def merge_window_chapters(window_chapters: List[List[Dict[str, Any]]],
+                          windows: List[Tuple[float, float]],
+                          duplicate_tolerance: float = 3.0) -> List[Dict[str, Any]]:
+    """
+    Merge chapters (absolute seconds) from overlapping windows into one timeline.
+    Each overlap is split at its midpoint: the earlier window owns chapters starting
+    before it, the later window those starting after. Near-duplicate chapters at the
+    seam are then collapsed and open-ended chapters are closed by their successor.
+    """
+    kept = []
+    for index, (chapters, (window_start, window_end)) in enumerate(zip(window_chapters, windows)):
+        lower = 0.0 if index == 0 else (window_start + windows[index - 1][1]) / 2
+        upper = float("inf") if index == len(windows) - 1 else (windows[index + 1][0] + window_end) / 2
+        for chapter in chapters:
+            if lower <= chapter["start"] < upper:
+                kept.append(dict(chapter))
+
+    kept.sort(key=lambda chapter: chapter["start"])
+    merged = []
+    for chapter in kept:
+        previous = merged[-1] if merged else None
+        if previous and chapter["start"] - previous["start"] <= duplicate_tolerance:
+            # Same chapter seen from both sides of a seam: keep the longer description
+            previous["end"] = max(previous["end"] or 0.0, chapter["end"] or 0.0) or None
+            if len(chapter["description"]) > len(previous["description"]):
+                previous["description"] = chapter["description"]
+            continue
+        if previous and (previous["end"] is None or previous["end"] > chapter["start"]):
+            previous["end"] = chapter["start"]
+        merged.append(chapter)
+
+    for chapter, following in zip(merged, merged[1:]):
+        if chapter["end"] is None:
+            chapter["end"] = following["start"]
+    if merged and merged[-1]["end"] is None and windows:
+        merged[-1]["end"] = windows[-1][1]
+    return merged
+
+
+def to_pegasus_schema(chapters: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Render merged chapters in the {"timestamps": [{time, description}]} shape"""
+    return {"timestamps": [
+        {
+            "time": f"{format_timestamp(chapter['start'])} - {format_timestamp(chapter['end'])}",
+            "description": chapter["description"]
+        }
+        for chapter in chapters
+    ]}
+
+
+class WindowedPegasus:
+    """Runs call_pegasus over overlapping windows in parallel and merges the results"""
+
+    def __init__(self, context_engine, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 overlap_seconds: float = DEFAULT_OVERLAP_SECONDS, max_workers: int = 4):
+        self.context_engine = context_engine
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.max_workers = max_workers
+
+    def _clip_windows(self, source_path: str, windows: List[Tuple[float, float]],
+                      work_dir: str) -> List[Tuple[str, float]]:
+        """Stream-copy each window into its own file; returns (path, true keyframe start)"""
+        from stitching import FFMPEG, keyframe_times, run_tool, snap_to_keyframe
+
+        keyframes = keyframe_times(source_path)
+        clips = []
+        for index, (start, end) in enumerate(windows):
+            aligned = snap_to_keyframe(start, keyframes)
+            path = os.path.join(work_dir, f"window_{index:03d}.mp4")
+            run_tool([FFMPEG, "-nostdin", "-v", "error", "-y", "-ss", f"{aligned:.3f}", "-i", source_path,
+                      "-t", f"{end - aligned:.3f}", "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+                      "-avoid_negative_ts", "make_zero", path])
+            clips.append((path, aligned))
+        return clips
+
+    def _window_targets(self, windows: List[Tuple[float, float]], source_path: str,
+                        work_dir: str, executor: ThreadPoolExecutor) -> List[Tuple[str, float]]:
+        """(clip video_id, timestamp offset) per window; clips are indexed before Pegasus sees them"""
+        def upload(clip):
+            path, offset = clip
+            with open(path, "rb") as f:
+                return self.context_engine.upload_vid(f, wait=True, notify=False), offset
+
+        return list(executor.map(propagate(upload), self._clip_windows(source_path, windows, work_dir)))
+
+    def _analyze_window(self, target: Tuple[str, float], prompt: str) -> List[Dict[str, Any]]:
+        window_video_id, offset = target
+        return self._chapters(self.context_engine.call_pegasus(window_video_id, prompt), offset)
+
+    def _chapters(self, result: Dict[str, Any], offset: float) -> List[Dict[str, Any]]:
+        chapters = []
+        for item in result.get("timestamps", []):
+            start, end = parse_time_range(item.get("time", ""))
+            if start is None:
+                continue
+            chapters.append({
+                "start": start + offset,
+                "end": end + offset if end is not None else None,
+                "description": item.get("description", "")
+            })
+        return chapters
+
+    def analyze_many(self, video_id: str, prompts: List[str], duration: float,
+                     source_path: str = None) -> List[Dict[str, Any]]:
+        """
+        Windowed call_pegasus for several prompts over the same windows. Each window is
+        clipped from the local source_path by stream copy and indexed once; without a
+        local source the full video is analyzed once per prompt.
+        """
+        windows = plan_windows(duration, self.window_seconds, self.overlap_seconds)
+        if len(windows) > 1 and not source_path:
+            logger.warning("Windowed analysis needs a local copy of %s; analyzing the full video instead.", video_id)
+        if len(windows) == 1 or not source_path:
+            return [self.context_engine.call_pegasus(video_id, prompt) for prompt in prompts]
+
+        work_dir = tempfile.mkdtemp(prefix="pegasus_windows_")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                targets = self._window_targets(windows, source_path, work_dir, executor)
+                jobs = [(prompt, target) for prompt in prompts for target in targets]
+                chapters = list(executor.map(propagate(lambda job: self._analyze_window(job[1], job[0])), jobs))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        # Clips may start slightly early (keyframe); ownership still uses the planned windows
+        return [to_pegasus_schema(merge_window_chapters(chapters[i * len(targets):(i + 1) * len(targets)], windows))
+                for i in range(len(prompts))]
+
+    def analyze(self, video_id: str, prompt: str, duration: float,
+                source_path: str = None) -> Dict[str, Any]:
+        return self.analyze_many(video_id, [prompt], duration, source_path)[0]
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the backend API module.
+Imports `api` in a fresh interpreter (as a new uvicorn worker would), fails if it takes
+longer than the budget or if heavy libraries/SDK clients were loaded eagerly.
+
+Usage:
+    python test_import_time.py
+    IMPORT_BUDGET_SECONDS=1.0 python test_import_time.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))
+
+# Modules that must only be loaded on first use or by the pre-warm hook
+LAZY_MODULES = ["boto3", "botocore", "matplotlib", "pandas", "sklearn", "twelvelabs", "google.genai"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import api
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure_import():
+    env = {**os.environ, "STARTUP_MODE": "lazy"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    slowest = []
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[1].isdigit():
+            slowest.append((int(parts[1]), parts[2]))
+    measurement["slowest"] = sorted(slowest, reverse=True)[:10]
+    return measurement
+
+
+def test_import_budget():
+    """`import api` stays under the budget and loads no heavy dependency eagerly"""
+    measurement = measure_import()
+
+    print(f"import api: {measurement['seconds']:.3f}s (budget {BUDGET_SECONDS:.1f}s)")
+    print("Slowest imports (cumulative):")
+    for microseconds, module in measurement["slowest"]:
+        print(f"  {microseconds / 1e6:7.3f}s  {module}")
+
+    assert measurement["seconds"] <= BUDGET_SECONDS, \
+        f"import api took {measurement['seconds']:.3f}s, over the {BUDGET_SECONDS:.1f}s budget"
+    print("✅ Import time within budget")
+    assert not measurement["loaded"], f"loaded eagerly: {', '.join(measurement['loaded'])}"
+    print("✅ No heavy modules loaded at import")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing API import time")
+    print("=" * 50)
+
+    try:
+        test_import_budget()
+        ok = True
+    except Exception as e:
+        print(f"❌ {e}")
+        ok = False
+
+    print("\n" + "=" * 50)
+    print("Test completed!")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Checks that the columnar persona store round-trips the results schema and scores like the JSON.
+
+Usage:
+    python test_persona_store.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from embedding_similarity_analysis import EmbeddingSimilarityAnalyzer
+from persona_store import PersonaScoreStore
+
+
+def analysis(persona, category, overall, overview):
+    return {
+        "persona": persona, "category": category, "motto": f"{persona} motto",
+        "content_overview": overview,
+        "scores": {"overall_alignment": 8, "emotional_engagement": 7, "content_relevance": 6,
+                   "visual_appeal": 9, "narrative_quality": 7.5},
+        "overall_score": overall, "usage": {"total_tokens": 120}, "status": "success"
+    }
+
+
+def video(key, video_id, name, scores, overviews):
+    personas = {
+        "Casual Viewer": analysis("Casual Viewer", "general", scores[0], overviews[0]),
+        "Sports Fan": analysis("Sports Fan", "sports", scores[1], overviews[1]),
+        "Analyst": {"persona": "Analyst", "category": "sports", "error": "timeout", "status": "error"}
+    }
+    return {
+        "video_id": video_id,
+        "persona_analyses": personas,
+        "summary": {"total_personas": 3, "successful_analyses": 2, "failed_analyses": 1},
+        "video_metadata": {"video_key": key, "video_name": name, "video_description": f"{name} video",
+                           "video_id": video_id}
+    }
+
+
+RESULTS = {
+    "analysis_metadata": {"total_videos": 2, "total_personas": 3, "index_id": "idx",
+                          "analysis_timestamp": "2025-01-01T00:00:00"},
+    "video_analyses": {
+        "main_sports_video": video("main_sports_video", "v-main", "Main Sports Video", (7.2, 8.4),
+                                   ("A tense football match with a late goal", "Crowd erupts after the goal")),
+        "ad_pg": video("ad_pg", "v-pg", "PG Ad", (6.5, 5.25),
+                       ("Athletes and their families celebrate", "Olympic athletes training"))
+    },
+    "summary": {"total_analyses": 6, "successful_analyses": 4, "failed_analyses": 2}
+}
+
+
+def test_import_export_round_trip():
+    with tempfile.TemporaryDirectory() as root:
+        store = PersonaScoreStore(root)
+        store.import_results(RESULTS)
+        assert store.scores.shape == (2, 3, 6)
+        exported = PersonaScoreStore(root).export_results()
+    assert exported == RESULTS, "exported results differ from the imported ones"
+
+
+def test_analyzer_reads_scores_from_store():
+    """Scoring from the store's columns matches scoring from the JSON results"""
+    with tempfile.TemporaryDirectory() as root:
+        store = PersonaScoreStore(root)
+        store.import_results(RESULTS)
+        from_store = EmbeddingSimilarityAnalyzer(store=store)
+        from_json = EmbeddingSimilarityAnalyzer(results=RESULTS)
+        assert from_store.has_results()
+        assert from_store._extract_persona_affinity_scores() == from_json._extract_persona_affinity_scores()
+        assert from_store._extract_content_overviews() == from_json._extract_content_overviews()
+        assert from_store.comprehensive_ad_scoring() == from_json.comprehensive_ad_scoring()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing the persona score store")
+    print("=" * 50)
+    failures = 0
+    for test in (test_import_export_round_trip, test_analyzer_reads_scores_from_store):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failures += 1
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Checks of the provider resilience layer: hedging once the budget is used up and degraded results.
+
+Usage:
+    python test_resilience.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import resilience
+from resilience import ResilientCaller
+
+
+def test_no_busy_wait_when_hedge_budget_exhausted():
+    """A call past p95 with no hedge budget left waits for the primary instead of spinning"""
+    caller = ResilientCaller(max_workers=4)
+    key = "fake.slow"
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        caller._tracker(key).record(0.01)
+    # Every earlier call already hedged: the budget is exhausted
+    caller.calls[key] = 10
+    caller.hedges[key] = 10
+
+    waits = []
+    original_wait = resilience.wait
+
+    def counting_wait(*args, **kwargs):
+        waits.append(1)
+        return original_wait(*args, **kwargs)
+
+    resilience.wait = counting_wait
+    try:
+        started_cpu = time.process_time()
+        result = caller.call("fake", "slow", lambda: time.sleep(0.5) or "done", timeout=5)
+        cpu = time.process_time() - started_cpu
+    finally:
+        resilience.wait = original_wait
+
+    print(f"wait() calls: {len(waits)}, cpu {cpu:.3f}s")
+    assert result == "done"
+    assert caller.hedges[key] == 10, "no hedge may be sent over budget"
+    assert len(waits) < 10, f"{len(waits)} wait() calls: busy-waiting past p95"
+    assert cpu < 0.2, f"{cpu:.3f}s of CPU while waiting for one call"
+
+
+def test_fallback_served_when_provider_fails():
+    """With nothing cached, a failing call returns the caller's degraded result"""
+    caller = ResilientCaller(max_workers=2)
+
+    def failing():
+        raise RuntimeError("provider down")
+
+    assert caller.call("fake", "down", failing, fallback=lambda: "degraded", hedge=False) == "degraded"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing provider resilience")
+    print("=" * 50)
+    failures = 0
+    for test in (test_no_busy_wait_when_hedge_budget_exhausted, test_fallback_served_when_provider_fails):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failures += 1
+    sys.exit(1 if failures else 0)
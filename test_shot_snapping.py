@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Checks that snapping ad breaks onto shot boundaries keeps the solver's minimum spacing.
+
+Usage:
+    python test_shot_snapping.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from shot_detection import snap_placements
+
+
+def boundaries(*times):
+    return [{"time": t, "type": "cut", "score": 1.0} for t in times]
+
+
+def test_shared_boundary_is_not_reused():
+    """Two breaks near the same cut (10s and 20s, cut at 15s) must not both land on it"""
+    placements = [{"time": 10.0, "product": "a"}, {"time": 20.0, "product": "b"}]
+    snapped = snap_placements(placements, boundaries(15.0), max_shift=5.0, min_spacing=10.0)
+    times = [placement["time"] for placement in snapped]
+    print(f"snapped times: {times}")
+    assert len(snapped) == 2
+    assert times[1] - times[0] >= 10.0, f"breaks {times} closer than min_spacing"
+    assert len(set(times)) == 2, f"breaks {times} share a boundary"
+
+
+def test_spacing_kept_against_neighbours():
+    """A break only moves to a cut that stays min_spacing away from both neighbours"""
+    placements = [{"time": 30.0}, {"time": 42.0}, {"time": 60.0}]
+    snapped = snap_placements(placements, boundaries(28.0, 44.0, 51.0, 61.0), max_shift=5.0, min_spacing=10.0)
+    times = [placement["time"] for placement in snapped]
+    print(f"snapped times: {times}")
+    assert times == sorted(times)
+    assert all(b - a >= 10.0 for a, b in zip(times, times[1:])), f"breaks {times} closer than min_spacing"
+    assert snapped[0]["shot_aligned"] and snapped[0]["original_time"] == 30.0
+
+
+def test_unaligned_break_keeps_its_time():
+    """With no usable boundary the break stays where the solver put it"""
+    snapped = snap_placements([{"time": 100.0}], boundaries(120.0), max_shift=5.0)
+    assert snapped[0]["time"] == 100.0 and not snapped[0]["shot_aligned"]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing shot boundary snapping")
+    print("=" * 50)
+    failures = 0
+    for test in (test_shared_boundary_is_not_reused, test_spacing_kept_against_neighbours,
+                 test_unaligned_break_keeps_its_time):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failures += 1
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Checks of the shared timestamp parser against the formats the models emit.
+
+Usage:
+    python test_timecodes.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from timecodes import parse_time_range, parse_timestamp
+
+
+def test_parse_timestamp_formats():
+    cases = {
+        "65": 65.0, "65s": 65.0, "65.5 sec": 65.5, "1m 5s": 65.0, "1h2m": 3720.0,
+        "01:05": 65.0, "1:02:03": 3723.0, "65s (01:05)": 65.0, "(01:05)": 65.0
+    }
+    for text, expected in cases.items():
+        assert parse_timestamp(text) == expected, f"{text!r} -> {parse_timestamp(text)}, expected {expected}"
+    assert parse_timestamp("soon", fallback=-1.0) == -1.0
+
+
+def test_parse_timestamp_of_range_is_its_start():
+    """A range label (e.g. an emotion CSV row) gives its start, not the sum of both ends"""
+    for text in ("5s-12s", "5s - 12s", "5-12s", "5s (00:05) - 12s (00:12)", "00:05 - 00:12"):
+        assert parse_timestamp(text) == 5.0, f"{text!r} -> {parse_timestamp(text)}, expected 5.0"
+
+
+def test_parse_time_range():
+    cases = {
+        "5s (00:05) - 12s (00:12)": (5.0, 12.0),
+        "5-12s": (5.0, 12.0),
+        "00:05 – 00:12": (5.0, 12.0),
+        "12s to 5s": (5.0, 12.0),
+        "18s (00:18)": (18.0, None)
+    }
+    for text, expected in cases.items():
+        assert parse_time_range(text) == expected, f"{text!r} -> {parse_time_range(text)}, expected {expected}"
+
+
+def test_unit_on_end_applies_to_bare_start():
+    for text, expected in (("1-2m", (60.0, 120.0)), ("1 to 2 min", (60.0, 120.0)), ("1-2h", (3600.0, 7200.0))):
+        assert parse_time_range(text) == expected, f"{text!r} -> {parse_time_range(text)}, expected {expected}"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing timestamp parsing")
+    print("=" * 50)
+    failures = 0
+    for test in (test_parse_timestamp_formats, test_parse_timestamp_of_range_is_its_start,
+                 test_parse_time_range, test_unit_on_end_applies_to_bare_start):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failures += 1
+    sys.exit(1 if failures else 0)